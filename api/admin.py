@@ -6,17 +6,25 @@ from .models import (
     Strategy,
     UserProfile,
     UserApi,
+    AccountBalance,
+    ExchangeSymbolRule,
     Signal,
+    OpenPosition,
+    SignalOutbox,
     StrategySubscription,
     UserTrade,
+    DiscordSignal,
+    TakeProfitTrade,
     HRJDiscordSignal,
     FJDiscordSignal,
-    HRJTakeProfitTrade,
-    FJTakeProfitTrade,
     BanditMessages,
     SignalTrigger,
     SIGSCANDiscordSignal,
-    SIGSCANTakeProfitTrade
+    GeminiParseCache,
+    GeminiUsage,
+    CacheVersion,
+    CacheStats,
+    PrefilterStats
 )
 
 # Change the default Django admin site headers and titles
@@ -25,39 +33,40 @@ admin.site.site_title = "TradeFly Admin Portal"
 admin.site.index_title = "Welcome to the TradeFly Admin Portal"
 
 
-class HRJTakeProfitTradesInline(admin.TabularInline):
-    model = HRJTakeProfitTrade
+class TakeProfitTradesInline(admin.TabularInline):
+    model = TakeProfitTrade
     extra = 1
 
 
+@admin.register(DiscordSignal)
+class DiscordSignalsAdmin(admin.ModelAdmin):
+    list_display = ('id', 'source', 'strategy', 'asset', 'trade_type', 'leverage', 'balance', 'entry_price', 'entry_order_type', 'stop_loss', 'created_at')
+    list_filter = ('source', 'trade_type', 'asset')
+    inlines = [TakeProfitTradesInline]
+
+
+# The per-source pages show only that source's rows (see DiscordSignalSourceManager)
 @admin.register(HRJDiscordSignal)
 class HRJDiscordSignalsAdmin(admin.ModelAdmin):
     list_display = ('id', 'strategy', 'asset', 'trade_type', 'leverage', 'balance', 'entry_price', 'entry_order_type', 'stop_loss')
     list_filter = ('trade_type', 'asset')
-    inlines = [HRJTakeProfitTradesInline]
-
-
-class FJTakeProfitTradesInline(admin.TabularInline):
-    model = FJTakeProfitTrade
-    extra = 1
+    exclude = ('source',)
+    inlines = [TakeProfitTradesInline]
 
 
 @admin.register(FJDiscordSignal)
 class FJDiscordSignalsAdmin(admin.ModelAdmin):
     list_display = ('id', 'strategy', 'asset', 'trade_type', 'entry_price', 'entry_order_type', 'stop_loss')
     list_filter = ('trade_type', 'asset')
-    inlines = [FJTakeProfitTradesInline]
-
-class SIGSCANTakeProfitTradesInline(admin.TabularInline):
-    model = SIGSCANTakeProfitTrade
-    extra = 1
-
+    exclude = ('source', 'leverage', 'balance')
+    inlines = [TakeProfitTradesInline]
 
 @admin.register(SIGSCANDiscordSignal)
 class SIGSCANDiscordSignalsAdmin(admin.ModelAdmin):
     list_display = ('id', 'strategy', 'asset', 'trade_type', 'entry_price', 'entry_order_type', 'stop_loss')
     list_filter = ('trade_type', 'asset')
-    inlines = [SIGSCANTakeProfitTradesInline]
+    exclude = ('source', 'leverage', 'balance')
+    inlines = [TakeProfitTradesInline]
 
 
 @admin.register(BlogPost)
@@ -68,6 +77,17 @@ class BlogPostAdmin(admin.ModelAdmin):
 class SupportedExchangeAdmin(admin.ModelAdmin):
     list_display = ('id', 'name')
 
+@admin.register(AccountBalance)
+class AccountBalanceAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user_api', 'currency', 'available', 'equity', 'refreshed_at')
+    search_fields = ('user_api__auth_user__username',)
+
+@admin.register(ExchangeSymbolRule)
+class ExchangeSymbolRuleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'exchange', 'symbol', 'qty_step', 'min_qty', 'tick_size', 'min_notional', 'max_leverage')
+    list_filter = ('exchange',)
+    search_fields = ('symbol',)
+
 @admin.register(SignalTrigger)
 class SignalTriggerAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'description')
@@ -96,6 +116,11 @@ class SignalAdmin(admin.ModelAdmin):
     list_filter = ('strategy', 'symbol', 'side', 'tradeSide')
     search_fields = ('symbol',)
 
+@admin.register(SignalOutbox)
+class SignalOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'attempts', 'result', 'created_at', 'dispatched_at', 'processed_at')
+    list_filter = ('status',)
+
 @admin.register(StrategySubscription)
 class StrategySubscriptionAdmin(admin.ModelAdmin):
     list_display = ('id', 'auth_user', 'strategy', 'user_api', 'portfolio_percentage', 'status', 'leverage_amount', 'max_tp_trades', 'enable_sl_trail', 'enable_sms_confirm')
@@ -104,11 +129,41 @@ class StrategySubscriptionAdmin(admin.ModelAdmin):
 
 @admin.register(UserTrade)
 class UserTradeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'auth_user', 'signal', 'position_id', 'exchange_mark_price', 'trade_value', 'trade_qty')
+    list_display = ('id', 'auth_user', 'user_api', 'signal', 'status', 'reason', 'position_id', 'exchange_mark_price', 'trade_value', 'trade_qty', 'message_id', 'created_at')
+    list_filter = ('status',)
     search_fields = ('auth_user__username',)
 
 @admin.register(BanditMessages)
 class BanditMessagesAdmin(admin.ModelAdmin):
-    list_display = ('id', 'channel_name', 'channel_id', 'message', 'created_at')
-    list_filter = ('channel_name',)
-    search_fields = ('channel_name', 'message')
\ No newline at end of file
+    list_display = ('id', 'channel_name', 'channel_id', 'message', 'status', 'attempts', 'parse_latency_ms', 'created_at')
+    list_filter = ('channel_name', 'status')
+    search_fields = ('channel_name', 'message')
+
+@admin.register(GeminiParseCache)
+class GeminiParseCacheAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'key', 'hits', 'latency_ms', 'created_at', 'updated_at')
+    list_filter = ('channel',)
+    search_fields = ('key',)
+
+@admin.register(GeminiUsage)
+class GeminiUsageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'strategy', 'messages', 'prompt_tokens', 'response_tokens', 'cached_tokens', 'latency_ms', 'created_at')
+    list_filter = ('channel', 'strategy')
+
+@admin.register(OpenPosition)
+class OpenPositionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'strategy', 'symbol', 'side', 'open_count', 'latest_signal', 'updated_at')
+    list_filter = ('strategy', 'side')
+    search_fields = ('symbol',)
+
+@admin.register(CacheVersion)
+class CacheVersionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'version', 'updated_at')
+
+@admin.register(CacheStats)
+class CacheStatsAdmin(admin.ModelAdmin):
+    list_display = ('name', 'hits', 'misses', 'updated_at')
+
+@admin.register(PrefilterStats)
+class PrefilterStatsAdmin(admin.ModelAdmin):
+    list_display = ('mode', 'agree', 'disagree', 'missed_signals', 'updated_at')
\ No newline at end of file
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connect the cache invalidation receivers
+        from api import signals  # noqa: F401
+        # Register the exchange adapters
+        from api.includes import bitunix  # noqa: F401
@@ -0,0 +1,387 @@
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db.models import F, Sum
+
+from api.models import Strategy, StrategySubscription, ExchangeSymbolRule, GeminiParseCache, CacheVersion, CacheStats
+from api.includes.sizing import SymbolRules
+
+# Get an instance of a logger for the current module
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Small thread-safe, per-process cache whose entries expire ttl seconds after they are stored.
+
+    Model signals clear entries when rows change in this process. The TTL bounds how
+    long other gunicorn workers can keep serving a stale copy.
+
+    A named cache adds its hit and miss counts to its cache_stats row at most every
+    `flush_interval` seconds (and on flush_stats()), so the cache_stats command can
+    report them across workers.
+    """
+
+    def __init__(self, ttl, name=None, flush_interval=30):
+        self.ttl = ttl
+        self.name = name
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self._pending = Counter()
+        self._flushed_at = time.monotonic()
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self.hits += 1
+                self._pending['hits'] += 1
+                value = item[1]
+            else:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                self._pending['misses'] += 1
+                value = None
+            flush_due = self.name is not None and time.monotonic() >= self._flushed_at + self.flush_interval
+        if flush_due:
+            self.flush_stats()
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Hit ratio and size of this process's copy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'size': len(self._data),
+            }
+
+    def flush_stats(self):
+        """Adds the hits and misses counted since the last flush to the cache's cache_stats row."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+        if self.name is None or not pending:
+            return
+        try:
+            counts = {'hits': F('hits') + pending['hits'], 'misses': F('misses') + pending['misses']}
+            if not CacheStats.objects.filter(name=self.name).update(**counts):
+                CacheStats.objects.get_or_create(name=self.name)
+                CacheStats.objects.filter(name=self.name).update(**counts)
+        except Exception as e:
+            # Keep the counts for the next flush rather than losing them
+            with self._lock:
+                self._pending.update(pending)
+            logger.warning(f"Could not flush {self.name} cache stats: {e}")
+
+
+class CachedStrategy(NamedTuple):
+    """The Strategy fields the signal hot path needs."""
+    strategy_id: int
+    name: str
+    password: Optional[str]
+    signal_trigger_id: Optional[int]
+
+
+strategy_cache = TTLCache(ttl=getattr(settings, 'STRATEGY_CACHE_TTL', 60), name='strategy', flush_interval=getattr(settings, 'CACHE_STATS_FLUSH_INTERVAL', 30))
+
+
+def getCachedStrategy(name=None, strategy_id=None):
+    """
+    Returns the CachedStrategy for a strategy name or id, loading it on a miss.
+    Raises Strategy.DoesNotExist like Strategy.objects.get would.
+    """
+    key = ('name', name) if name is not None else ('id', strategy_id)
+    strategy = strategy_cache.get(key)
+    if strategy is not None:
+        return strategy
+
+    lookup = {'name': name} if name is not None else {'pk': strategy_id}
+    row = Strategy.objects.values('strategy_id', 'name', 'password', 'signal_trigger_id').get(**lookup)
+    strategy = CachedStrategy(**row)
+
+    # Store under both keys so a later lookup by either one is a hit.
+    strategy_cache.set(('name', strategy.name), strategy)
+    strategy_cache.set(('id', strategy.strategy_id), strategy)
+    logger.debug(f"Strategy cache miss for {key}, loaded {strategy.name}")
+    return strategy
+
+
+class RosterEntry:
+    """One active subscriber of a strategy, as needed to build and route an order."""
+    __slots__ = (
+        'user_id', 'user_api_id', 'exchange_name', 'api_key', 'api_secret',
+        'portfolio_percentage', 'leverage_amount', 'max_tp_trades', 'enable_sl_trail', 'enable_sms_confirm',
+    )
+
+    def __init__(self, user_id, user_api_id, exchange_name, api_key, api_secret,
+                 portfolio_percentage, leverage_amount, max_tp_trades, enable_sl_trail, enable_sms_confirm):
+        self.user_id = user_id
+        self.user_api_id = user_api_id
+        self.exchange_name = exchange_name
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.portfolio_percentage = portfolio_percentage
+        self.leverage_amount = leverage_amount
+        self.max_tp_trades = max_tp_trades
+        self.enable_sl_trail = enable_sl_trail
+        self.enable_sms_confirm = enable_sms_confirm
+
+    def asUserData(self):
+        """Returns a fresh user data dict in the shape createTrade expects (callers mutate it)."""
+        return {
+            'api_key': self.api_key, 'api_secret': self.api_secret,
+            'user_id': self.user_id, 'user_api_id': self.user_api_id, 'name': self.exchange_name,
+            'portfolio_percentage': self.portfolio_percentage, 'leverage_amount': self.leverage_amount,
+            'max_tp_trades': self.max_tp_trades, 'enable_sl_trail': self.enable_sl_trail, 'enable_sms_confirm': self.enable_sms_confirm
+        }
+
+
+class SharedVersion:
+    """
+    Ties a per-process cache to the other gunicorn workers through a counter in the
+    cache_version table. Writers bump() the counter; readers call check(), which re-reads
+    it at most every `interval` seconds and clears the local cache when it has moved.
+
+    bump() runs from model signals, so queryset update(), bulk_create() and raw SQL do not
+    bump it; code changing rows that way must call bump() itself, or wait out the cache TTL.
+    """
+
+    def __init__(self, name, cache, interval):
+        self.name = name
+        self.cache = cache
+        self.interval = interval
+        self._version = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def check(self):
+        with self._lock:
+            if time.monotonic() < self._checked_at + self.interval:
+                return
+        version = CacheVersion.objects.filter(name=self.name).values_list('version', flat=True).first() or 0
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if self._version is not None and version != self._version:
+                self.cache.clear()
+                logger.debug(f"{self.name} cache version moved to {version}, cleared")
+            self._version = version
+
+    def bump(self):
+        CacheVersion.objects.get_or_create(name=self.name)
+        CacheVersion.objects.filter(name=self.name).update(version=F('version') + 1)
+        self.cache.clear()
+
+    def reset(self):
+        with self._lock:
+            self._version = None
+            self._checked_at = float('-inf')
+
+
+roster_cache = TTLCache(ttl=getattr(settings, 'ROSTER_CACHE_TTL', 60), name='roster', flush_interval=getattr(settings, 'CACHE_STATS_FLUSH_INTERVAL', 30))
+roster_version = SharedVersion('roster', roster_cache, interval=getattr(settings, 'ROSTER_VERSION_CHECK_INTERVAL', 1.0))
+
+
+def getStrategyRoster(strategy_id):
+    """
+    Returns the active roster of a strategy as a tuple of RosterEntry, building it with a
+    single query on a miss. Subscriptions without an API key or exchange are left out,
+    because no order can be routed for them. Changes saved by any worker are seen within
+    ROSTER_VERSION_CHECK_INTERVAL seconds (see SharedVersion).
+    """
+    roster_version.check()
+    roster = roster_cache.get(strategy_id)
+    if roster is not None:
+        return roster
+
+    rows = StrategySubscription.objects.filter(
+        strategy_id=strategy_id,
+        status='Active',
+        user_api__isnull=False,
+        user_api__exchange__isnull=False
+    ).order_by('id').values_list(
+        'auth_user_id', 'user_api_id', 'user_api__exchange__name', 'user_api__api_key', 'user_api__api_secret',
+        'portfolio_percentage', 'leverage_amount', 'max_tp_trades', 'enable_sl_trail', 'enable_sms_confirm'
+    )
+    roster = tuple(RosterEntry(*row) for row in rows)
+    roster_cache.set(strategy_id, roster)
+    logger.debug(f"Roster cache miss for strategy {strategy_id}, loaded {len(roster)} subscribers")
+    return roster
+
+
+symbol_rules_cache = TTLCache(ttl=getattr(settings, 'SYMBOL_RULES_CACHE_TTL', 300), name='symbol_rules', flush_interval=getattr(settings, 'CACHE_STATS_FLUSH_INTERVAL', 30))
+
+# The TTL caches reported by the cache_stats command
+TTL_CACHES = (strategy_cache, roster_cache, symbol_rules_cache)
+
+
+def getSymbolRules(exchange_name, symbol):
+    """
+    Returns the SymbolRules for a symbol on an exchange, or None if none are configured.
+    Each exchange's rules are loaded with one query and cached together.
+    """
+    rules = symbol_rules_cache.get(exchange_name)
+    if rules is None:
+        rows = ExchangeSymbolRule.objects.filter(exchange__name=exchange_name).values_list(
+            'symbol', 'qty_step', 'min_qty', 'tick_size', 'min_notional', 'max_leverage'
+        )
+        rules = {row[0]: SymbolRules(*row[1:]) for row in rows}
+        symbol_rules_cache.set(exchange_name, rules)
+        logger.debug(f"Symbol rules cache miss for {exchange_name}, loaded {len(rules)} symbols")
+    return rules.get(symbol)
+
+
+class GeminiResultCache:
+    """
+    Caches Gemini parse results by channel and message content, so re-posted or
+    edited-back Discord messages skip the LLM call.
+
+    A bounded in-memory LRU sits in front of the gemini_parse_cache table. The table
+    keeps hits across restarts and shares them with every gunicorn worker. Both
+    "false" verdicts and parsed signals are cached; errors are not.
+
+    Hits are counted in memory and added to the table's hit counters at most every
+    `flush_interval` seconds (and by flush_hits()), so an in-memory hit costs no query.
+    """
+
+    def __init__(self, max_entries, flush_interval):
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._entries = OrderedDict()
+        self._pending_hits = Counter()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(channel, message):
+        # Normalize unicode forms and whitespace so trivially different copies share a key
+        normalized = ' '.join(unicodedata.normalize('NFKC', message or '').split())
+        return hashlib.sha256(f"{channel.upper()}\x00{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, channel, message):
+        """Returns the cached result ("false" or a signal dict), or None on a miss."""
+        key = self.make_key(channel, message)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            entry = GeminiParseCache.objects.filter(key=key).values_list('result', 'latency_ms').first()
+            if entry is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            entry = ("false" if entry[0] is False else entry[0], entry[1])
+            self._remember(key, entry)
+
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += entry[1] / 1000
+            self._pending_hits[key] += 1
+            flush_due = time.monotonic() >= self._flushed_at + self.flush_interval
+        if flush_due:
+            self.flush_hits()
+        return entry[0]
+
+    def flush_hits(self):
+        """Adds the hits counted since the last flush to the table, one UPDATE per distinct count."""
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, Counter()
+            self._flushed_at = time.monotonic()
+        keys_by_count = {}
+        for key, count in pending.items():
+            keys_by_count.setdefault(count, []).append(key)
+        try:
+            for count, keys in keys_by_count.items():
+                GeminiParseCache.objects.filter(key__in=keys).update(hits=F('hits') + count)
+        except Exception as e:
+            # Keep the counts for the next flush rather than losing them
+            with self._lock:
+                self._pending_hits.update(pending)
+            logger.warning(f"Could not flush Gemini cache hit counts: {e}")
+
+    def set(self, channel, message, result, latency_seconds):
+        """
+        Stores a Gemini result along with the latency it took to produce. Written as an
+        upsert, so two workers storing the same message at once do not conflict.
+        """
+        key = self.make_key(channel, message)
+        latency_ms = int(latency_seconds * 1000)
+        GeminiParseCache.objects.bulk_create(
+            [GeminiParseCache(key=key, channel=channel.upper(), result=False if result == "false" else result, latency_ms=latency_ms)],
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['channel', 'result', 'latency_ms', 'updated_at'],
+        )
+        self._remember(key, (result, latency_ms))
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending_hits.clear()
+
+    def stats(self):
+        """Hit ratio and Gemini latency saved by this process."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'saved_seconds': self.saved_seconds,
+                'size': len(self._entries),
+            }
+
+    def persisted_stats(self):
+        """
+        Totals across every worker, from the gemini_parse_cache table. This process's
+        hits are flushed first; other workers' hits show up after their next flush.
+        """
+        self.flush_hits()
+        totals = GeminiParseCache.objects.aggregate(total_hits=Sum('hits'), saved_ms=Sum(F('hits') * F('latency_ms')))
+        return {
+            'entries': GeminiParseCache.objects.count(),
+            'hits': totals['total_hits'] or 0,
+            'saved_seconds': (totals['saved_ms'] or 0) / 1000,
+        }
+
+
+gemini_cache = GeminiResultCache(
+    max_entries=getattr(settings, 'GEMINI_CACHE_MAX_ENTRIES', 1024),
+    flush_interval=getattr(settings, 'GEMINI_CACHE_HIT_FLUSH_INTERVAL', 30),
+)
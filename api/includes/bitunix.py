@@ -1,10 +1,70 @@
 import os
 import json
+import time
+import uuid
+import hashlib
 import logging
+import urllib.error
+import urllib.parse
+import urllib.request
+from decimal import Decimal
+
+from api.includes.exchanges import (
+    AccountSnapshot, ExchangeAdapter, ExchangeAPIError, SplicedOrderTemplate, register_exchange_adapter,
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+BITUNIX_API_URL = "https://fapi.bitunix.com"
+
+
+class BitunixClient:
+    """
+    Minimal signed client for the Bitunix futures REST API. Only the calls the
+    signal service needs are implemented; orders are placed by the trader behind
+    Bitunix_Queue.
+    """
+
+    def __init__(self, base_url=BITUNIX_API_URL, timeout=10):
+        self.base_url = base_url
+        self.timeout = timeout
+
+    @staticmethod
+    def sign(api_key, api_secret, nonce, timestamp, query_params='', body=''):
+        """Bitunix request signature: sha256(sha256(nonce + timestamp + key + params + body) + secret)."""
+        digest = hashlib.sha256(f"{nonce}{timestamp}{api_key}{query_params}{body}".encode('utf-8')).hexdigest()
+        return hashlib.sha256(f"{digest}{api_secret}".encode('utf-8')).hexdigest()
+
+    def get(self, path, params, api_key, api_secret):
+        """Sends a signed GET request and returns the response's data field."""
+        nonce = uuid.uuid4().hex
+        timestamp = str(int(time.time() * 1000))
+        # Signed parameters are sorted by name and concatenated without separators
+        query_params = ''.join(f"{key}{value}" for key, value in sorted(params.items()))
+        request = urllib.request.Request(
+            f"{self.base_url}{path}?{urllib.parse.urlencode(params)}",
+            headers={
+                'api-key': api_key,
+                'nonce': nonce,
+                'timestamp': timestamp,
+                'sign': self.sign(api_key, api_secret, nonce, timestamp, query_params),
+                'Content-Type': 'application/json',
+            },
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.loads(response.read())
+        except (urllib.error.URLError, TimeoutError, ValueError) as e:
+            raise ExchangeAPIError(f"Bitunix {path} request failed: {e}") from e
+        if payload.get('code') != 0:
+            raise ExchangeAPIError(f"Bitunix {path} returned code {payload.get('code')}: {payload.get('msg')}")
+        return payload.get('data')
+
+    def get_account(self, api_key, api_secret, margin_coin='USDT'):
+        """Returns the futures account entries for a margin coin."""
+        return self.get('/api/v1/futures/account', {'marginCoin': margin_coin}, api_key, api_secret)
+
 def createBitunixOrder(signal_message, user_data_item):
     """
     Creates a Bitunix-specific order payload based on the signal and user data.
@@ -13,9 +73,10 @@ def createBitunixOrder(signal_message, user_data_item):
     is_closing_trade = signal_message.get('tradeSide') == 'CLOSE'
     position_id = user_data_item.get('position_id') if is_closing_trade else None
     
-    # TODO: Trade quantity calculation logic is needed here for opening trades.
-    # For now, using the quantity from the closing trade if available.
-    trade_qty = user_data_item.get('trade_qty') # This will be None for opening trades
+    # Opening trades are sized by sizeOpenTrades; closing trades reuse the open trade's quantity.
+    trade_qty = user_data_item.get('trade_qty')
+    # The price rounded to the symbol's tick size when the order was sized
+    price = user_data_item.get('order_price', signal_message['price'])
 
     # Start with a base order structure
     order = {
@@ -23,8 +84,8 @@ def createBitunixOrder(signal_message, user_data_item):
         "orderList": [
             {
                 "side": signal_message['side'],  # Dynamically set from signal
-                "price": f"{signal_message['price']}",
-                "qty": trade_qty,  # Will be None for open trades until qty calculation is added
+                "price": f"{price}",
+                "qty": trade_qty,  # None when the order could not be sized
                 "orderType": f"{signal_message['orderType']}",
                 "reduceOnly": "true" if is_closing_trade else "false",
                 "effect": "GTC",
@@ -54,4 +115,40 @@ def createBitunixOrder(signal_message, user_data_item):
             "slOrderPrice": f"{signal_message['slOrderPrice']}"
         })
 
-    return order
\ No newline at end of file
+    return order
+
+
+@register_exchange_adapter
+class BitunixAdapter(ExchangeAdapter):
+    """Orders for Bitunix futures, consumed from Bitunix_Queue."""
+    name = 'Bitunix'
+    supports_balances = True
+
+    client = BitunixClient()
+
+    def build_order(self, signal_message, user_item):
+        return createBitunixOrder(signal_message, user_item)
+
+    def order_template(self, signal_message):
+        # Only the quantity, sized price and position id differ between subscribers
+        marker = SplicedOrderTemplate.PER_USER_MARKER.format
+        order = createBitunixOrder(signal_message, {
+            'trade_qty': marker('qty'), 'order_price': marker('price'), 'position_id': marker('positionId'),
+        })
+        return SplicedOrderTemplate(self, signal_message, order, {
+            'qty': lambda user_item: user_item.get('trade_qty'),
+            'price': lambda user_item: f"{user_item.get('order_price', signal_message['price'])}",
+            'positionId': lambda user_item: user_item.get('position_id'),
+        })
+
+    def fetch_balance(self, api_key, api_secret):
+        data = self.client.get_account(api_key, api_secret)
+        account = data[0] if isinstance(data, list) and data else data
+        if not account:
+            raise ExchangeAPIError("Bitunix returned no futures account.")
+        available = Decimal(str(account['available']))
+        equity = available + sum(
+            Decimal(str(account.get(field) or 0))
+            for field in ('frozen', 'margin', 'crossUnrealizedPNL', 'isolationUnrealizedPNL')
+        )
+        return AccountSnapshot(currency=account.get('marginCoin', 'USDT'), available=available, equity=equity)
@@ -0,0 +1,163 @@
+import json
+import logging
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:  # optional: pip install 'django-project[fast-json]'
+    orjson = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------
+# Exchange adapters.
+#
+# Each supported exchange provides an ExchangeAdapter that builds its order
+# payload, names the SQS queue its trader consumes and serializes the queued
+# message. Adapters register themselves under their SupportedExchange.name;
+# the adapter modules are imported once at startup (ApiConfig.ready), so
+# createTrade resolves an exchange with a single dict lookup. Adapters also
+# fetch account balances for the refresh_balances command.
+#
+# Per signal, createTrade asks each adapter for an OrderTemplate. The template
+# renders every subscriber's SQS message body. Adapters can precompute and
+# serialize the signal-level part of the order once, so each subscriber only
+# costs splicing in their own fields.
+# -------------------------------------------------------------------------
+
+EXCHANGE_ADAPTERS = {}
+
+
+class ExchangeAPIError(Exception):
+    """Raised when an exchange API call fails or returns an error response."""
+
+
+class AccountSnapshot(NamedTuple):
+    """An exchange account's balance at the time it was fetched."""
+    currency: str
+    available: Decimal
+    equity: Optional[Decimal]
+
+
+def _encode_default(value):
+    # Prices and quantities read from DecimalFields (e.g. a closing trade's trade_qty) are
+    # sent as plain decimal strings, the same form as the strings sizing produces
+    if isinstance(value, Decimal):
+        return format(value.normalize() or Decimal(0), 'f')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# json.dumps builds a new encoder per call when given options, so keep one
+_json_encoder = json.JSONEncoder(separators=(',', ':'), default=_encode_default)
+
+def dumps(value) -> str:
+    """Compact JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_encode_default).decode('utf-8')
+    return _json_encoder.encode(value)
+
+
+class OrderTemplate:
+    """
+    An exchange order for one signal. render() returns one subscriber's SQS message body.
+
+    This default builds and serializes every subscriber's order in full, merging it into
+    the subscriber's user data as before; adapters override order_template to do better.
+    """
+
+    def __init__(self, adapter, signal_message: dict):
+        self.adapter = adapter
+        self.signal_message = signal_message
+
+    def render(self, user_item: dict) -> str:
+        user_item.update(self.adapter.build_order(self.signal_message, user_item))
+        return self.adapter.serialize(user_item)
+
+
+class SplicedOrderTemplate(OrderTemplate):
+    """
+    An order whose signal-level JSON is serialized once. The order is built with a marker
+    in place of each per-subscriber value; render() serializes the subscriber's user data
+    and splices their values in at the markers.
+
+    Args:
+        order: The order dict, built with PER_USER_MARKER.format(field) as the value of
+            every per-subscriber field.
+        fields: {field: function(user_item) -> value} for each marked field.
+    """
+    PER_USER_MARKER = "@@{}@@"
+
+    def __init__(self, adapter, signal_message: dict, order: dict, fields: dict):
+        super().__init__(adapter, signal_message)
+        self.fields = fields
+        order_json = dumps(order)[1:]
+        # Where each field's (quoted) marker appears; fields the order does not use are dropped
+        found = sorted(
+            (order_json.find(marker), marker, field)
+            for marker, field in ((dumps(self.PER_USER_MARKER.format(field)), field) for field in fields)
+            if marker in order_json
+        )
+        # Alternating literal JSON and field names, without the order's opening brace
+        self.parts = []
+        start = 0
+        for position, marker, field in found:
+            self.parts += [order_json[start:position], field]
+            start = position + len(marker)
+        self.parts.append(order_json[start:])
+
+    def render(self, user_item: dict) -> str:
+        user_json = dumps(user_item)
+        chunks = [user_json[:-1], ',' if len(user_json) > 2 else '']
+        for index, part in enumerate(self.parts):
+            chunks.append(dumps(self.fields[part](user_item)) if index % 2 else part)
+        return ''.join(chunks)
+
+
+class ExchangeAdapter:
+    """
+    Base class for exchange adapters. Subclasses set `name` to the exchange's
+    SupportedExchange.name and implement build_order, and set `supports_balances`
+    when they implement fetch_balance.
+    """
+    name = None
+    supports_balances = False
+
+    @property
+    def queue_name(self):
+        """Name of the SQS queue the exchange's trader reads from."""
+        return f"{self.name}_Queue"
+
+    def build_order(self, signal_message: dict, user_item: dict) -> dict:
+        """
+        Returns the exchange-specific order fields for one subscriber; they are merged
+        into the subscriber's queued payload.
+        """
+        raise NotImplementedError
+
+    def serialize(self, user_trade: dict) -> str:
+        """Returns the SQS message body for one subscriber's trade."""
+        return dumps(user_trade)
+
+    def order_template(self, signal_message: dict) -> OrderTemplate:
+        """Returns the OrderTemplate rendering this signal's per-subscriber message bodies."""
+        return OrderTemplate(self, signal_message)
+
+    def fetch_balance(self, api_key: str, api_secret: str) -> AccountSnapshot:
+        """
+        Returns the account's current balance. Raises ExchangeAPIError when the exchange
+        call fails. Only called on adapters with `supports_balances` set.
+        """
+        raise NotImplementedError
+
+
+def register_exchange_adapter(adapter_class):
+    """Class decorator registering an adapter instance under its exchange name."""
+    if not adapter_class.name:
+        raise ValueError(f"{adapter_class.__name__} must set an exchange name.")
+    EXCHANGE_ADAPTERS[adapter_class.name] = adapter_class()
+    return adapter_class
+
+def get_exchange_adapter(exchange_name: str):
+    """Returns the adapter registered for a SupportedExchange name, or None."""
+    return EXCHANGE_ADAPTERS.get(exchange_name)
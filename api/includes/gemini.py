@@ -1,11 +1,23 @@
 import os
-import json
+import asyncio
+import time
 import logging
 import google.generativeai as genai
 from google.generativeai.types import generation_types
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.db import transaction
-
-from api.models import Strategy, HRJDiscordSignal, HRJTakeProfitTrade, FJDiscordSignal, FJTakeProfitTrade, SIGSCANDiscordSignal, SIGSCANTakeProfitTrade
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import Strategy, BanditMessages, DiscordSignal, TakeProfitTrade
+from api.caches import getCachedStrategy, gemini_cache
+from api.includes.signal_parser import parse_signal
+from api.includes.prefilter import prefilter
+from api.includes.signal_schemas import generation_config, validate_response, validate_batch_response
+from api.includes.gemini_client import AsyncGeminiClient, CircuitOpenError, ModelHandles
+from api.includes.prompt_registry import prompt_registry
 #from dotenv import load_dotenv
 
 # -------------------------------------------------------------------------
@@ -24,31 +36,17 @@ genai.configure(api_key=api_key)
 # PROMPT TEMPLATES
 # -------------------------------------------------------------------------
 
-HRJ_TEMPLATE = """
-You are a trading signal parser. Your goal is to extract structured JSON data from Discord messages based on specific Django models.
-
+INSTRUCTIONS = """
 ### INSTRUCTIONS:
 1. Analyze the "INPUT MESSAGE" below.
 2. Determine if it is a valid trading signal based on the examples provided.
-3. If it is NOT a signal (e.g., status updates, chat, target hit notifications), output exactly the string: "false".
-4. If it IS a signal, output valid JSON matching the schema below.
-5. Do not include markdown formatting (like ```json) in your response.
-
-### DJANGO MODELS REFERENCE:
-class HRJDiscordSignals(models.Model):
-    strategy = models.ForeignKey(Strategy, on_delete=models.CASCADE, db_column='strategy_id', blank=True, null=True)
-    asset = models.CharField(max_length=255)
-    trade_type = models.CharField(max_length=5, choices=[('long', 'Long'), ('short', 'Short')])
-    leverage = models.IntegerField(default=1)
-    balance = models.DecimalField(max_digits=12, decimal_places=2)
-    entry_price = models.DecimalField(max_digits=20, decimal_places=10)
-    entry_order_type = models.CharField(max_length=6, choices=[('market', 'Market'), ('limit', 'Limit')])
-    stop_loss = models.DecimalField(max_digits=20, decimal_places=10)
-class HRJTakeProfitTrades(models.Model):
-    signal = models.ForeignKey(HRJDiscordSignals, on_delete=models.CASCADE, db_column='signal_id')
-    series_num = models.IntegerField(default=1)
-    tp_price = models.DecimalField(max_digits=20, decimal_places=10)
+3. If it is NOT a signal (e.g., status updates, chat, target hit notifications), respond with {"is_signal": false, "signal": null}.
+4. If it IS a signal, set "is_signal" to true and fill "signal" following the response schema.
+"""
 
+HRJ_TEMPLATE = """
+You are a trading signal parser. Your goal is to extract structured JSON data from Discord messages.
+""" + INSTRUCTIONS + """
 ### FEW-SHOT EXAMPLES:
 
 Example 1 (Signal):
@@ -65,58 +63,22 @@ SL: 9.89
 R:R: 8
 
 Output:
-{
-  "HRJDiscordSignals": {
-    "asset": "LINK/USDT",
-    "trade_type": "long",
-    "leverage": 5,
-    "balance": 3.00,
-    "entry_price": 12.32,
-    "entry_order_type": "limit",
-    "stop_loss": 9.89
-  },
-  "HRJTakeProfitTrades": [
-    { "series_num": 1, "tp_price": 14.92 },
-    { "series_num": 2, "tp_price": 18.73 },
-    { "series_num": 3, "tp_price": 24.16 },
-    { "series_num": 4, "tp_price": 31.87 }
-  ]
-}
+{"is_signal": true, "signal": {"asset": "LINK/USDT", "trade_type": "long", "leverage": 5, "balance": 3.00, "entry_price": 12.32, "entry_order_type": "limit", "stop_loss": 9.89, "take_profits": [{"series_num": 1, "tp_price": 14.92}, {"series_num": 2, "tp_price": 18.73}, {"series_num": 3, "tp_price": 24.16}, {"series_num": 4, "tp_price": 31.87}]}}
 
 Example 2 (Non-Signal):
 Input:
 ✅  The first target of this BTC/USDT was reached @Brigade ⚔️
 
 Output:
-false
+{"is_signal": false, "signal": null}
 
 ### INPUT MESSAGE TO PROCESS:
 """
 
 FJ_TEMPLATE = """
-You are a trading signal parser. Your goal is to extract structured JSON data from Discord messages based on specific Django models.
+You are a trading signal parser. Your goal is to extract structured JSON data from Discord messages.
 Note: Inputs may use commas (,) for decimals. You must convert these to dots (.) for the JSON output.
-
-### INSTRUCTIONS:
-1. Analyze the "INPUT MESSAGE" below.
-2. Determine if it is a valid trading signal based on the examples provided.
-3. If it is NOT a signal (e.g., status updates, chat, target hit notifications), output exactly the string: "false".
-4. If it IS a signal, output valid JSON matching the schema below.
-5. Do not include markdown formatting (like ```json) in your response.
-
-### DJANGO MODELS REFERENCE:
-class FJDiscordSignals(models.Model):
-    strategy = models.ForeignKey(Strategy, on_delete=models.CASCADE, db_column='strategy_id', blank=True, null=True)
-    asset = models.CharField(max_length=255)
-    trade_type = models.CharField(max_length=5, choices=[('long', 'Long'), ('short', 'Short')])
-    entry_price = models.DecimalField(max_digits=20, decimal_places=10)
-    entry_order_type = models.CharField(max_length=6, choices=[('market', 'Market'), ('limit', 'Limit')])
-    stop_loss = models.DecimalField(max_digits=20, decimal_places=10)
-class FJTakeProfitTrades(models.Model):
-    signal = models.ForeignKey(FJDiscordSignals, on_delete=models.CASCADE, db_column='signal_id')
-    series_num = models.IntegerField()
-    tp_price = models.DecimalField(max_digits=20, decimal_places=10)
-
+""" + INSTRUCTIONS + """
 ### FEW-SHOT EXAMPLES:
 
 Example 1 (Signal):
@@ -134,61 +96,26 @@ SL: 114,04
 R:R: 10,07
 
 Output:
-{
-  "FJDiscordSignals": {
-    "asset": "SOL/USDT",
-    "trade_type": "long",
-    "entry_price": 127.70,
-    "entry_order_type": "limit",
-    "stop_loss": 114.04
-  },
-  "FJTakeProfitTrades": [
-    { "series_num": 1, "tp_price": 134.66 },
-    { "series_num": 2, "tp_price": 143.16 },
-    { "series_num": 3, "tp_price": 155.97 },
-    { "series_num": 4, "tp_price": 180.23 },
-    { "series_num": 5, "tp_price": 200.41 },
-    { "series_num": 6, "tp_price": 224.49 },
-    { "series_num": 7, "tp_price": 261.90 }
-  ]
-}
+{"is_signal": true, "signal": {"asset": "SOL/USDT", "trade_type": "long", "entry_price": 127.70, "entry_order_type": "limit", "stop_loss": 114.04, "take_profits": [{"series_num": 1, "tp_price": 134.66}, {"series_num": 2, "tp_price": 143.16}, {"series_num": 3, "tp_price": 155.97}, {"series_num": 4, "tp_price": 180.23}, {"series_num": 5, "tp_price": 200.41}, {"series_num": 6, "tp_price": 224.49}, {"series_num": 7, "tp_price": 261.90}]}}
 
 Example 2 (Non-Signal):
 Input:
 TP 1 was reached @Brigade ⚔️
 
 Output:
-false
+{"is_signal": false, "signal": null}
 
 ### INPUT MESSAGE TO PROCESS:
 """
 
 SIGSCAN_TEMPLATE = """
-You are a trading signal parser. Your goal is to extract structured JSON data from Discord messages based on specific Django models.
+You are a trading signal parser. Your goal is to extract structured JSON data from Discord messages.
 Note: Inputs may use commas (,) for decimals. You must convert these to dots (.) for the JSON output.
-
-### INSTRUCTIONS:
-1. Analyze the "INPUT MESSAGE" below.
-2. Determine if it is a valid trading signal based on the examples provided.
-3. If it is NOT a signal (e.g., status updates, chat, target hit notifications), output exactly the string: "false".
-4. If it IS a signal, output valid JSON matching the schema below.
-5. Do not include markdown formatting (like ```json) in your response.
-
-### DJANGO MODELS REFERENCE:
-class SIGSCANDiscordSignals(models.Model):
-    strategy = models.ForeignKey(Strategy, on_delete=models.CASCADE, db_column='strategy_id', blank=True, null=True)
-    asset = models.CharField(max_length=255)
-    trade_type = models.CharField(max_length=5, choices=[('long', 'Long'), ('short', 'Short')])
-    entry_price = models.DecimalField(max_digits=20, decimal_places=10)
-    entry_order_type = models.CharField(max_length=6, choices=[('market', 'Market'), ('limit', 'Limit')])
-    stop_loss = models.DecimalField(max_digits=20, decimal_places=10)
-class SIGSCANTakeProfitTrades(models.Model):
-    signal = models.ForeignKey(SIGSCANDiscordSignals, on_delete=models.CASCADE, db_column='signal_id')
-    series_num = models.IntegerField()
-    tp_price = models.DecimalField(max_digits=20, decimal_places=10)
-
+""" + INSTRUCTIONS + """
 ### FEW-SHOT EXAMPLES:
 
+Example 1 (Signal):
+Input:
 VIRTUAL/USDT 4h (SHORT)  |  Confluence 76/100  |  R:R 3.87
 Reasons: Supply anchored at swing high; Supply reaction + reject; Liquidity sweep (buy-side) + reject; Structure weakening (close < EMA50); Compression (BBW low); Displacement present
 
@@ -206,28 +133,14 @@ R:R: 3.87
 Image: tradefly_out/VIRTUAL_USDT_4h_SHORT.png
 
 Output:
-{
-  "SIGSCANDiscordSignals": {
-    "asset": "VIRTUALUSDT",
-    "trade_type": "short",
-    "entry_price": 0.722,
-    "entry_order_type": "limit",
-    "stop_loss": 0.728
-  },
-  "SIGSCANTakeProfitTrades": [
-    { "series_num": 1, "tp_price": 0.697 },
-    { "series_num": 2, "tp_price": 0.693 },
-    { "series_num": 3, "tp_price": 0.689 },
-    { "series_num": 4, "tp_price": 0.688 }
-  ]
-}
+{"is_signal": true, "signal": {"asset": "VIRTUALUSDT", "trade_type": "short", "entry_price": 0.722, "entry_order_type": "limit", "stop_loss": 0.728, "take_profits": [{"series_num": 1, "tp_price": 0.697}, {"series_num": 2, "tp_price": 0.693}, {"series_num": 3, "tp_price": 0.689}, {"series_num": 4, "tp_price": 0.688}]}}
 
 Example 2 (Non-Signal):
 Input:
 TP 1 was reached @Brigade ⚔️
 
 Output:
-false
+{"is_signal": false, "signal": null}
 
 ### INPUT MESSAGE TO PROCESS:
 """
@@ -236,54 +149,74 @@ false
 # FUNCTIONS
 # -------------------------------------------------------------------------
 
+# One template per entry in api.includes.signal_sources.SIGNAL_SOURCES
+PROMPT_TEMPLATES = {
+    "HRJ": HRJ_TEMPLATE,
+    "FJ": FJ_TEMPLATE,
+    "SIGSCAN": SIGSCAN_TEMPLATE,
+}
+for signal_type, template in PROMPT_TEMPLATES.items():
+    prompt_registry.register(signal_type, template)
+
+BATCH_INSTRUCTIONS = """
+### BATCH MODE:
+The input below contains {count} separate Discord messages, each introduced by a line "### MESSAGE <number>".
+Apply the instructions above to every message independently.
+Respond with a JSON array of exactly {count} responses, in message order.
+
+### INPUT MESSAGES TO PROCESS:
+"""
+
 def generate_prompt(signal_type: str, message_content: str) -> str:
     """
-    Generates the appropriate prompt based on the signal type (HRJ or FJ).
+    Generates the appropriate prompt based on the signal type (a SIGNAL_SOURCES key).
     """
-    if signal_type.upper() == "HRJ":
-        return HRJ_TEMPLATE + f"\n{message_content}"
-    elif signal_type.upper() == "FJ":
-        return FJ_TEMPLATE + f"\n{message_content}"
-    elif signal_type.upper() == "SIGSCAN":
-        return SIGSCAN_TEMPLATE + f"\n{message_content}"
-    else:
-        raise ValueError("Invalid signal_type. Must be 'HRJ' or 'FJ' or 'SIGSCAN'.")
+    return prompt_registry.get(signal_type).prefix + message_content
 
-def call_gemini_api(prompt: str):
+def generate_batch_prompt(signal_type: str, messages: list) -> str:
+    """
+    Generates one prompt asking for a JSON array of responses, one per message.
+    The few-shot template is sent once for the whole batch.
     """
-    Calls the Gemini API with a given prompt and returns the cleaned response.
+    head = prompt_registry.get(signal_type).head
+    body = "".join(f"\n### MESSAGE {number}\n{message}\n" for number, message in enumerate(messages, start=1))
+    return head + BATCH_INSTRUCTIONS.format(count=len(messages)) + body
+
+_models = None
+
+def get_model(cached_content=None):
+    """Returns the shared Gemini model handle (per context cache), creating it on first use."""
+    global _models
+    if _models is None:
+        _models = ModelHandles(settings.GEMINI_MODEL)
+    return _models.get(cached_content)
+
+def call_gemini_api(prompt: str, signal_type: str):
+    """
+    Calls the Gemini API with a given prompt, forcing JSON output in the signal type's schema.
 
     Args:
         prompt: The prompt to send to the Gemini API.
+        signal_type: The type of signal (a SIGNAL_SOURCES key, e.g. 'HRJ'), which selects the response schema.
 
     Returns:
-        A dictionary from the parsed JSON, the string "false", or None on error.
+        A dictionary of model-ready signal data, the string "false", or None on error.
     """
     if not api_key:
         logger.error("GEMINI_API_KEY not found.")
         return None
 
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-
-        # Clean up potential markdown fences that the LLM might add despite instructions
-        if response_text.startswith("```json"):
-            response_text = response_text[7:-3].strip()
-        elif response_text.startswith("```"):
-             response_text = response_text[3:-3].strip()
-
-        if response_text.lower() == "false":
-            logger.info("Gemini API call returned 'false'.")
-            return "false"
-
-        # Attempt to parse the cleaned text as JSON
-        return json.loads(response_text)
+        contents, cached_content = prompt_registry.for_request(signal_type, prompt)
+        start = time.perf_counter()
+        response = get_model(cached_content).generate_content(
+            contents,
+            generation_config=generation_config(signal_type),
+            request_options={'timeout': settings.GEMINI_TIMEOUT},
+        )
+        prompt_registry.record_usage(signal_type, response, time.perf_counter() - start)
+        return validate_response(signal_type, response.text)
 
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON from Gemini API response: {response_text}")
-        return None
     except generation_types.BlockedPromptError as e:
         logger.error(f"Gemini API call blocked due to a prompt safety issue: {e}")
         return None
@@ -291,72 +224,376 @@ def call_gemini_api(prompt: str):
         logger.error(f"An unexpected error occurred while calling the Gemini API: {e}", exc_info=True)
         return None
 
-@transaction.atomic
+def parse_signal_message_offline(signal_type: str, message_content: str):
+    """
+    Parses a Discord message with the local regex parser, the pre-filter (in enforce
+    mode) or a cached Gemini result.
+
+    Returns:
+        A dictionary of signal data, the string "false", or None if Gemini is needed.
+    """
+    signal_data, confidence = parse_signal(signal_type, message_content)
+    if signal_data is not None and confidence >= settings.LOCAL_PARSER_MIN_CONFIDENCE:
+        logger.info(f"Parsed {signal_type} message locally (confidence {confidence:.2f}).")
+        return signal_data
+
+    if prefilter.rejects(message_content):
+        logger.info(f"Pre-filter rejected {signal_type} message without calling Gemini.")
+        return "false"
+
+    cached = gemini_cache.get(signal_type, message_content)
+    if cached is not None:
+        logger.info(f"Using cached Gemini result for {signal_type} message.")
+        return cached
+
+    logger.debug(f"Local parse of {signal_type} message inconclusive (confidence {confidence:.2f}), calling Gemini.")
+    return None
+
+def parse_signal_message(signal_type: str, message_content: str):
+    """
+    Parses a Discord message, trying the local regex parser before Gemini.
+
+    Gemini is only called when the local parser cannot read the message or scores
+    it below LOCAL_PARSER_MIN_CONFIDENCE, the pre-filter does not reject it, and the
+    same message has not already been parsed (see GeminiResultCache).
+
+    Returns:
+        A dictionary of signal data, the string "false", or None on error.
+    """
+    result = parse_signal_message_offline(signal_type, message_content)
+    if result is not None:
+        return result
+
+    start = time.perf_counter()
+    result = call_gemini_api(generate_prompt(signal_type, message_content), signal_type)
+    if result is not None:
+        gemini_cache.set(signal_type, message_content, result, time.perf_counter() - start)
+    prefilter.observe(signal_type, message_content, result)
+    return result
+
+async def request_gemini_async(client: AsyncGeminiClient, signal_type: str, prompt: str, config, messages: int = 1):
+    """
+    Sends a rendered prompt through the client, using the channel's context cache when
+    one is live, and records the request's token usage.
+    """
+    contents, cached_content = await prompt_registry.for_request_async(signal_type, prompt)
+    start = time.perf_counter()
+    response = await client.generate(contents, config, cached_content=cached_content)
+    await sync_to_async(prompt_registry.record_usage)(signal_type, response, time.perf_counter() - start, messages)
+    return response
+
+async def parse_signal_message_async(signal_type: str, message_content: str, client: AsyncGeminiClient, batcher=None):
+    """
+    Same as parse_signal_message, but calls Gemini through the given AsyncGeminiClient,
+    or through `batcher` (a GeminiBatcher) when one is given.
+    Database work (the persisted Gemini cache) runs in a worker thread.
+
+    Raises:
+        GeminiClientError: If Gemini could not be reached (CircuitOpenError while the breaker is open).
+
+    Returns:
+        A dictionary of signal data, the string "false", or None if the response could not be decoded.
+    """
+    result = await sync_to_async(parse_signal_message_offline)(signal_type, message_content)
+    if result is not None:
+        return result
+
+    start = time.perf_counter()
+    if batcher is not None:
+        result = await batcher.parse(signal_type, message_content)
+    else:
+        response = await request_gemini_async(client, signal_type, generate_prompt(signal_type, message_content), generation_config(signal_type))
+        result = validate_response(signal_type, response.text)
+    if result is not None:
+        await sync_to_async(gemini_cache.set)(signal_type, message_content, result, time.perf_counter() - start)
+    await sync_to_async(prefilter.observe)(signal_type, message_content, result)
+    return result
+
+# Gemini responses carry the signal under "<TYPE>DiscordSignals" and its take-profit
+# ladder under "<TYPE>TakeProfitTrades". Every channel is saved to DiscordSignal with
+# the type as its source; a channel is accepted when a strategy of the same name exists.
+
+def split_signal_data(signal_data: dict, signal_type: str):
+    """
+    Returns the (main signal fields, take-profit list) pair from a parsed response.
+    Raises ValueError if the main signal key is missing.
+    """
+    main_signal_data = signal_data.get(f"{signal_type}DiscordSignals", {})
+    take_profit_data = signal_data.get(f"{signal_type}TakeProfitTrades", [])
+    if not main_signal_data:
+        raise ValueError(f"{signal_type}DiscordSignals key not found in response.")
+    return main_signal_data, take_profit_data
+
 def save_signal_from_gemini_response(signal_data: dict, signal_type: str):
     """
-    Saves the parsed signal data from Gemini into the appropriate Django models.
+    Saves the parsed signal data from Gemini as a DiscordSignal and its TakeProfitTrades.
+    The take-profit ladder is written with a single bulk insert.
 
     Args:
         signal_data: The dictionary containing the parsed signal data.
-        signal_type: The type of signal ('HRJ' or 'FJ').
+        signal_type: The type of signal (e.g. 'HRJ', 'FJ' or 'SIGSCAN'), stored as the source.
 
     Returns:
-        The created signal object or None on error.
+        The created DiscordSignal or None on error.
     """
+    signal_type = signal_type.upper()
+
     try:
         # Look up the strategy by name
-        strategy = Strategy.objects.get(name=signal_type.upper())
+        strategy = getCachedStrategy(name=signal_type)
     except Strategy.DoesNotExist:
-        logger.error(f"No strategy found linked to a SignalTrigger with name='{signal_type.lower()}''.")
+        logger.error(f"No strategy found with name='{signal_type}'.")
+        return None
+
+    try:
+        main_signal_data, take_profit_data = split_signal_data(signal_data, signal_type)
+        with transaction.atomic():
+            signal = DiscordSignal.objects.create(strategy_id=strategy.strategy_id, source=signal_type, **main_signal_data)
+            TakeProfitTrade.objects.bulk_create([TakeProfitTrade(signal=signal, **tp) for tp in take_profit_data])
+
+        logger.info(f"Successfully created {signal_type} Signal {signal.id} for strategy '{strategy.name}'.")
+        return signal
+
+    except Exception as e:
+        # The atomic block has already rolled back any partial writes.
+        logger.error(f"Error saving signal data to database: {e}", exc_info=True)
         return None
 
+def save_signals_from_gemini_responses(parsed_signals):
+    """
+    Saves many parsed signals in one transaction, e.g. when replaying BanditMessages history.
+    All sources share one bulk insert into each of DiscordSignal and TakeProfitTrade.
+
+    Args:
+        parsed_signals: An iterable of (signal_data, signal_type) pairs.
+
+    Returns:
+        A dict of table name -> rows inserted, or None if the transaction was rolled back.
+        Entries with a missing strategy or a malformed payload are skipped.
+    """
+    pending = {}
+    for signal_data, signal_type in parsed_signals:
+        signal_type = signal_type.upper()
+        try:
+            pending.setdefault(signal_type, []).append(split_signal_data(signal_data, signal_type))
+        except ValueError as e:
+            logger.warning(f"Skipping malformed {signal_type} signal: {e}")
+
+    signals, take_profit_data = [], []
+    for signal_type, items in pending.items():
+        try:
+            strategy = getCachedStrategy(name=signal_type)
+        except Strategy.DoesNotExist:
+            logger.error(f"No strategy found with name='{signal_type}', skipping {len(items)} signal(s).")
+            continue
+        for main_signal_data, ladder in items:
+            signals.append(DiscordSignal(strategy_id=strategy.strategy_id, source=signal_type, **main_signal_data))
+            take_profit_data.append(ladder)
+
     try:
-        if signal_type.upper() == "HRJ":
-            main_signal_data = signal_data.get("HRJDiscordSignals", {})
-            take_profit_data = signal_data.get("HRJTakeProfitTrades", [])
+        with transaction.atomic():
+            signals = DiscordSignal.objects.bulk_create(signals)
+            take_profits = TakeProfitTrade.objects.bulk_create([
+                TakeProfitTrade(signal=signal, **tp)
+                for signal, ladder in zip(signals, take_profit_data)
+                for tp in ladder
+            ])
+    except Exception as e:
+        logger.error(f"Error saving signal batch to database: {e}", exc_info=True)
+        return None
+
+    row_counts = {DiscordSignal._meta.db_table: len(signals), TakeProfitTrade._meta.db_table: len(take_profits)}
+    logger.info(f"Saved signal batch: {row_counts}")
+    return row_counts
 
-            if not main_signal_data:
-                raise ValueError("HRJDiscordSignals key not found in response.")
 
-            signal = HRJDiscordSignal.objects.create(strategy=strategy, **main_signal_data)
+# -------------------------------------------------------------------------
+# MICRO-BATCHING
+# -------------------------------------------------------------------------
 
-            for tp in take_profit_data:
-                HRJTakeProfitTrade.objects.create(signal=signal, **tp)
-            
-            logger.info(f"Successfully created HRJ Signal {signal.id} for strategy '{strategy.name}'.")
-            return signal
+class GeminiBatcher:
+    """
+    Collects messages per channel for up to `window` seconds (or until `max_size` are
+    waiting) and sends them to Gemini as one batch prompt, so a burst in a busy channel
+    costs one request and one copy of the few-shot template instead of one per message.
 
-        elif signal_type.upper() == "FJ":
-            main_signal_data = signal_data.get("FJDiscordSignals", {})
-            take_profit_data = signal_data.get("FJTakeProfitTrades", [])
+    A batch of one is sent with the regular single-message prompt. If a batch response
+    cannot be split back into per-message verdicts, its messages are retried one by one.
+    """
 
-            if not main_signal_data:
-                raise ValueError("FJDiscordSignals key not found in response.")
+    def __init__(self, client: AsyncGeminiClient, window: float = None, max_size: int = None):
+        self.client = client
+        self.window = settings.GEMINI_BATCH_WINDOW if window is None else window
+        self.max_size = max_size or settings.GEMINI_BATCH_MAX_SIZE
+        self._pending = {}
+        self._timers = {}
+        self._tasks = set()
+
+    async def parse(self, signal_type: str, message_content: str):
+        """
+        Queues a message and waits for its verdict.
+
+        Returns:
+            A dictionary of signal data, the string "false", or None if the verdict could not be decoded.
+        """
+        signal_type = signal_type.upper()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(signal_type, [])
+        batch.append((message_content, future))
+        if len(batch) >= self.max_size:
+            self.flush(signal_type)
+        elif len(batch) == 1:
+            self._timers[signal_type] = loop.call_later(self.window, self.flush, signal_type)
+        return await future
+
+    def flush(self, signal_type: str):
+        """Sends whatever is waiting for `signal_type` now."""
+        timer = self._timers.pop(signal_type, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(signal_type, None)
+        if batch:
+            task = asyncio.ensure_future(self._send(signal_type, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send_one(self, signal_type: str, message_content: str):
+        response = await request_gemini_async(
+            self.client, signal_type, generate_prompt(signal_type, message_content), generation_config(signal_type)
+        )
+        return validate_response(signal_type, response.text)
+
+    async def _send(self, signal_type: str, batch: list):
+        messages = [message_content for message_content, _ in batch]
+        try:
+            if len(messages) == 1:
+                results = [await self._send_one(signal_type, messages[0])]
+            else:
+                response = await request_gemini_async(
+                    self.client, signal_type, generate_batch_prompt(signal_type, messages),
+                    generation_config(signal_type, batch=True), messages=len(messages),
+                )
+                results = validate_batch_response(signal_type, response.text, len(messages))
+                if results is None:
+                    logger.warning(f"Retrying {len(messages)} {signal_type} messages individually.")
+                    results = await asyncio.gather(
+                        *(self._send_one(signal_type, message_content) for message_content in messages),
+                        return_exceptions=True,
+                    )
+                else:
+                    logger.info(f"Parsed {len(messages)} {signal_type} messages in one Gemini request.")
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
 
-            signal = FJDiscordSignal.objects.create(strategy=strategy, **main_signal_data)
 
-            for tp in take_profit_data:
-                FJTakeProfitTrade.objects.create(signal=signal, **tp)
+# -------------------------------------------------------------------------
+# BACKGROUND PROCESSING
+# -------------------------------------------------------------------------
 
-            logger.info(f"Successfully created FJ Signal {signal.id} for strategy '{strategy.name}'.")
-            return signal
+def claim_pending_messages(limit: int, stale_after: int = 300):
+    """
+    Claims up to `limit` pending Bandit messages for this worker and marks them Processing.
 
-        elif signal_type.upper() == "SIGSCAN":
-            main_signal_data = signal_data.get("SIGSCANDiscordSignals", {})
-            take_profit_data = signal_data.get("SIGSCANTakeProfitTrades", [])
+    Rows are selected with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers never
+    claim the same message. Messages stuck in Processing for longer than `stale_after`
+    seconds (a crashed worker) are claimed again. Only messages inside the RETENTION_DAYS
+    window are looked at, so PostgreSQL skips the banditmessages partitions before it.
 
-            if not main_signal_data:
-                raise ValueError("SIGSCANDiscordSignals key not found in response.")
+    Returns:
+        A list of BanditMessages instances.
+    """
+    now = timezone.now()
+    retained = BanditMessages.objects.filter(created_at__gte=now - timedelta(days=settings.RETENTION_DAYS))
+    with transaction.atomic():
+        ids = list(
+            retained.select_for_update(skip_locked=True)
+            .filter(Q(status='Pending') | Q(status='Processing', claimed_at__lt=now - timedelta(seconds=stale_after)))
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        retained.filter(id__in=ids).update(status='Processing', claimed_at=now, attempts=F('attempts') + 1)
+    return list(retained.filter(id__in=ids).order_by('id'))
+
+def record_bandit_outcome(message: BanditMessages, signal_data, start: float, max_attempts: int = 3, error: Exception = None):
+    """
+    Saves any signal found in a claimed Bandit message and records the outcome.
 
-            signal = SIGSCANDiscordSignal.objects.create(strategy=strategy, **main_signal_data)
+    On failure the message goes back to Pending until it has been attempted
+    `max_attempts` times, then it is marked Failed. A CircuitOpenError does not
+    count as an attempt, since Gemini was never called.
+
+    Returns:
+        The final status of the message.
+    """
+    last_error = None
+    attempts = message.attempts
+    try:
+        if error is not None:
+            raise error
+        if signal_data is None:
+            raise RuntimeError("Signal parsing failed.")
+        if signal_data == "false":
+            status = 'NoSignal'
+        elif save_signal_from_gemini_response(signal_data, message.channel_name) is None:
+            raise RuntimeError("Parsed signal could not be saved.")
+        else:
+            status = 'Signal'
+    except CircuitOpenError as e:
+        last_error = str(e)
+        attempts -= 1
+        status = 'Pending'
+        logger.info(f"Bandit message {message.id} deferred: {e}")
+    except Exception as e:
+        last_error = str(e)
+        status = 'Failed' if message.attempts >= max_attempts else 'Pending'
+        logger.warning(f"Bandit message {message.id} failed on attempt {message.attempts}: {e}")
+
+    latency_ms = int((time.perf_counter() - start) * 1000)
+    BanditMessages.objects.filter(id=message.id).update(
+        status=status,
+        attempts=attempts,
+        parse_latency_ms=latency_ms,
+        last_error=last_error,
+        processed_at=None if status == 'Pending' else timezone.now(),
+        updated_at=timezone.now(),
+    )
+    logger.info(f"Bandit message {message.id} from '{message.channel_name}' -> {status} in {latency_ms}ms")
+    return status
+
+def process_bandit_message(message: BanditMessages, max_attempts: int = 3):
+    """
+    Parses a claimed Bandit message with the blocking Gemini call and records the outcome.
 
-            for tp in take_profit_data:
-                SIGSCANTakeProfitTrade.objects.create(signal=signal, **tp)
+    Returns:
+        The final status of the message.
+    """
+    start = time.perf_counter()
+    try:
+        signal_data = parse_signal_message(message.channel_name, message.message)
+    except Exception as e:
+        return record_bandit_outcome(message, None, start, max_attempts, error=e)
+    return record_bandit_outcome(message, signal_data, start, max_attempts)
 
-            logger.info(f"Successfully created SIGSCAN Signal {signal.id} for strategy '{strategy.name}'.")
-            return signal
+async def process_bandit_message_async(message: BanditMessages, client: AsyncGeminiClient, max_attempts: int = 3, batcher=None):
+    """
+    Parses a claimed Bandit message through the AsyncGeminiClient (optionally micro-batched
+    with other messages from the same channel) and records the outcome.
 
+    Returns:
+        The final status of the message.
+    """
+    start = time.perf_counter()
+    try:
+        signal_data = await parse_signal_message_async(message.channel_name, message.message, client, batcher=batcher)
     except Exception as e:
-        logger.error(f"Error saving signal data to database: {e}", exc_info=True)
-        # The @transaction.atomic decorator will automatically roll back the transaction on exception.
-        return None
+        return await sync_to_async(record_bandit_outcome)(message, None, start, max_attempts, error=e)
+    return await sync_to_async(record_bandit_outcome)(message, signal_data, start, max_attempts)
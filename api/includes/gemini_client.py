@@ -0,0 +1,225 @@
+import time
+import random
+import asyncio
+import logging
+import weakref
+
+from django.conf import settings
+from google.api_core import exceptions as google_exceptions
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Upstream errors worth retrying: timeouts, throttling and server-side failures.
+RETRYABLE_EXCEPTIONS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+)
+
+
+class GeminiClientError(Exception):
+    """Raised when a Gemini call fails for good (attempts or retry budget exhausted, or a non-retryable error)."""
+
+class CircuitOpenError(GeminiClientError):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of overall traffic, so a degraded upstream is not hit
+    with a retry storm. Every request deposits `ratio` tokens; every retry withdraws one.
+    The budget starts full at `capacity` tokens so retries still work at low traffic.
+    """
+
+    def __init__(self, ratio=0.2, capacity=10):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = float(capacity)
+
+    def deposit(self):
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self):
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures and rejects calls for
+    `reset_timeout` seconds. After that one trial call is let through (half-open). A
+    success closes the circuit again; a failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.half_open = False
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None and self.clock() - self.opened_at < self.reset_timeout
+
+    @property
+    def rejecting(self):
+        """True while allow() would refuse: open, or a half-open trial still in flight."""
+        return self.is_open or self.half_open
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if self.is_open or self.half_open:
+            return False
+        # Reset timeout elapsed: let a single trial request through
+        self.half_open = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.half_open = False
+
+    def end_trial(self):
+        """Ends a half-open trial that gave no verdict (e.g. it was cancelled), so the next call may try again."""
+        self.half_open = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.half_open or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self.half_open:
+                logger.warning(f"Gemini circuit breaker opened after {self.failures} consecutive failures.")
+            self.opened_at = self.clock()
+            self.half_open = False
+
+
+class ModelHandles:
+    """
+    google.generativeai model handles, created on first use and reused: one plain
+    handle plus one per provider context cache (see prompt_registry.py).
+    """
+
+    # Context caches are replaced every TTL, so old handles are dropped past this many
+    MAX_HANDLES = 16
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self._models = {}
+
+    def get(self, cached_content=None):
+        import google.generativeai as genai
+        key = getattr(cached_content, 'name', None)
+        model = self._models.get(key)
+        if model is None:
+            if len(self._models) >= self.MAX_HANDLES:
+                self._models.clear()
+            if cached_content is None:
+                model = genai.GenerativeModel(self.model_name)
+            else:
+                model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+            self._models[key] = model
+        return model
+
+
+class GenerativeModelTransport:
+    """Default transport: google.generativeai model handles, reused for every call."""
+
+    def __init__(self, model_name):
+        self.models = ModelHandles(model_name)
+        self.models.get()
+
+    async def __call__(self, prompt, generation_config=None, cached_content=None):
+        model = self.models.get(cached_content)
+        return await model.generate_content_async(prompt, generation_config=generation_config)
+
+
+class AsyncGeminiClient:
+    """
+    asyncio wrapper around Gemini generate_content calls with:
+      - a reused model handle (or any injected transport, e.g. a stub in tests)
+      - a per-call deadline
+      - exponential backoff with full jitter, limited by a RetryBudget
+      - a semaphore capping in-flight requests
+      - a CircuitBreaker for when the upstream is degraded
+
+    A transport is an async callable taking (prompt, generation_config, cached_content)
+    and returning the provider response (an object with .text and .usage_metadata).
+    """
+
+    def __init__(self, transport=None, model_name=None, max_concurrency=None, timeout=None, max_attempts=None,
+                 backoff_base=0.5, backoff_max=8.0, retry_budget=None, circuit_breaker=None):
+        self.model_name = model_name or settings.GEMINI_MODEL
+        self.transport = transport or GenerativeModelTransport(self.model_name)
+        self.max_concurrency = max_concurrency or settings.GEMINI_MAX_CONCURRENCY
+        self.timeout = timeout or settings.GEMINI_TIMEOUT
+        self.max_attempts = max_attempts or settings.GEMINI_MAX_ATTEMPTS
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget or RetryBudget()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        # asyncio primitives bind to the loop that first uses them, so keep one per loop
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    async def generate(self, prompt, generation_config=None, cached_content=None):
+        """
+        Sends the prompt (after the provider context cache, if given) and returns the provider response.
+        Raises CircuitOpenError or GeminiClientError when no response could be obtained.
+        """
+        if not self.circuit_breaker.allow():
+            raise CircuitOpenError("Gemini circuit breaker is open.")
+        self.retry_budget.deposit()
+
+        attempt = 1
+        # Whether this call holds the half-open trial (allow() just started it)
+        trial = self.circuit_breaker.half_open
+        try:
+            while True:
+                try:
+                    async with self._semaphore():
+                        response = await asyncio.wait_for(self.transport(prompt, generation_config, cached_content), timeout=self.timeout)
+                    self.circuit_breaker.record_success()
+                    return response
+                except RETRYABLE_EXCEPTIONS as e:
+                    self.circuit_breaker.record_failure()
+                    error = str(e) or type(e).__name__
+                    if attempt >= self.max_attempts:
+                        raise GeminiClientError(f"Gemini call failed after {attempt} attempts: {error}") from e
+                    if not self.retry_budget.withdraw():
+                        raise GeminiClientError(f"Gemini retry budget exhausted: {error}") from e
+                    if not self.circuit_breaker.allow():
+                        raise CircuitOpenError(f"Gemini circuit breaker opened: {error}") from e
+                    trial = self.circuit_breaker.half_open
+                except Exception as e:
+                    # Bad requests, blocked prompts, etc. fail the same way on every attempt.
+                    # A failed trial still re-opens the circuit.
+                    if trial and self.circuit_breaker.half_open:
+                        self.circuit_breaker.record_failure()
+                    raise GeminiClientError(f"Gemini call failed: {e}") from e
+
+                delay = self.backoff(attempt)
+                logger.info(f"Retrying Gemini call (attempt {attempt + 1}/{self.max_attempts}) in {delay:.2f}s.")
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            # Never leave the trial in flight, or allow() would refuse every later call
+            if trial and self.circuit_breaker.half_open:
+                self.circuit_breaker.end_trial()
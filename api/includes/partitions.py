@@ -0,0 +1,112 @@
+"""
+Monthly created_at range partitions on PostgreSQL.
+
+Migration 0012 turns the tables in PARTITIONED_TABLES into RANGE (created_at)
+partitioned tables with one partition per calendar month (UTC), named
+<table>_YYYY_MM, plus a <table>_default catch-all. archive_history keeps
+partitions created ahead of time and drops the ones past the retention window.
+Every helper is a no-op on other databases, where the tables stay plain.
+Requires PostgreSQL 14 or later.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+PARTITIONED_TABLES = ('banditmessages', 'user_trades')
+
+
+def month_start(value):
+    """Returns the first instant (UTC) of the month containing `value`."""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table, month):
+    return f"{table}_{month:%Y_%m}"
+
+
+def is_partitioned(table):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(table):
+    """Returns {month: partition name} for the monthly partitions of `table` (the default partition is left out)."""
+    if not is_partitioned(table):
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        try:
+            month = datetime.strptime(name[len(table) + 1:], '%Y_%m').replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            continue
+        partitions[month] = name
+    return partitions
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def create_partition(table, month):
+    """
+    Creates the partition for `month`. Rows that already landed in the default partition
+    for that month (PostgreSQL refuses to create a partition over them) are moved into
+    the new table before it is attached, in one transaction; the default partition is
+    locked against inserts meanwhile.
+    """
+    qn = connection.ops.quote_name
+    name, default = partition_name(table, month), default_partition_name(table)
+    bounds = [month, add_months(month, 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {qn(default)} IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING STORAGE)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {qn(default)} WHERE {qn('created_at')} >= %s AND {qn('created_at')} < %s RETURNING *) "
+            f"INSERT INTO {qn(name)} SELECT * FROM moved",
+            bounds,
+        )
+        cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)", bounds)
+
+
+def ensure_partitions(table, months_ahead, now):
+    """Creates the partitions for the current month and the next `months_ahead` months. Returns the names created."""
+    if not is_partitioned(table):
+        return []
+    existing = list_partitions(table)
+    created = []
+    current = month_start(now)
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            create_partition(table, month)
+            created.append(partition_name(table, month))
+    return created
+
+
+def drop_partition(table, name):
+    """Detaches and drops one partition; its rows go with it."""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+        cursor.execute(f"DROP TABLE {qn(name)}")
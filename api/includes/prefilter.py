@@ -0,0 +1,172 @@
+import re
+import time
+import pickle
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import F
+
+from api.models import PrefilterStats
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------
+# Local pre-filter for Discord messages that are obviously not signals.
+#
+# Most channel traffic is chatter or "TP hit" notices that Gemini answers with
+# "false". The pre-filter scores each message with a few regex rules and, if
+# one has been trained (see the train_prefilter command), a small TF-IDF +
+# logistic regression model. Messages scoring below PREFILTER_THRESHOLD are
+# treated as non-signals without calling Gemini when PREFILTER_MODE is
+# "enforce". In "shadow" mode every message still goes to Gemini and the
+# pre-filter's verdict is only logged and counted against Gemini's.
+# -------------------------------------------------------------------------
+
+MODES = ('off', 'shadow', 'enforce')
+
+# Lines of the usual signal layout: "Entry: ...", "SL: ...", "TP1: ..."
+LEVEL_PATTERNS = [
+    re.compile(r'^\W*entry\s*:\s*\d', re.MULTILINE),
+    re.compile(r'^\W*(?:sl|stop[\s-]?loss)\s*:\s*\d', re.MULTILINE),
+    re.compile(r'^\W*(?:tp|target)\s*\d*\s*:\s*\d', re.MULTILINE),
+]
+# Status updates about a trade already posted
+NOTICE_RE = re.compile(r'\b(?:reached|hit|achieved|congrats|closing|closed|stopped out|cancel(?:l)?ed)\b')
+DIRECTION_RE = re.compile(r'\b(?:long|short|buy|sell)\b')
+
+
+def rule_score(message_content: str) -> float:
+    """
+    Scores how likely a message is to be a signal using keyword/regex rules only.
+    1.0 for the full Entry/SL/TP layout, 0.0 for messages that cannot be a signal.
+    """
+    text = message_content.lower().replace('*', '').replace('`', '')
+    if not re.search(r'\d', text):
+        # No price anywhere, nothing to trade
+        return 0.0
+    if sum(bool(pattern.search(text)) for pattern in LEVEL_PATTERNS) >= 2:
+        return 1.0
+    if NOTICE_RE.search(text):
+        return 0.0
+    if DIRECTION_RE.search(text):
+        # Free-form wording ("long BTC at 65k, stop 63k") is left to Gemini
+        return 0.5
+    return 0.05
+
+
+class Prefilter:
+    """
+    Scores Bandit messages and decides whether they need Gemini.
+
+    Keeps process-wide agreement counters for shadow mode (see stats()). observe() runs
+    on the sync thread pool and the async path at once, so the counters are locked. They
+    are added to the prefilter_stats row of the mode at most every `flush_interval`
+    seconds (and on flush_stats()), which the prefilter_stats command reports.
+    """
+
+    def __init__(self, mode: str = None, threshold: float = None, model_path: str = None, flush_interval: float = None):
+        self.mode = mode or settings.PREFILTER_MODE
+        if self.mode not in MODES:
+            raise ValueError(f"Invalid PREFILTER_MODE '{self.mode}'. Must be one of {MODES}.")
+        self.threshold = settings.PREFILTER_THRESHOLD if threshold is None else threshold
+        self.model_path = settings.PREFILTER_MODEL_PATH if model_path is None else model_path
+        self.flush_interval = settings.PREFILTER_STATS_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._model = None
+        self._model_loaded = False
+        self.counters = {'agree': 0, 'disagree': 0, 'missed_signals': 0}
+        self._pending = Counter()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """The trained scikit-learn pipeline, or None if there is none (or scikit-learn is missing)."""
+        if not self._model_loaded:
+            self._model_loaded = True
+            if self.model_path:
+                try:
+                    with open(self.model_path, 'rb') as f:
+                        self._model = pickle.load(f)
+                    logger.info(f"Loaded pre-filter model from {self.model_path}.")
+                except Exception as e:
+                    logger.warning(f"Pre-filter model {self.model_path} could not be loaded, using rules only: {e}")
+        return self._model
+
+    def score(self, message_content: str) -> float:
+        """Probability (0-1) that the message is a signal."""
+        score = rule_score(message_content)
+        if score in (0.0, 1.0) or self.model is None:
+            return score
+        return float(self.model.predict_proba([message_content])[0][1])
+
+    def rejects(self, message_content: str) -> bool:
+        """True if the message should be treated as a non-signal without calling Gemini."""
+        if self.mode != 'enforce':
+            return False
+        return self.score(message_content) < self.threshold
+
+    def observe(self, signal_type: str, message_content: str, result):
+        """
+        Compares the pre-filter's verdict with Gemini's result for a message that reached Gemini.
+        """
+        if self.mode == 'off' or result is None:
+            return
+        score = self.score(message_content)
+        predicted_signal = score >= self.threshold
+        is_signal = isinstance(result, dict)
+        if predicted_signal == is_signal:
+            self.count('agree')
+            logger.debug(f"Pre-filter agreed with Gemini on {signal_type} message (score {score:.2f}).")
+            return
+
+        if is_signal:
+            self.count('disagree', 'missed_signals')
+            logger.warning(f"Pre-filter would have dropped a {signal_type} signal (score {score:.2f}): {message_content[:80]!r}")
+        else:
+            self.count('disagree')
+            logger.info(f"Pre-filter passed a {signal_type} non-signal to Gemini (score {score:.2f}).")
+
+    def count(self, *names):
+        with self._lock:
+            for name in names:
+                self.counters[name] += 1
+                self._pending[name] += 1
+            flush_due = time.monotonic() >= self._flushed_at + self.flush_interval
+        if flush_due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Adds the comparisons counted since the last flush to the mode's prefilter_stats row."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            counts = {name: F(name) + pending[name] for name in self.counters}
+            if not PrefilterStats.objects.filter(mode=self.mode).update(**counts):
+                PrefilterStats.objects.get_or_create(mode=self.mode)
+                PrefilterStats.objects.filter(mode=self.mode).update(**counts)
+        except Exception as e:
+            # Keep the counts for the next flush rather than losing them
+            with self._lock:
+                self._pending.update(pending)
+            logger.warning(f"Could not flush pre-filter stats: {e}")
+
+    def stats(self):
+        """Agreement with Gemini in this process."""
+        with self._lock:
+            counters = dict(self.counters)
+        compared = counters['agree'] + counters['disagree']
+        return {
+            **counters,
+            'mode': self.mode,
+            'threshold': self.threshold,
+            'agreement': counters['agree'] / compared if compared else 0.0,
+        }
+
+
+prefilter = Prefilter()
@@ -0,0 +1,158 @@
+import time
+import asyncio
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+
+from api.models import Strategy, GeminiUsage
+from api.caches import getCachedStrategy
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------
+# Prompt template registry.
+#
+# Each channel's template is compiled once at import: the full single-message
+# prefix and the static head shared with batch prompts (instructions and
+# few-shot examples). When GEMINI_CONTEXT_CACHE_TTL is set, the head is also
+# uploaded to Gemini context caching, and requests then only send the part
+# after it. The registry also records token counts and latency for every
+# Gemini request in the gemini_usage table (see gemini_usage_report).
+# -------------------------------------------------------------------------
+
+INPUT_MARKER = "### INPUT MESSAGE TO PROCESS:"
+
+# Refresh a provider cache this many seconds before it expires
+CONTEXT_CACHE_REFRESH_MARGIN = 60
+
+
+class PromptTemplate:
+    """A channel's prompt template, split into its static parts once."""
+
+    def __init__(self, signal_type: str, template: str):
+        if INPUT_MARKER not in template:
+            raise ValueError(f"{signal_type} template must end with '{INPUT_MARKER}'.")
+        self.signal_type = signal_type
+        # Static text shared by single and batch prompts
+        self.head = template.rsplit(INPUT_MARKER, 1)[0]
+        # Everything before the message in a single-message prompt
+        self.prefix = template + "\n"
+        # Provider context cache for the head, and when it expires (time.monotonic)
+        self.cached_content = None
+        self.cache_expires_at = 0.0
+        # Held while the cache is created, so concurrent requests create it once
+        self.cache_lock = threading.Lock()
+
+    def cache_is_fresh(self, ttl) -> bool:
+        """True when cached_content needs no network call: caching is off or the cache is live."""
+        return not ttl or time.monotonic() < self.cache_expires_at - CONTEXT_CACHE_REFRESH_MARGIN
+
+
+class PromptRegistry:
+    """
+    Holds the compiled templates per channel and, optionally, their provider context caches.
+    """
+
+    def __init__(self):
+        self.templates = {}
+
+    def register(self, signal_type: str, template: str):
+        self.templates[signal_type.upper()] = PromptTemplate(signal_type.upper(), template)
+
+    def get(self, signal_type: str) -> PromptTemplate:
+        try:
+            return self.templates[signal_type.upper()]
+        except KeyError:
+            raise ValueError(f"No prompt template registered for signal_type {signal_type!r}. Registered: {', '.join(self.templates)}.")
+
+    def cached_content(self, signal_type: str):
+        """
+        Returns a live Gemini CachedContent holding the channel's template head, creating or
+        refreshing it as needed. Returns None when context caching is off or unavailable
+        (e.g. the template is below the model's minimum cacheable size).
+
+        Creating the cache is a blocking network call; coroutines use for_request_async.
+        """
+        ttl = settings.GEMINI_CONTEXT_CACHE_TTL
+        if not ttl:
+            return None
+        template = self.get(signal_type)
+        if template.cache_is_fresh(ttl):
+            return template.cached_content
+
+        with template.cache_lock:
+            # Another thread may have refreshed it while this one waited
+            if template.cache_is_fresh(ttl):
+                return template.cached_content
+            now = time.monotonic()
+            try:
+                from google.generativeai import caching
+                template.cached_content = caching.CachedContent.create(
+                    model=f"models/{settings.GEMINI_MODEL}",
+                    display_name=f"{template.signal_type.lower()}-signal-template",
+                    contents=[template.head],
+                    ttl=timedelta(seconds=ttl),
+                )
+                logger.info(f"Created Gemini context cache for the {template.signal_type} template.")
+            except Exception as e:
+                # Retry after another TTL rather than on every request
+                template.cached_content = None
+                logger.warning(f"Gemini context caching unavailable for the {template.signal_type} template: {e}")
+            template.cache_expires_at = now + ttl
+            return template.cached_content
+
+    def for_request(self, signal_type: str, prompt: str):
+        """
+        Splits a rendered prompt into what has to be sent and the context cache to send it with.
+
+        Returns:
+            (contents, cached_content): the full prompt and None when there is no live cache,
+            otherwise the text after the cached template head and the CachedContent.
+        """
+        template = self.get(signal_type)
+        if not prompt.startswith(template.head):
+            return prompt, None
+        cached_content = self.cached_content(signal_type)
+        if cached_content is None:
+            return prompt, None
+        return prompt[len(template.head):], cached_content
+
+    async def for_request_async(self, signal_type: str, prompt: str):
+        """
+        for_request for coroutines. When the context cache has to be created or refreshed,
+        that runs in a worker thread, so the event loop keeps serving other Gemini requests.
+        """
+        if self.get(signal_type).cache_is_fresh(settings.GEMINI_CONTEXT_CACHE_TTL):
+            return self.for_request(signal_type, prompt)
+        return await asyncio.to_thread(self.for_request, signal_type, prompt)
+
+    def record_usage(self, signal_type: str, response, latency_seconds: float, messages: int = 1):
+        """
+        Stores the token counts Gemini reported for a response, with the request latency.
+        Never raises: accounting must not fail a parse.
+        """
+        try:
+            usage = getattr(response, 'usage_metadata', None)
+            try:
+                strategy_id = getCachedStrategy(name=signal_type.upper()).strategy_id
+            except Strategy.DoesNotExist:
+                strategy_id = None
+            return GeminiUsage.objects.create(
+                strategy_id=strategy_id,
+                channel=signal_type.upper(),
+                model_name=settings.GEMINI_MODEL,
+                messages=messages,
+                prompt_tokens=getattr(usage, 'prompt_token_count', 0) or 0,
+                response_tokens=getattr(usage, 'candidates_token_count', 0) or 0,
+                cached_tokens=getattr(usage, 'cached_content_token_count', 0) or 0,
+                latency_ms=int(latency_seconds * 1000),
+            )
+        except Exception as e:
+            logger.error(f"Could not record Gemini usage for {signal_type}: {e}", exc_info=True)
+            return None
+
+
+prompt_registry = PromptRegistry()
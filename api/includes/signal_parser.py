@@ -0,0 +1,136 @@
+import re
+import logging
+
+from api.includes.signal_sources import SIGNAL_SOURCES, SignalSource
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------
+# Local parser for the Discord signal formats.
+#
+# The channels post signals in a fixed layout (see the few-shot examples in
+# gemini.py), so most messages can be parsed without calling Gemini. How a
+# channel writes decimals, leverage and assets comes from its SignalSource
+# (api.includes.signal_sources). The parser
+# returns the same dict shape Gemini does, plus a confidence score. Anything it
+# cannot parse with confidence is left to Gemini.
+# -------------------------------------------------------------------------
+
+NUMBER = r'\d+(?:[.,]\d+)*'
+
+HEADER_RE = re.compile(r'(?P<asset>[A-Z0-9]{2,}/[A-Z0-9]{2,})[^\n(]*\((?P<side>long|short)\)', re.IGNORECASE)
+LEVERAGE_RE = re.compile(r'^\W*Leverage\s*:\s*(?P<value>\d+)\s*X', re.IGNORECASE | re.MULTILINE)
+BALANCE_RE = re.compile(rf'^\W*Balance\s*:\s*(?P<value>{NUMBER})\s*%', re.IGNORECASE | re.MULTILINE)
+ENTRY_RE = re.compile(rf'^\W*Entry\s*:\s*(?P<value>{NUMBER})(?P<rest>[^\n]*)$', re.IGNORECASE | re.MULTILINE)
+TP_RE = re.compile(rf'^\W*TP\s*(?P<series>\d+)\s*:\s*(?P<value>{NUMBER})', re.IGNORECASE | re.MULTILINE)
+SL_RE = re.compile(rf'^\W*SL\s*:\s*(?P<value>{NUMBER})', re.IGNORECASE | re.MULTILINE)
+
+
+def parse_number(text, comma_decimal):
+    """
+    Converts '127,70', '0.722' or '1,234.5' to a float.
+    Returns (value, ambiguous), where ambiguous flags a lone comma that could be a thousands separator.
+    """
+    ambiguous = False
+    if ',' in text and '.' in text:
+        text = text.replace(',', '')
+    elif text.count(',') > 1:
+        text = text.replace(',', '')
+    elif ',' in text:
+        ambiguous = not comma_decimal and len(text.split(',')[1]) == 3
+        text = text.replace(',', '.')
+    if text.count('.') > 1:
+        return None, True
+    return float(text), ambiguous
+
+
+def parse_signal(signal_type: str, message_content: str):
+    """
+    Parses a Discord message for the given channel.
+
+    Returns:
+        (signal_data, confidence): signal_data has the shape save_signal_from_gemini_response
+        expects, or is None when the message does not look like a complete signal.
+        confidence ranges from 0.0 to 1.0.
+    """
+    signal_type = signal_type.upper()
+    # Unknown channels are parsed with the default traits; Gemini rejects them later
+    source = SIGNAL_SOURCES.get(signal_type, SignalSource(signal_type))
+    text = message_content.replace('*', '').replace('`', '')
+    comma_decimal = source.comma_decimal
+
+    headers = HEADER_RE.findall(text)
+    entry = ENTRY_RE.search(text)
+    stop_loss = SL_RE.search(text)
+    take_profits = TP_RE.findall(text)
+    if not headers or not entry or not stop_loss or not take_profits:
+        return None, 0.0
+
+    confidence = 1.0
+    asset, side = headers[0][0].upper(), headers[0][1].lower()
+    if any((a.upper(), s.lower()) != (asset, side) for a, s in headers[1:]):
+        # Several different pairs or directions in one message (e.g. a recap post)
+        confidence -= 0.5
+
+    numbers_ambiguous = False
+
+    def number(value):
+        nonlocal numbers_ambiguous
+        parsed, ambiguous = parse_number(value, comma_decimal)
+        numbers_ambiguous = numbers_ambiguous or ambiguous or parsed is None
+        return parsed
+
+    entry_price = number(entry.group('value'))
+    stop_loss_price = number(stop_loss.group('value'))
+    tp_prices = [(int(series), number(value)) for series, value in take_profits]
+
+    rest = entry.group('rest').lower()
+    if 'limit' in rest:
+        entry_order_type = 'limit'
+    elif 'market' in rest:
+        entry_order_type = 'market'
+    else:
+        entry_order_type = None
+        confidence -= 0.5
+    if re.search(r'\d', rest):
+        # An entry range such as "Entry: 126.00 - 128.00" needs judgement
+        confidence -= 0.5
+
+    if [series for series, _ in tp_prices] != list(range(1, len(tp_prices) + 1)):
+        confidence -= 0.3
+    if None not in (entry_price, stop_loss_price) and all(price is not None for _, price in tp_prices):
+        direction = 1 if side == 'long' else -1
+        ladder = [entry_price] + [price for _, price in tp_prices]
+        if any((b - a) * direction <= 0 for a, b in zip(ladder, ladder[1:])):
+            confidence -= 0.5
+        if (entry_price - stop_loss_price) * direction <= 0:
+            confidence -= 0.5
+    else:
+        return None, 0.0
+
+    main_signal_data = {
+        "asset": asset.replace('/', '') if source.unslashed_asset else asset,
+        "trade_type": side,
+    }
+    if source.leverage:
+        leverage = LEVERAGE_RE.search(text)
+        balance = BALANCE_RE.search(text)
+        if not leverage or not balance:
+            return None, 0.0
+        main_signal_data["leverage"] = int(leverage.group('value'))
+        main_signal_data["balance"] = number(balance.group('value'))
+    main_signal_data.update({
+        "entry_price": entry_price,
+        "entry_order_type": entry_order_type,
+        "stop_loss": stop_loss_price,
+    })
+
+    if numbers_ambiguous:
+        confidence -= 0.5
+
+    signal_data = {
+        f"{signal_type}DiscordSignals": main_signal_data,
+        f"{signal_type}TakeProfitTrades": [{"series_num": series, "tp_price": price} for series, price in tp_prices],
+    }
+    return signal_data, max(confidence, 0.0)
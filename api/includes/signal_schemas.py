@@ -0,0 +1,164 @@
+import json
+import logging
+from functools import lru_cache
+from typing import Literal, Optional
+
+import google.generativeai as genai
+from pydantic import BaseModel, Field, ValidationError, create_model, field_validator
+
+from api.includes.signal_sources import SignalSource, get_source
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------
+# Structured-output schemas for the Discord signal sources.
+#
+# Gemini is called with response_mime_type="application/json" and the source's
+# response schema, built from SignalSchema and the source's traits (see
+# api.includes.signal_sources), so it always returns JSON of a known shape. The
+# response is validated here and turned into the dict shape the rest of the
+# pipeline (and save_signal_from_gemini_response) expects:
+#     {"<TYPE>DiscordSignals": {...}, "<TYPE>TakeProfitTrades": [...]}
+# or the string "false" for a non-signal.
+#
+# Schema fields carry no defaults or numeric bounds: the Gemini schema proto
+# does not accept them, so range checks live in validators instead.
+# -------------------------------------------------------------------------
+
+class TakeProfitSchema(BaseModel):
+    """Corresponds to the TakeProfitTrade model."""
+    series_num: int = Field(description="The sequential number of the take-profit target (1, 2, 3...).")
+    tp_price: float = Field(description="The price at which to take profit.")
+
+    @field_validator('series_num', 'tp_price')
+    @classmethod
+    def check_positive(cls, value):
+        if value <= 0:
+            raise ValueError("must be positive")
+        return value
+
+
+class SignalSchema(BaseModel):
+    """DiscordSignal fields shared by every channel."""
+    asset: str = Field(description="The asset pair in upper case, e.g. 'LINK/USDT'.")
+    trade_type: Literal['long', 'short'] = Field(description="The trade direction.")
+    entry_price: float = Field(description="The price to enter the trade. Decimal commas become dots.")
+    entry_order_type: Literal['market', 'limit'] = Field(description="The entry order type.")
+    stop_loss: float = Field(description="The stop-loss price.")
+    take_profits: list[TakeProfitSchema] = Field(description="The take-profit targets in order.")
+
+    @field_validator('asset')
+    @classmethod
+    def normalize_asset(cls, value):
+        return value.strip().upper()
+
+    @field_validator('entry_price', 'stop_loss')
+    @classmethod
+    def check_positive(cls, value):
+        if value <= 0:
+            raise ValueError("must be positive")
+        return value
+
+
+class LeverageSignalSchema(SignalSchema):
+    """Signals from sources that also set leverage and balance."""
+    leverage: int = Field(description="The leverage multiplier, e.g. 5 for '5X'.")
+    balance: float = Field(description="The percentage of capital allocated, e.g. 3.0 for '3% of capital'.")
+
+
+def strip_asset_slash(cls, value):
+    return value.replace('/', '')
+
+
+IS_SIGNAL_DESCRIPTION = "True only if the message is a complete new trade signal."
+SIGNAL_DESCRIPTION = "The parsed signal, or null when is_signal is false."
+
+@lru_cache(maxsize=None)
+def build_response_schema(source: SignalSource):
+    """Builds the response model for a source: {"is_signal": bool, "signal": <signal schema> | null}."""
+    validators = {}
+    if source.unslashed_asset:
+        validators['strip_asset_slash'] = field_validator('asset')(classmethod(strip_asset_slash))
+    signal_schema = create_model(
+        f"{source.name}SignalSchema",
+        __base__=LeverageSignalSchema if source.leverage else SignalSchema,
+        __validators__=validators,
+    )
+    return create_model(
+        f"{source.name}SignalResponse",
+        is_signal=(bool, Field(description=IS_SIGNAL_DESCRIPTION)),
+        signal=(Optional[signal_schema], Field(description=SIGNAL_DESCRIPTION)),
+    )
+
+
+def get_response_schema(signal_type: str):
+    return build_response_schema(get_source(signal_type))
+
+def generation_config(signal_type: str, batch: bool = False):
+    """
+    Returns the Gemini GenerationConfig forcing JSON output in the signal type's schema
+    (or an array of them for a batch prompt).
+    """
+    schema = get_response_schema(signal_type)
+    return genai.GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=list[schema] if batch else schema,
+    )
+
+def to_signal_data(signal_type: str, response: BaseModel):
+    """
+    Converts a validated response into the model-ready dict, or "false" for a non-signal.
+    Returns None if Gemini flagged a signal but left it empty.
+    """
+    if not response.is_signal:
+        return "false"
+    if response.signal is None:
+        return None
+    signal_type = signal_type.upper()
+    main_signal_data = response.signal.model_dump()
+    take_profit_data = main_signal_data.pop('take_profits')
+    return {
+        f"{signal_type}DiscordSignals": main_signal_data,
+        f"{signal_type}TakeProfitTrades": take_profit_data,
+    }
+
+def validate_response(signal_type: str, response_text: str):
+    """
+    Validates a structured Gemini response.
+
+    Returns:
+        A dictionary of signal data, the string "false", or None if the response does not match the schema.
+    """
+    try:
+        response = get_response_schema(signal_type).model_validate_json(response_text)
+    except ValidationError as e:
+        logger.error(f"Gemini {signal_type} response does not match the schema: {e}")
+        return None
+    return to_signal_data(signal_type, response)
+
+def validate_batch_response(signal_type: str, response_text: str, count: int):
+    """
+    Validates a structured batch response element by element.
+
+    Returns:
+        A list of `count` results (dict, "false", or None for an invalid element),
+        or None if the response is not an array of the expected length.
+    """
+    try:
+        verdicts = json.loads(response_text)
+    except json.JSONDecodeError:
+        verdicts = None
+    if not isinstance(verdicts, list) or len(verdicts) != count:
+        logger.error(f"Gemini batch response does not hold {count} verdicts: {response_text}")
+        return None
+
+    schema = get_response_schema(signal_type)
+    results = []
+    for verdict in verdicts:
+        try:
+            results.append(to_signal_data(signal_type, schema.model_validate(verdict)))
+        except ValidationError as e:
+            logger.error(f"Gemini {signal_type} batch verdict does not match the schema: {e}")
+            results.append(None)
+    return results
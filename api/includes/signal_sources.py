@@ -0,0 +1,40 @@
+from typing import NamedTuple
+
+# -------------------------------------------------------------------------
+# Discord signal sources.
+#
+# Each Discord channel that posts trade signals is one entry in SIGNAL_SOURCES,
+# keyed by its signal type (the Bandit channel name and the DiscordSignal
+# source). The local parser and the Gemini response schemas read the source's
+# formatting traits from here; its prompt template is registered with
+# api.includes.prompt_registry. Adding a channel needs an entry here and a
+# template, but no new table, schema class or parser branch.
+# -------------------------------------------------------------------------
+
+
+class SignalSource(NamedTuple):
+    """A Discord channel's signal format."""
+    name: str
+    # Authors write decimals with a comma (e.g. 0,27434)
+    comma_decimal: bool = False
+    # Signals also carry leverage and balance (stored on DiscordSignal)
+    leverage: bool = False
+    # The asset is stored without the slash (VIRTUAL/USDT -> VIRTUALUSDT)
+    unslashed_asset: bool = False
+
+
+SIGNAL_SOURCES = {
+    source.name: source
+    for source in (
+        SignalSource('HRJ', leverage=True),
+        SignalSource('FJ', comma_decimal=True),
+        SignalSource('SIGSCAN', comma_decimal=True, unslashed_asset=True),
+    )
+}
+
+
+def get_source(signal_type: str) -> SignalSource:
+    try:
+        return SIGNAL_SOURCES[signal_type.upper()]
+    except KeyError:
+        raise ValueError(f"Invalid signal_type. Must be one of: {', '.join(SIGNAL_SOURCES)}.")
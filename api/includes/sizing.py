@@ -0,0 +1,119 @@
+import logging
+from decimal import Context, Decimal, InvalidOperation, ROUND_CEILING, ROUND_HALF_UP
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------
+# Position sizing for opening trades.
+#
+# A subscriber's order quantity is
+#     balance * portfolio_percentage / 100 * leverage / price
+# floored to the symbol's quantity step. Quantities below the exchange's
+# minimum quantity or minimum order value come out as None. The whole roster
+# is sized in one NumPy pass. The floats are only used to count whole steps;
+# the quantities are then written out from those step counts with integer
+# arithmetic, so the order payload gets exact decimal strings.
+# -------------------------------------------------------------------------
+
+# Relative slack so a notional that is an exact multiple of the step is not
+# floored one step short by float rounding.
+STEP_EPSILON = 1e-9
+
+
+# Digits and decimal places of the price and quantity columns (Signal, UserTrade)
+PRICE_MAX_DIGITS = 30
+PRICE_DECIMAL_PLACES = 12
+
+
+class SymbolRules(NamedTuple):
+    """An exchange's lot and tick size rules for one symbol (see ExchangeSymbolRule)."""
+    qty_step: Decimal
+    min_qty: Decimal
+    tick_size: Decimal
+    min_notional: Decimal
+    max_leverage: Optional[int]
+
+
+def round_price(price, tick_size) -> Decimal:
+    """Rounds a price to the nearest multiple of the tick size."""
+    # Normalized so a tick stored as 0.100000000000 gives '65000.1', not twelve decimals
+    tick_size = Decimal(tick_size).normalize()
+    price = (Decimal(str(price)) / tick_size).to_integral_value(rounding=ROUND_HALF_UP) * tick_size
+    return price.quantize(Decimal(1)) if tick_size >= 1 else price
+
+def normalize_decimal(value, decimal_places=PRICE_DECIMAL_PLACES) -> Optional[str]:
+    """
+    Canonical string for a price or quantity: rounded to `decimal_places`, no trailing
+    zeros and no exponent, so "100.0", "100" and "1e2" all become "100". None and "" give None.
+    Raises ValueError for anything that is not a finite number that fits the columns.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        number = Decimal(str(value).strip())
+        if not number.is_finite() or number.adjusted() >= PRICE_MAX_DIGITS - decimal_places:
+            raise InvalidOperation
+        number = number.quantize(Decimal(1).scaleb(-decimal_places), context=Context(prec=PRICE_MAX_DIGITS, rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Invalid decimal value: {value!r}") from None
+    # `or 0` turns -0 into 0
+    return format(number.normalize() or Decimal(0), 'f')
+
+def format_steps(steps, qty_step: Decimal):
+    """
+    Writes whole step counts out as exact quantity strings, e.g. 1234 steps of 0.001 -> '1.234'.
+    """
+    _, digits, exponent = qty_step.normalize().as_tuple()
+    mantissa = int(''.join(map(str, digits)))
+    if exponent >= 0:
+        return [str(int(count) * mantissa * 10 ** exponent) for count in steps]
+
+    decimals = -exponent
+    quantities = []
+    for count in steps:
+        units = str(int(count) * mantissa).rjust(decimals + 1, '0')
+        quantities.append(f"{units[:-decimals]}.{units[-decimals:]}")
+    return quantities
+
+def size_positions(price, balances, percentages, leverages, rules: SymbolRules):
+    """
+    Computes the order quantity of every subscriber in one vectorized pass.
+
+    Args:
+        price: The order price (already rounded to the tick size).
+        balances: Available margin per subscriber; None where unknown.
+        percentages: portfolio_percentage per subscriber (0-100); None where unset.
+        leverages: leverage_amount per subscriber; None or values below 1 mean 1x.
+        rules: The symbol's SymbolRules.
+
+    Returns:
+        A list with one exact quantity string per subscriber, or None where no order can be sized.
+    """
+    count = len(balances)
+    price = float(price)
+    if count == 0:
+        return []
+    if price <= 0:
+        return [None] * count
+
+    balance = np.array(balances, dtype=np.float64)
+    percentage = np.array(percentages, dtype=np.float64)
+    leverage = np.nan_to_num(np.array(leverages, dtype=np.float64), nan=1.0)
+    leverage = np.clip(leverage, 1.0, rules.max_leverage or np.inf)
+
+    notional = balance * percentage / 100.0 * leverage
+    min_steps = float((rules.min_qty / rules.qty_step).to_integral_value(rounding=ROUND_CEILING))
+    step = float(rules.qty_step)
+    with np.errstate(invalid='ignore'):
+        steps = np.floor(notional / (price * step) * (1 + STEP_EPSILON))
+        valid = np.isfinite(steps) & (steps >= max(min_steps, 1.0)) & (steps * step * price >= float(rules.min_notional))
+
+    quantities = [None] * count
+    indexes = np.flatnonzero(valid)
+    for index, quantity in zip(indexes.tolist(), format_steps(steps[indexes].tolist(), rules.qty_step)):
+        quantities[index] = quantity
+    return quantities
@@ -0,0 +1,37 @@
+"""Helpers shared by the benchmark_* management commands."""
+import time
+import statistics
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """Runs the block against a throwaway test database so benchmarks never touch real data."""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def time_calls(func, args_list):
+    """Calls func once per entry in args_list and returns latency stats in milliseconds."""
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'calls': len(samples),
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': samples[len(samples) // 2],
+        'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def format_stats(label, stats):
+    return f"{label:<40} calls={stats['calls']:<6} mean={stats['mean_ms']:.3f}ms p50={stats['p50_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms"
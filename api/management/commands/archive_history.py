@@ -0,0 +1,122 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from api.models import Signal, BanditMessages, UserTrade, OpenPosition
+from api.includes import partitions
+
+# user_trades rows reference signals, so they are archived before them
+ARCHIVED_MODELS = (UserTrade, BanditMessages, Signal)
+
+
+def write_archive(path, rows):
+    """
+    Writes dict rows as gzip JSONL to `path` and returns their ids. The file is written
+    under a temporary name and renamed once complete, so a crash never leaves a partial archive.
+    """
+    ids = []
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as archive:
+        for row in rows:
+            archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            ids.append(row['id'])
+    if ids:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+    return ids
+
+
+def open_signal_ids():
+    return {signal_id for signal_ids in OpenPosition.objects.values_list('signal_ids', flat=True) for signal_id in signal_ids}
+
+
+def referenced_rows(model):
+    """
+    Rows of `model` that must outlive retention: signals still referenced by a user trade
+    or an open position, and the user trades of open signals (closing them needs their
+    position ids and quantities). Returns a queryset, or None when nothing is ever kept.
+    """
+    if model is Signal:
+        return Signal.objects.filter(Q(Exists(UserTrade.objects.filter(signal=OuterRef('pk')))) | Q(id__in=open_signal_ids()))
+    if model is UserTrade:
+        return UserTrade.objects.filter(signal_id__in=open_signal_ids())
+    return None
+
+
+def expired_rows(model, cutoff):
+    """Rows of `model` past retention, leaving out referenced_rows."""
+    queryset = model.objects.filter(created_at__lt=cutoff)
+    referenced = referenced_rows(model)
+    if referenced is not None:
+        queryset = queryset.exclude(id__in=referenced.values('id'))
+    return queryset.order_by('id')
+
+
+class Command(BaseCommand):
+    help = "Moves signal, banditmessages and user_trades rows past retention into gzip JSONL archives and drops expired partitions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Archive rows older than this many days (default RETENTION_DAYS).")
+        parser.add_argument('--archive-dir', default=None, help="Directory for the .jsonl.gz archives (default ARCHIVE_DIR).")
+        parser.add_argument('--months-ahead', type=int, default=None, help="Monthly partitions to keep created in advance (default PARTITION_MONTHS_AHEAD).")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows fetched or deleted per round trip.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be archived without writing or deleting anything.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        days = options['days'] if options['days'] is not None else settings.RETENTION_DAYS
+        months_ahead = options['months_ahead'] if options['months_ahead'] is not None else settings.PARTITION_MONTHS_AHEAD
+        archive_dir = options['archive_dir'] or settings.ARCHIVE_DIR
+        cutoff = now - timedelta(days=days)
+        self.chunk_size = options['chunk_size']
+        self.dry_run = options['dry_run']
+
+        for model in ARCHIVED_MODELS:
+            table = model._meta.db_table
+            table_dir = os.path.join(archive_dir, table)
+            if not self.dry_run:
+                os.makedirs(table_dir, exist_ok=True)
+                for name in partitions.ensure_partitions(table, months_ahead, now):
+                    self.stdout.write(f"{table}: created partition {name}")
+
+            # Whole months past the cutoff are archived and dropped as partitions; the
+            # rest (the month the cutoff falls in, months holding referenced rows, plain
+            # tables) are deleted row by row
+            dropped = 0
+            referenced = referenced_rows(model)
+            for month, name in sorted(partitions.list_partitions(table).items()):
+                if partitions.add_months(month, 1) > cutoff:
+                    continue
+                rows = model.objects.filter(created_at__gte=month, created_at__lt=partitions.add_months(month, 1))
+                if referenced is not None and referenced.filter(id__in=rows.values('id')).exists():
+                    self.stdout.write(f"{table}: kept partition {name}, it holds referenced rows")
+                    continue
+                self.archive(table, os.path.join(table_dir, f"{name}.jsonl.gz"), rows)
+                if not self.dry_run:
+                    partitions.drop_partition(table, name)
+                dropped += 1
+
+            path = os.path.join(table_dir, f"{table}_{cutoff:%Y%m%dT%H%M%SZ}.jsonl.gz")
+            ids = self.archive(table, path, expired_rows(model, cutoff))
+            if not self.dry_run:
+                for start in range(0, len(ids), self.chunk_size):
+                    model.objects.filter(id__in=ids[start:start + self.chunk_size]).delete()
+            if dropped:
+                self.stdout.write(f"{table}: {'would drop' if self.dry_run else 'dropped'} {dropped} partitions")
+
+    def archive(self, table, path, queryset):
+        if self.dry_run:
+            ids = list(queryset.values_list('id', flat=True))
+        else:
+            ids = write_archive(path, queryset.values().iterator(chunk_size=self.chunk_size))
+        if ids:
+            self.stdout.write(f"{table}: {'would archive' if self.dry_run else 'archived'} {len(ids)} rows to {path}")
+        return ids
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from api.includes.exchanges import OrderTemplate, get_exchange_adapter, orjson
+from api.management.commands._benchmark import time_calls
+
+SIGNAL_MESSAGE = {
+    'strategy_id': 1, 'symbol': 'BTCUSDT', 'side': 'BUY', 'price': '100000', 'tradeSide': 'OPEN',
+    'orderType': 'MARKET', 'tpPrice': None, 'tpStopType': None, 'tpOrderType': None, 'tpOrderPrice': None,
+    'slPrice': None, 'slStopType': None, 'slOrderType': None, 'slOrderPrice': None,
+}
+
+
+def make_user_data(count):
+    return [{
+        'api_key': f'key-{i:032d}', 'api_secret': f'secret-{i:032d}', 'user_id': i, 'user_api_id': i, 'name': 'Bitunix',
+        'portfolio_percentage': 10, 'leverage_amount': 5, 'max_tp_trades': 3, 'enable_sl_trail': False,
+        'enable_sms_confirm': False, 'trade_qty': f'0.{i % 1000:03d}', 'order_price': '100000.0',
+    } for i in range(count)]
+
+
+class Command(BaseCommand):
+    help = "Times rendering Bitunix SQS message bodies per order, rebuilding each order vs the pre-serialized signal template."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, nargs='+', default=[1, 100, 10_000], help="Roster sizes to time.")
+        parser.add_argument('--runs', type=int, default=20, help="Signals to time per roster size.")
+
+    def handle(self, *args, **options):
+        adapter = get_exchange_adapter('Bitunix')
+
+        def rebuild(user_data):
+            template = OrderTemplate(adapter, SIGNAL_MESSAGE)
+            return [template.render(user_item) for user_item in user_data]
+
+        def spliced(user_data):
+            template = adapter.order_template(SIGNAL_MESSAGE)
+            return [template.render(user_item) for user_item in user_data]
+
+        # Warm up both paths so one-off costs (imports, first calls) are not timed
+        rebuild(make_user_data(1))
+        spliced(make_user_data(1))
+
+        self.stdout.write(f"JSON encoder: {'orjson' if orjson is not None else 'json'}")
+        self.stdout.write(f"{'subscribers':>11} {'rebuild us/order':>17} {'template us/order':>18} {'speedup':>8}")
+        for count in options['subscribers']:
+            # Fresh dicts per run: the rebuild path merges the order into them
+            rebuilt = time_calls(rebuild, [(make_user_data(count),) for _ in range(options['runs'])])
+            templated = time_calls(spliced, [(make_user_data(count),) for _ in range(options['runs'])])
+            rebuild_us = rebuilt['mean_ms'] * 1000 / count
+            template_us = templated['mean_ms'] * 1000 / count
+            self.stdout.write(f"{count:>11} {rebuild_us:>17.2f} {template_us:>18.2f} {rebuild_us / template_us:>7.1f}x")
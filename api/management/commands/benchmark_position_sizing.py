@@ -0,0 +1,59 @@
+import random
+from decimal import Decimal, ROUND_DOWN
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.includes.sizing import SymbolRules, round_price, size_positions
+from api.management.commands._benchmark import time_calls, format_stats
+
+RULES = SymbolRules(
+    qty_step=Decimal('0.001'), min_qty=Decimal('0.001'), tick_size=Decimal('0.1'),
+    min_notional=Decimal('5'), max_leverage=125,
+)
+
+
+def size_positions_decimal(price, balances, percentages, leverages, rules):
+    """Per-subscriber Decimal loop, the straightforward version size_positions replaces."""
+    quantities = []
+    for balance, percentage, leverage in zip(balances, percentages, leverages):
+        if balance is None or percentage is None:
+            quantities.append(None)
+            continue
+        leverage = min(max(leverage or 1, 1), rules.max_leverage or leverage or 1)
+        notional = Decimal(balance) * Decimal(percentage) / 100 * leverage
+        quantity = (notional / price).quantize(rules.qty_step, rounding=ROUND_DOWN)
+        if quantity <= 0 or quantity < rules.min_qty or quantity * price < rules.min_notional:
+            quantities.append(None)
+        else:
+            quantities.append(str(quantity))
+    return quantities
+
+
+class Command(BaseCommand):
+    help = "Times sizing a whole subscriber roster with the vectorized engine against a per-subscriber Decimal loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=10_000, help="Roster size to size per signal.")
+        parser.add_argument('--runs', type=int, default=50, help="Signals to time per implementation.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        subscribers = options['subscribers']
+        balances = [Decimal(rng.randrange(1_000, 5_000_000)) / 100 if rng.random() > 0.05 else None for _ in range(subscribers)]
+        percentages = [rng.randint(1, 100) for _ in range(subscribers)]
+        leverages = [rng.choice((None, 1, 2, 5, 10, 20, 50)) for _ in range(subscribers)]
+        prices = [round_price(Decimal(rng.randrange(100, 10_000_000)) / 100, RULES.tick_size) for _ in range(options['runs'])]
+        calls = [(price, balances, percentages, leverages, RULES) for price in prices]
+
+        mismatches = sum(
+            a != b for a, b in zip(size_positions(*calls[0]), size_positions_decimal(*calls[0]))
+        )
+        if mismatches:
+            raise CommandError(f"Vectorized and Decimal sizing disagree on {mismatches} of {subscribers} subscribers.")
+
+        vectorized = time_calls(size_positions, calls)
+        looped = time_calls(size_positions_decimal, calls)
+        self.stdout.write(f"{subscribers} subscribers per signal, results identical")
+        self.stdout.write(format_stats("Decimal loop", looped))
+        self.stdout.write(format_stats("size_positions (NumPy)", vectorized))
+        self.stdout.write(f"{'speedup':<40} {looped['mean_ms'] / vectorized['mean_ms']:.1f}x")
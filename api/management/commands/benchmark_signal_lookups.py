@@ -0,0 +1,96 @@
+import random
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.models import Strategy, Signal
+from api.services import findOpenTrade, openingSide
+from api.management.commands._benchmark import benchmark_database, time_calls, format_stats
+
+
+class Command(BaseCommand):
+    help = ("Times the signal dedup and open-trade lookups on a seeded throwaway database, with and without the "
+            "composite indexes, against findOpenTrade on open_positions.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Signal rows to seed.")
+        parser.add_argument('--queries', type=int, default=500, help="Lookups to time per query type.")
+        parser.add_argument('--symbols', type=int, default=500, help="Distinct symbols to spread the rows over.")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            strategy_ids = self.seed(options['rows'], options['symbols'])
+            rng = random.Random(7)
+            lookups = [self.random_message(rng, strategy_ids, options['symbols'], options['rows']) for _ in range(options['queries'])]
+
+            call_command('rebuild_open_positions', stdout=self.stdout)
+            open_positions = time_calls(findOpenTrade, [(message,) for message in lookups])
+            indexed = self.run_lookups(lookups)
+
+            open_trade_index = next(index for index in Signal._meta.indexes if index.name == 'signal_open_trade_idx')
+            dedup_constraint = next(constraint for constraint in Signal._meta.constraints if constraint.name == 'signal_dedup_uniq')
+            with connection.schema_editor() as schema_editor:
+                schema_editor.remove_index(Signal, open_trade_index)
+                schema_editor.remove_constraint(Signal, dedup_constraint)
+
+            unindexed = self.run_lookups(lookups)
+
+        self.stdout.write(f"{options['rows']} signal rows on {connection.vendor}")
+        for name in ('dedup lookup', 'open trade scan'):
+            self.stdout.write(format_stats(f"{name} (no index)", unindexed[name]))
+            self.stdout.write(format_stats(f"{name} (indexed)", indexed[name]))
+            self.stdout.write(f"{'speedup':<40} {unindexed[name]['mean_ms'] / indexed[name]['mean_ms']:.1f}x")
+        self.stdout.write(format_stats("findOpenTrade (open_positions)", open_positions))
+
+    def seed(self, rows, symbols):
+        strategy_ids = [Strategy.objects.create(name=f"bench-{i}").strategy_id for i in range(5)]
+        rng = random.Random(42)
+        batch = []
+        for i in range(rows):
+            batch.append(Signal(
+                strategy_id=rng.choice(strategy_ids),
+                symbol=f"SYM{rng.randrange(symbols)}USDT",
+                side=rng.choice(('BUY', 'SELL')),
+                tradeSide=rng.choice(('OPEN', 'CLOSE')),
+                price=str(i),
+                orderType='MARKET',
+            ))
+            if len(batch) == 10_000:
+                Signal.objects.bulk_create(batch)
+                batch = []
+                self.stdout.write(f"seeded {i + 1}/{rows}\r", ending='')
+        Signal.objects.bulk_create(batch)
+        self.stdout.write('')
+        with connection.cursor() as cursor:
+            # Refresh planner statistics so both runs use up-to-date estimates
+            cursor.execute('ANALYZE')
+        return strategy_ids
+
+    def random_message(self, rng, strategy_ids, symbols, rows):
+        return {
+            'strategy_id': rng.choice(strategy_ids),
+            'symbol': f"SYM{rng.randrange(symbols)}USDT",
+            'side': rng.choice(('BUY', 'SELL')),
+            'tradeSide': rng.choice(('OPEN', 'CLOSE')),
+            'price': str(rng.randrange(rows * 2)),
+        }
+
+    def dedup_lookup(self, message):
+        """The lookup signal_dedup_uniq performs when ingestSignal inserts a signal."""
+        return Signal.objects.filter(
+            strategy_id=message['strategy_id'], symbol=message['symbol'], side=message['side'],
+            tradeSide=message['tradeSide'], price=message['price']
+        ).exists()
+
+    def open_trade_scan(self, message):
+        """The newest OPEN signal on the opposite side, searched in Signal history as before open_positions."""
+        return Signal.objects.filter(
+            symbol=message['symbol'], strategy_id=message['strategy_id'], side=openingSide(message['side']), tradeSide='OPEN'
+        ).order_by('-id').values_list('id', flat=True).first()
+
+    def run_lookups(self, lookups):
+        return {
+            'dedup lookup': time_calls(self.dedup_lookup, [(message,) for message in lookups]),
+            'open trade scan': time_calls(self.open_trade_scan, [(message,) for message in lookups]),
+        }
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.includes.signal_parser import parse_signal
+from api.management.commands._benchmark import time_calls, format_stats
+
+DEFAULT_CORPUS = Path(settings.BASE_DIR) / 'api' / 'includes' / 'signal_parser_corpus.json'
+
+
+class Command(BaseCommand):
+    help = "Measures accuracy and latency of the local Discord signal parser against a labelled corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', default=str(DEFAULT_CORPUS),
+                            help='JSON list of {"channel", "message", "expected"} items; expected is the Gemini-shaped dict or "false".')
+        parser.add_argument('--repeat', type=int, default=1000, help="Times each message is parsed for the latency figures.")
+
+    def handle(self, *args, **options):
+        corpus = json.loads(Path(options['corpus']).read_text())
+        threshold = settings.LOCAL_PARSER_MIN_CONFIDENCE
+
+        signals = [item for item in corpus if item['expected'] != "false"]
+        handled = correct = false_positives = 0
+        for item in corpus:
+            signal_data, confidence = parse_signal(item['channel'], item['message'])
+            accepted = signal_data is not None and confidence >= threshold
+            if item['expected'] == "false":
+                false_positives += accepted
+                continue
+            handled += accepted
+            if accepted and signal_data == item['expected']:
+                correct += 1
+            elif accepted:
+                self.stdout.write(self.style.WARNING(f"Mismatch on {item['channel']} message: {signal_data}"))
+
+        non_signals = len(corpus) - len(signals)
+        self.stdout.write(f"corpus={len(corpus)} signals={len(signals)} non_signals={non_signals} threshold={threshold}")
+        self.stdout.write(f"coverage  {handled}/{len(signals)} signals parsed locally (Gemini skipped)")
+        self.stdout.write(f"accuracy  {correct}/{handled} locally parsed signals match the expected output")
+        self.stdout.write(f"false positives  {false_positives}/{non_signals} non-signals accepted locally")
+
+        calls = [(item['channel'], item['message']) for item in corpus] * options['repeat']
+        self.stdout.write(format_stats("parse_signal", time_calls(parse_signal, calls)))
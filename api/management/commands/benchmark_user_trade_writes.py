@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import Strategy, Signal, UserTrade
+from api.services import recordUserTrades
+from api.management.commands._benchmark import benchmark_database, time_calls, format_stats
+
+
+class Command(BaseCommand):
+    help = "Times writing one signal's UserTrade rows on a throwaway database, recordUserTrades vs one insert per subscriber."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=1_000, help="Subscribers dispatched per signal.")
+        parser.add_argument('--runs', type=int, default=20, help="Signals to time per write strategy.")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user_ids = self.seed_users(options['subscribers'])
+            strategy = Strategy.objects.create(name='bench')
+
+            def dispatched(run):
+                signal = Signal.objects.create(strategy=strategy, symbol='BTCUSDT', side='BUY', tradeSide='OPEN', price=str(run))
+                user_trades = [{'user_id': user_id, 'trade_qty': '0.010'} for user_id in user_ids]
+                results = {(user_id, None): {'exchange': 'Bitunix', 'status': 'queued', 'message_id': f'msg-{run}-{user_id}'} for user_id in user_ids}
+                return signal.id, user_trades, results
+
+            bulk = time_calls(self.atomic(recordUserTrades), [dispatched(run) for run in range(options['runs'])])
+            single = time_calls(self.atomic(self.record_one_by_one), [dispatched(-run - 1) for run in range(options['runs'])])
+
+        self.stdout.write(f"{options['subscribers']} subscribers per signal on {connection.vendor}")
+        self.stdout.write(format_stats("one insert per subscriber", single))
+        self.stdout.write(format_stats(f"recordUserTrades ({'unnest' if connection.vendor == 'postgresql' else 'bulk_create'})", bulk))
+        self.stdout.write(f"{'speedup':<40} {single['mean_ms'] / bulk['mean_ms']:.1f}x")
+
+    def seed_users(self, count):
+        user_model = get_user_model()
+        user_model.objects.bulk_create(user_model(username=f'bench-{i}') for i in range(count))
+        return list(user_model.objects.filter(username__startswith='bench-').values_list('id', flat=True))
+
+    @staticmethod
+    def atomic(func):
+        """Runs each timed write in its own transaction, as dispatch does inside the outbox worker."""
+        def run(*args):
+            with transaction.atomic():
+                func(*args)
+        return run
+
+    @staticmethod
+    def record_one_by_one(signal_id, user_trades, results):
+        for user_trade in user_trades:
+            result = results[(user_trade['user_id'], None)]
+            UserTrade.objects.create(
+                auth_user_id=user_trade['user_id'], signal_id=signal_id, trade_qty=user_trade.get('trade_qty'),
+                status='Queued', message_id=result['message_id'],
+            )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.caches import TTL_CACHES
+from api.models import CacheStats
+
+
+class Command(BaseCommand):
+    help = "Shows the hit and miss counts of the strategy, roster and symbol rules caches across all workers."
+
+    def handle(self, *args, **options):
+        # Other workers' counts show up after their next flush (CACHE_STATS_FLUSH_INTERVAL)
+        for cache in TTL_CACHES:
+            cache.flush_stats()
+        totals = {row.name: row for row in CacheStats.objects.all()}
+        for cache in TTL_CACHES:
+            row = totals.get(cache.name)
+            hits, misses = (row.hits, row.misses) if row else (0, 0)
+            lookups = hits + misses
+            self.stdout.write(f"{cache.name} hits={hits} misses={misses} hit_ratio={hits / lookups if lookups else 0.0:.3f}")
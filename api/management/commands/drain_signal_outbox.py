@@ -0,0 +1,59 @@
+import time
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import SignalOutbox
+from api.services import processOutboxEntry, resumeDispatchedEntry, getOutboxLag
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Processes TradingView signals queued in the signal outbox by the webhook."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Maximum entries to process before reporting lag.")
+        parser.add_argument('--max-attempts', type=int, default=5, help="Attempts before an entry is marked Failed.")
+        parser.add_argument('--retry-delay', type=int, default=5, help="Base delay in seconds between attempts (doubles each retry).")
+        parser.add_argument('--dispatch-timeout', type=int, default=None,
+                            help="Seconds before a Dispatched entry's unrecorded orders are resent (default SIGNAL_OUTBOX_DISPATCH_TIMEOUT).")
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting once it is drained.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep between polls when --loop is set.")
+        parser.add_argument('--stats', action='store_true', help="Print the outbox backlog and lag, then exit.")
+
+    def handle(self, *args, **options):
+        timeout = settings.SIGNAL_OUTBOX_DISPATCH_TIMEOUT if options['dispatch_timeout'] is None else options['dispatch_timeout']
+        if options['stats']:
+            pending = SignalOutbox.objects.filter(status='Pending').count()
+            failed = SignalOutbox.objects.filter(status='Failed').count()
+            dispatched = SignalOutbox.objects.filter(status='Dispatched')
+            # Overdue entries are resent by the next drain
+            overdue = dispatched.filter(dispatched_at__lte=timezone.now() - timedelta(seconds=timeout)).count()
+            self.stdout.write(
+                f"pending={pending} dispatched={dispatched.count()} overdue={overdue} failed={failed} lag_seconds={getOutboxLag():.3f}"
+            )
+            return
+
+        while True:
+            processed = 0
+            while processed < options['batch_size']:
+                entry = resumeDispatchedEntry(max_attempts=options['max_attempts'], timeout=timeout)
+                if entry is None:
+                    entry = processOutboxEntry(max_attempts=options['max_attempts'], retry_delay=options['retry_delay'])
+                if entry is None:
+                    break
+                processed += 1
+
+            if processed:
+                logger.info(f"Signal outbox: processed {processed} entries, lag {getOutboxLag():.3f}s")
+
+            if not options['loop']:
+                if processed < options['batch_size']:
+                    break
+                continue
+            if processed < options['batch_size']:
+                time.sleep(options['interval'])
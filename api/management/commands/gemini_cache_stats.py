@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.caches import gemini_cache
+
+
+class Command(BaseCommand):
+    help = "Shows how many Gemini calls the parse cache has saved across all workers."
+
+    def handle(self, *args, **options):
+        stats = gemini_cache.persisted_stats()
+        self.stdout.write(f"entries={stats['entries']} hits={stats['hits']} saved_seconds={stats['saved_seconds']:.1f}")
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Avg, Count, Max, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from api.models import GeminiUsage
+
+
+def parse_time(value):
+    """Accepts an ISO date or datetime; naive values are taken in the current timezone."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD or an ISO datetime.")
+        parsed = datetime.combine(day, datetime.min.time())
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+def request_cost(prompt_tokens, cached_tokens, response_tokens):
+    """USD cost of the given token counts at the configured per-million-token prices."""
+    return (
+        (prompt_tokens - cached_tokens) * settings.GEMINI_INPUT_COST_PER_MTOK
+        + cached_tokens * settings.GEMINI_CACHED_INPUT_COST_PER_MTOK
+        + response_tokens * settings.GEMINI_OUTPUT_COST_PER_MTOK
+    ) / 1_000_000
+
+
+class Command(BaseCommand):
+    help = "Shows Gemini token usage, cost and latency per strategy and channel over a time range."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Start of the range (YYYY-MM-DD or ISO datetime). Defaults to --days ago.")
+        parser.add_argument('--until', help="End of the range (YYYY-MM-DD or ISO datetime). Defaults to now.")
+        parser.add_argument('--days', type=int, default=7, help="Length of the range when --since is not given.")
+
+    def handle(self, *args, **options):
+        until = parse_time(options['until']) if options['until'] else timezone.now()
+        since = parse_time(options['since']) if options['since'] else until - timedelta(days=options['days'])
+
+        rows = (
+            GeminiUsage.objects.filter(created_at__gte=since, created_at__lt=until)
+            .values('strategy__name', 'channel')
+            .annotate(
+                requests=Count('id'),
+                messages=Sum('messages'),
+                prompt_tokens=Sum('prompt_tokens'),
+                response_tokens=Sum('response_tokens'),
+                cached_tokens=Sum('cached_tokens'),
+                avg_latency_ms=Avg('latency_ms'),
+                max_latency_ms=Max('latency_ms'),
+            )
+        )
+        for row in rows:
+            row['cost'] = request_cost(row['prompt_tokens'], row['cached_tokens'], row['response_tokens'])
+        rows = sorted(rows, key=lambda row: row['cost'], reverse=True)
+
+        self.stdout.write(f"Gemini usage from {since:%Y-%m-%d %H:%M} to {until:%Y-%m-%d %H:%M}")
+        if not rows:
+            self.stdout.write("No Gemini requests recorded in this range.")
+            return
+
+        self.stdout.write(
+            f"{'strategy':<20} {'channel':<10} {'requests':>8} {'messages':>8} {'prompt/msg':>10} "
+            f"{'response/msg':>12} {'cached':>7} {'avg ms':>7} {'max ms':>7} {'cost usd':>10}"
+        )
+        for row in rows:
+            messages = row['messages'] or 1
+            cached_share = row['cached_tokens'] / row['prompt_tokens'] if row['prompt_tokens'] else 0.0
+            self.stdout.write(
+                f"{row['strategy__name'] or '-':<20} {row['channel']:<10} {row['requests']:>8} {row['messages']:>8} "
+                f"{row['prompt_tokens'] / messages:>10.0f} {row['response_tokens'] / messages:>12.0f} "
+                f"{cached_share:>7.0%} {row['avg_latency_ms']:>7.0f} {row['max_latency_ms']:>7} {row['cost']:>10.4f}"
+            )
+        self.stdout.write(f"total cost usd {sum(row['cost'] for row in rows):.4f}")
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import PrefilterStats
+
+
+class Command(BaseCommand):
+    help = "Shows how often the Bandit message pre-filter agreed with Gemini, per mode, across all workers."
+
+    def handle(self, *args, **options):
+        # Workers' counts show up after their next flush (PREFILTER_STATS_FLUSH_INTERVAL)
+        self.stdout.write(f"mode={settings.PREFILTER_MODE} threshold={settings.PREFILTER_THRESHOLD}")
+        for row in PrefilterStats.objects.order_by('mode'):
+            compared = row.agree + row.disagree
+            self.stdout.write(
+                f"{row.mode} agree={row.agree} disagree={row.disagree} missed_signals={row.missed_signals} "
+                f"agreement={row.agree / compared if compared else 0.0:.3f}"
+            )
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+
+from api.caches import gemini_cache
+from api.includes.gemini import GeminiBatcher, claim_pending_messages, process_bandit_message_async
+from api.includes.gemini_client import AsyncGeminiClient
+from api.includes.prefilter import prefilter
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Parses pending Bandit messages (local parser / Gemini) and saves the resulting signals."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None, help="Gemini calls in flight at once (default GEMINI_MAX_CONCURRENCY).")
+        parser.add_argument('--timeout', type=float, default=None, help="Deadline in seconds for each Gemini call (default GEMINI_TIMEOUT).")
+        parser.add_argument('--batch-window', type=float, default=None, help="Seconds to collect messages per channel into one Gemini request (default GEMINI_BATCH_WINDOW).")
+        parser.add_argument('--batch-max-size', type=int, default=None, help="Messages per Gemini request; 1 disables batching (default GEMINI_BATCH_MAX_SIZE).")
+        parser.add_argument('--batch-size', type=int, default=20, help="Messages claimed per poll.")
+        parser.add_argument('--max-attempts', type=int, default=3, help="Attempts before a message is marked Failed.")
+        parser.add_argument('--stale-after', type=int, default=300, help="Seconds before a message stuck in Processing is reclaimed.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting once no messages are pending.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep between polls when --loop is set.")
+
+    def handle(self, *args, **options):
+        client = AsyncGeminiClient(max_concurrency=options['concurrency'], timeout=options['timeout'])
+        batcher = GeminiBatcher(client, window=options['batch_window'], max_size=options['batch_max_size'])
+        if batcher.max_size <= 1:
+            batcher = None
+        try:
+            asyncio.run(self.run(client, batcher, options))
+        finally:
+            gemini_cache.flush_hits()
+            prefilter.flush_stats()
+
+    async def run(self, client, batcher, options):
+        while True:
+            if client.circuit_breaker.rejecting:
+                # Gemini is degraded: leave messages Pending rather than claiming them just to defer them
+                if not options['loop']:
+                    logger.warning("Gemini circuit breaker is open, stopping.")
+                    break
+                await asyncio.sleep(options['interval'])
+                continue
+
+            messages = await sync_to_async(claim_pending_messages)(options['batch_size'], stale_after=options['stale_after'])
+            if messages:
+                statuses = await asyncio.gather(*(
+                    process_bandit_message_async(message, client, max_attempts=options['max_attempts'], batcher=batcher)
+                    for message in messages
+                ))
+                logger.info(f"Processed {len(messages)} Bandit messages: "
+                            f"{ {status: statuses.count(status) for status in set(statuses)} }")
+                if all(status == 'Pending' for status in statuses):
+                    # Every message was deferred; back off instead of reclaiming them straight away
+                    if not options['loop']:
+                        break
+                    await asyncio.sleep(options['interval'])
+                continue
+
+            if not options['loop']:
+                break
+            await asyncio.sleep(options['interval'])
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import Signal, OpenPosition
+from api.services import openingSide
+
+
+def replay_positions(signals):
+    """
+    Replays (id, strategy_id, symbol, side, tradeSide) signal rows in id order the way
+    openPosition and closePosition apply them at ingest. Returns {(strategy_id, symbol, side): [open signal ids]}.
+    """
+    positions = {}
+    for signal_id, strategy_id, symbol, side, trade_side in signals:
+        if trade_side == 'OPEN':
+            positions.setdefault((strategy_id, symbol, side), []).append(signal_id)
+        elif trade_side == 'CLOSE':
+            open_ids = positions.get((strategy_id, symbol, openingSide(side)))
+            if open_ids:
+                open_ids.pop()
+    return {key: open_ids for key, open_ids in positions.items() if open_ids}
+
+
+class Command(BaseCommand):
+    help = "Regenerates the open_positions table from Signal history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report the rebuilt positions without writing them.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Signal rows fetched per round trip.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Block concurrent ingests from changing positions while the table is replaced
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LOCK TABLE {connection.ops.quote_name(OpenPosition._meta.db_table)} IN SHARE ROW EXCLUSIVE MODE")
+            signals = (
+                Signal.objects.filter(strategy__isnull=False).order_by('id')
+                .values_list('id', 'strategy_id', 'symbol', 'side', 'tradeSide')
+                .iterator(chunk_size=options['chunk_size'])
+            )
+            positions = replay_positions(signals)
+            current = OpenPosition.objects.count()
+
+            if not options['dry_run']:
+                OpenPosition.objects.all().delete()
+                OpenPosition.objects.bulk_create([
+                    OpenPosition(
+                        strategy_id=strategy_id, symbol=symbol, side=side,
+                        open_count=len(open_ids), latest_signal_id=open_ids[-1], signal_ids=open_ids,
+                    )
+                    for (strategy_id, symbol, side), open_ids in positions.items()
+                ], batch_size=1000)
+
+        self.stdout.write(
+            f"{'would rebuild' if options['dry_run'] else 'rebuilt'} {len(positions)} open positions "
+            f"({sum(len(open_ids) for open_ids in positions.values())} open signals), {current} before"
+        )
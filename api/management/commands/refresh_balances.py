@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.services import refreshBalances
+
+
+class Command(BaseCommand):
+    help = "Refreshes the account balance snapshots used to size opening trades."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None, help="Refetch snapshots older than this many seconds (default BALANCE_REFRESH_INTERVAL).")
+        parser.add_argument('--workers', type=int, default=None, help="Concurrent exchange calls (default BALANCE_REFRESH_WORKERS).")
+        parser.add_argument('--loop', action='store_true', help="Keep refreshing instead of exiting after one pass.")
+        parser.add_argument('--interval', type=float, default=None, help="Seconds to sleep between passes when --loop is set (default BALANCE_REFRESH_INTERVAL / 2).")
+
+    def handle(self, *args, **options):
+        interval = options['interval'] if options['interval'] is not None else settings.BALANCE_REFRESH_INTERVAL / 2
+        while True:
+            refreshed, failed = refreshBalances(max_age=options['max_age'], workers=options['workers'])
+            if not options['loop']:
+                self.stdout.write(f"refreshed={refreshed} failed={failed}")
+                break
+            time.sleep(interval)
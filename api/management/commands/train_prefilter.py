@@ -0,0 +1,103 @@
+import pickle
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import BanditMessages, GeminiParseCache
+from api.caches import gemini_cache
+from api.includes.prefilter import rule_score
+
+DEFAULT_OUTPUT = Path(settings.BASE_DIR) / 'prefilter.pkl'
+BATCH_SIZE = 1000
+
+
+def labelled_messages():
+    """
+    Returns (messages, labels) for the parsed Bandit messages Gemini decided, labelled 1 for
+    a signal and 0 for a non-signal from the verdict stored in gemini_parse_cache.
+
+    Outcomes the local parser or the pre-filter decided without Gemini are left out, so the
+    model never learns from its own (or the rules') earlier verdicts. Empty messages are skipped.
+    """
+    rows = (
+        BanditMessages.objects.filter(status__in=['Signal', 'NoSignal'])
+        .exclude(message__isnull=True).exclude(message='')
+        .order_by('id').values_list('channel_name', 'message')
+    )
+    messages, labels = [], []
+    batch = []
+
+    def label(batch):
+        verdicts = dict(GeminiParseCache.objects.filter(key__in=[key for key, _ in batch]).values_list('key', 'result'))
+        for key, message in batch:
+            if key in verdicts:
+                messages.append(message)
+                labels.append(int(isinstance(verdicts[key], dict)))
+
+    for channel_name, message in rows.iterator(chunk_size=BATCH_SIZE):
+        if not message.strip():
+            continue
+        batch.append((gemini_cache.make_key(channel_name or '', message), message))
+        if len(batch) == BATCH_SIZE:
+            label(batch)
+            batch = []
+    label(batch)
+    return messages, labels
+
+
+class Command(BaseCommand):
+    help = "Trains the Bandit message pre-filter (TF-IDF + logistic regression) from Gemini's verdicts on parsed BanditMessages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.PREFILTER_MODEL_PATH or str(DEFAULT_OUTPUT),
+                            help="Where to write the model (point PREFILTER_MODEL_PATH at it).")
+        parser.add_argument('--holdout', type=float, default=0.2, help="Fraction of messages held out to evaluate the model.")
+        parser.add_argument('--min-samples', type=int, default=50, help="Minimum labelled messages needed to train.")
+
+    def handle(self, *args, **options):
+        try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.linear_model import LogisticRegression
+            from sklearn.model_selection import train_test_split
+            from sklearn.pipeline import make_pipeline
+        except ImportError:
+            raise CommandError("scikit-learn is required to train the pre-filter: pip install 'django-project[prefilter]'")
+
+        messages, labels = labelled_messages()
+        if len(messages) < options['min_samples'] or len(set(labels)) < 2:
+            raise CommandError(f"Need at least {options['min_samples']} Gemini-labelled messages of both kinds, found {len(messages)}.")
+
+        def build():
+            return make_pipeline(
+                TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), lowercase=True, sublinear_tf=True, min_df=2),
+                LogisticRegression(class_weight='balanced', max_iter=1000),
+            )
+
+        train_x, test_x, train_y, test_y = train_test_split(
+            messages, labels, test_size=options['holdout'], stratify=labels, random_state=0
+        )
+        model = build().fit(train_x, train_y)
+        probabilities = model.predict_proba(test_x)[:, 1]
+
+        # The model only decides messages the rules leave undecided; evaluate the combined score
+        scores = []
+        for message, probability in zip(test_x, probabilities):
+            score = rule_score(message)
+            scores.append(score if score in (0.0, 1.0) else probability)
+
+        signal_scores = [score for score, label in zip(scores, test_y) if label]
+        noise_scores = [score for score, label in zip(scores, test_y) if not label]
+        self.stdout.write(f"trained on {len(train_x)} messages, evaluated on {len(test_x)} "
+                          f"({len(signal_scores)} signals, {len(noise_scores)} non-signals)")
+        for threshold in sorted({settings.PREFILTER_THRESHOLD, 0.05, 0.1, 0.2, 0.3, 0.5}):
+            kept = sum(score >= threshold for score in signal_scores)
+            rejected = sum(score < threshold for score in noise_scores)
+            self.stdout.write(f"threshold={threshold:.2f}  signal recall {kept}/{len(signal_scores)}  "
+                              f"non-signals rejected {rejected}/{len(noise_scores)}")
+
+        # Refit on everything for the shipped model
+        model = build().fit(messages, labels)
+        with open(options['output'], 'wb') as f:
+            pickle.dump(model, f)
+        self.stdout.write(self.style.SUCCESS(f"Wrote pre-filter model to {options['output']}"))
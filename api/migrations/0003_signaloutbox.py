@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 08:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_sigscandiscordsignal_sigscantakeprofittrade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignalOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Processed', 'Processed'), ('Failed', 'Failed')], default='Pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('result', models.CharField(blank=True, max_length=255, null=True)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time the row may be (re)processed.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Signal Outbox Entry',
+                'verbose_name_plural': 'Signal Outbox',
+                'db_table': 'signal_outbox',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='signal_outbox_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-18 08:43
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def collapse_duplicate_signals(apps, schema_editor):
+    """
+    Signals inserted by racing webhooks before the constraint existed would block it.
+    Keep the oldest row of each duplicate group and point its user trades at it.
+    """
+    Signal = apps.get_model('api', 'Signal')
+    UserTrade = apps.get_model('api', 'UserTrade')
+    key = ['strategy_id', 'symbol', 'side', 'tradeSide', 'price']
+
+    groups = (
+        Signal.objects.filter(strategy__isnull=False, tradeSide__isnull=False, price__isnull=False)
+        .values(*key)
+        .annotate(keep_id=Min('id'), copies=Count('id'))
+        .filter(copies__gt=1)
+    )
+    for group in groups:
+        extra = Signal.objects.filter(**{field: group[field] for field in key}).exclude(id=group['keep_id'])
+        UserTrade.objects.filter(signal__in=extra).update(signal_id=group['keep_id'])
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_signaloutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='signal',
+            index=models.Index(fields=['strategy', 'symbol', 'side', 'tradeSide', '-id'], name='signal_open_trade_idx'),
+        ),
+        migrations.RunPython(collapse_duplicate_signals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='signal',
+            constraint=models.UniqueConstraint(condition=models.Q(('strategy__isnull', False)), fields=('strategy', 'symbol', 'side', 'tradeSide', 'price'), name='signal_dedup_uniq'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_signal_dedup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeminiParseCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='SHA-256 of the channel and normalized message.', max_length=64, unique=True)),
+                ('channel', models.CharField(max_length=255)),
+                ('result', models.JSONField(help_text='The parsed signal data, or false for a non-signal.')),
+                ('latency_ms', models.IntegerField(default=0, help_text='Gemini latency when the result was first produced.')),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Gemini Parse Cache Entry',
+                'verbose_name_plural': 'Gemini Parse Cache',
+                'db_table': 'gemini_parse_cache',
+            },
+        ),
+    ]
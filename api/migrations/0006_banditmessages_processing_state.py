@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_geminiparsecache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banditmessages',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='banditmessages',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='banditmessages',
+            name='last_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='banditmessages',
+            name='parse_latency_ms',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='banditmessages',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='banditmessages',
+            name='status',
+            # Existing messages were already handled inline by the view, so they must not be queued.
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Processing', 'Processing'), ('Signal', 'Signal'), ('NoSignal', 'Not a Signal'), ('Failed', 'Failed'), ('Skipped', 'Skipped')], default='Skipped', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='banditmessages',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Processing', 'Processing'), ('Signal', 'Signal'), ('NoSignal', 'Not a Signal'), ('Failed', 'Failed'), ('Skipped', 'Skipped')], default='Pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='banditmessages',
+            index=models.Index(fields=['status', 'id'], name='banditmessages_status_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 08:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_banditmessages_processing_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeminiUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=255)),
+                ('model_name', models.CharField(max_length=100)),
+                ('messages', models.IntegerField(default=1, help_text='Discord messages parsed by the request.')),
+                ('prompt_tokens', models.IntegerField(default=0)),
+                ('response_tokens', models.IntegerField(default=0)),
+                ('cached_tokens', models.IntegerField(default=0, help_text='Prompt tokens served from Gemini context caching.')),
+                ('latency_ms', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('strategy', models.ForeignKey(blank=True, db_column='strategy_id', null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.strategy')),
+            ],
+            options={
+                'verbose_name': 'Gemini Usage',
+                'verbose_name_plural': 'Gemini Usage',
+                'db_table': 'gemini_usage',
+                'indexes': [models.Index(fields=['created_at', 'strategy'], name='gemini_usage_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_geminiusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeSymbolRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(help_text="The symbol as sent in signals, e.g. 'BTCUSDT'.", max_length=50)),
+                ('qty_step', models.DecimalField(decimal_places=12, help_text='Order quantities are whole multiples of this.', max_digits=30)),
+                ('min_qty', models.DecimalField(decimal_places=12, default=0, max_digits=30)),
+                ('tick_size', models.DecimalField(decimal_places=12, help_text='Order prices are whole multiples of this.', max_digits=30)),
+                ('min_notional', models.DecimalField(decimal_places=12, default=0, help_text='Minimum order value (qty * price).', max_digits=30)),
+                ('max_leverage', models.IntegerField(blank=True, null=True)),
+                ('exchange', models.ForeignKey(db_column='exchange_id', on_delete=django.db.models.deletion.CASCADE, to='api.supportedexchange')),
+            ],
+            options={
+                'verbose_name': 'Exchange Symbol Rule',
+                'db_table': 'exchange_symbol_rules',
+                'unique_together': {('exchange', 'symbol')},
+            },
+        ),
+    ]
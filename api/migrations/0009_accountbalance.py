@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 09:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_exchangesymbolrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(default='USDT', max_length=20)),
+                ('available', models.DecimalField(decimal_places=12, help_text='Margin available for new positions.', max_digits=30)),
+                ('equity', models.DecimalField(blank=True, decimal_places=12, max_digits=30, null=True)),
+                ('refreshed_at', models.DateTimeField()),
+                ('user_api', models.OneToOneField(db_column='user_api_id', on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='api.userapi')),
+            ],
+            options={
+                'verbose_name': 'Account Balance',
+                'db_table': 'account_balances',
+            },
+        ),
+    ]
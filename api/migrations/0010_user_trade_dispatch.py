@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-18 09:08
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_accountbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertrade',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='usertrade',
+            name='message_id',
+            field=models.CharField(blank=True, help_text='SQS MessageId of the queued order.', max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='usertrade',
+            name='status',
+            field=models.CharField(blank=True, choices=[('Queued', 'Queued'), ('Failed', 'Failed')], max_length=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='usertrade',
+            index=models.Index(fields=['signal', 'auth_user'], name='user_trade_signal_user_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 6.0 on 2026-10-18 09:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def replay_positions(signals):
+    """
+    rebuild_open_positions' replay, copied so this migration does not change with it: applies
+    (id, strategy_id, symbol, side, tradeSide) rows in id order the way ingest does.
+    """
+    positions = {}
+    for signal_id, strategy_id, symbol, side, trade_side in signals:
+        if trade_side == 'OPEN':
+            positions.setdefault((strategy_id, symbol, side), []).append(signal_id)
+        elif trade_side == 'CLOSE':
+            open_ids = positions.get((strategy_id, symbol, 'BUY' if side == 'SELL' else 'SELL'))
+            if open_ids:
+                open_ids.pop()
+    return {key: open_ids for key, open_ids in positions.items() if open_ids}
+
+
+def backfill_open_positions(apps, schema_editor):
+    """Positions opened before this table existed, so their closes still find them."""
+    Signal = apps.get_model('api', 'Signal')
+    OpenPosition = apps.get_model('api', 'OpenPosition')
+    using = schema_editor.connection.alias
+    signals = (
+        Signal.objects.using(using).filter(strategy__isnull=False).order_by('id')
+        .values_list('id', 'strategy_id', 'symbol', 'side', 'tradeSide')
+        .iterator(chunk_size=5000)
+    )
+    OpenPosition.objects.using(using).bulk_create([
+        OpenPosition(
+            strategy_id=strategy_id, symbol=symbol, side=side,
+            open_count=len(open_ids), latest_signal_id=open_ids[-1], signal_ids=open_ids,
+        )
+        for (strategy_id, symbol, side), open_ids in replay_positions(signals).items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_user_trade_dispatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenPosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=255)),
+                ('side', models.CharField(help_text='The opening side (BUY or SELL).', max_length=255)),
+                ('open_count', models.IntegerField(default=0)),
+                ('signal_ids', models.JSONField(default=list, help_text='Unmatched OPEN signal ids, oldest first; closes match the newest.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('latest_signal', models.ForeignKey(blank=True, db_column='latest_signal_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.signal')),
+                ('strategy', models.ForeignKey(db_column='strategy_id', on_delete=django.db.models.deletion.CASCADE, to='api.strategy')),
+            ],
+            options={
+                'verbose_name': 'Open Position',
+                'db_table': 'open_positions',
+                'constraints': [models.UniqueConstraint(fields=('strategy', 'symbol', 'side'), name='open_position_key_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_open_positions, migrations.RunPython.noop),
+    ]
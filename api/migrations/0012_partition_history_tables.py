@@ -0,0 +1,97 @@
+# Generated by Django 6.0 on 2026-10-18 09:32
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations
+from django.utils import timezone
+
+MONTHS_AHEAD = 3
+
+# Needs PostgreSQL 14 or later (Django's own minimum). Partitioned tables cannot have
+# identity columns before PostgreSQL 17, so each rebuilt table numbers its ids from a
+# plain sequence owned by the id column.
+#
+# The foreign keys and indexes of each table as of this migration, recreated on the
+# partitioned table. Partitioned indexes and foreign keys cascade to every partition.
+CONSTRAINTS_SQL = {
+    'banditmessages': [
+        'CREATE INDEX "banditmessages_status_idx" ON "banditmessages" ("status", "id")',
+    ],
+    'user_trades': [
+        'ALTER TABLE "user_trades" ADD CONSTRAINT "user_trades_auth_user_id_fk_auth_user_id" '
+        'FOREIGN KEY ("auth_user_id") REFERENCES "auth_user" ("id") DEFERRABLE INITIALLY DEFERRED',
+        'ALTER TABLE "user_trades" ADD CONSTRAINT "user_trades_signal_id_fk_signal_id" '
+        'FOREIGN KEY ("signal_id") REFERENCES "signal" ("id") DEFERRABLE INITIALLY DEFERRED',
+        'CREATE INDEX "user_trades_auth_user_id_idx" ON "user_trades" ("auth_user_id")',
+        'CREATE INDEX "user_trades_signal_id_idx" ON "user_trades" ("signal_id")',
+        'CREATE INDEX "user_trade_signal_user_idx" ON "user_trades" ("signal_id", "auth_user_id")',
+    ],
+}
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_table(schema_editor, table):
+    """
+    Rebuilds one table as RANGE (created_at) partitioned, with a partition per month from
+    its oldest row to MONTHS_AHEAD months out (names match api.includes.partitions).
+    Partitioned tables need the partition key in their primary key, so it becomes (id, created_at).
+    """
+    qn = schema_editor.quote_name
+    legacy = f'{table}_legacy'
+    sequence = f'{table}_id_seq'
+
+    schema_editor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+    schema_editor.execute(
+        f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING STORAGE) "
+        f"PARTITION BY RANGE ({qn('created_at')})"
+    )
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN({qn('created_at')}) FROM {qn(legacy)}")
+        oldest = cursor.fetchone()[0] or timezone.now()
+    oldest = oldest.astimezone(dt_timezone.utc)
+    month = datetime(oldest.year, oldest.month, 1, tzinfo=dt_timezone.utc)
+    now = timezone.now().astimezone(dt_timezone.utc)
+    last = add_months(datetime(now.year, now.month, 1, tzinfo=dt_timezone.utc), MONTHS_AHEAD)
+    while month <= last:
+        schema_editor.execute(
+            f"CREATE TABLE {qn(f'{table}_{month:%Y_%m}')} PARTITION OF {qn(table)} FOR VALUES FROM (%s) TO (%s)",
+            [month, add_months(month, 1)],
+        )
+        month = add_months(month, 1)
+    schema_editor.execute(f"CREATE TABLE {qn(f'{table}_default')} PARTITION OF {qn(table)} DEFAULT")
+
+    schema_editor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")
+    # Dropping the old table frees its identity sequence and its index and constraint names
+    schema_editor.execute(f"DROP TABLE {qn(legacy)}")
+    schema_editor.execute(f"CREATE SEQUENCE {qn(sequence)} AS bigint OWNED BY {qn(table)}.{qn('id')}")
+    schema_editor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN {qn('id')} SET DEFAULT nextval(%s::regclass)", [sequence])
+    schema_editor.execute(f"SELECT setval(%s::regclass, COALESCE(MAX({qn('id')}), 0) + 1, false) FROM {qn(table)}", [sequence])
+    schema_editor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(f'{table}_pkey')} PRIMARY KEY ({qn('id')}, {qn('created_at')})")
+
+    for sql in CONSTRAINTS_SQL[table]:
+        schema_editor.execute(sql)
+
+
+def partition_history_tables(apps, schema_editor):
+    # Declarative partitioning is PostgreSQL only; other databases keep plain tables
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in CONSTRAINTS_SQL:
+        partition_table(schema_editor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_openposition'),
+    ]
+
+    operations = [
+        # Not reversed: the partitioned tables keep every column and index the models expect
+        migrations.RunPython(partition_history_tables, migrations.RunPython.noop),
+    ]
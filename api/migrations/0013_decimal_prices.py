@@ -0,0 +1,88 @@
+# Generated by Django 6.0 on 2026-10-18 09:51
+
+from decimal import Context, Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+# Unconvertible values listed in the error
+MAX_REPORTED_VALUES = 50
+
+SIGNAL_PRICE_FIELDS = ('price', 'tpPrice', 'tpOrderPrice', 'slPrice')
+USER_TRADE_NUMERIC_FIELDS = ('exchange_mark_price', 'trade_value', 'trade_qty')
+
+
+def to_decimal(value):
+    """
+    The api.includes.sizing.normalize_decimal rules, copied so this migration does not change with them.
+    None and blank values become NULL; raises InvalidOperation for values that are not numbers
+    or do not fit numeric(30, 12).
+    """
+    if value is None or not value.strip():
+        return None
+    number = Decimal(value.strip())
+    if not number.is_finite() or number.adjusted() >= 18:
+        raise InvalidOperation(value)
+    return number.quantize(Decimal('1e-12'), context=Context(prec=30, rounding=ROUND_HALF_UP))
+
+
+def backfill(model, fields, using):
+    """
+    Copies the varchar columns into their numeric shadows, BATCH_SIZE rows per update.
+    Returns the (table, id, column, value) of every value that could not be converted.
+    """
+    failures = []
+    last_id = 0
+    while True:
+        rows = list(model.objects.using(using).filter(id__gt=last_id).order_by('id').only('id', *fields)[:BATCH_SIZE])
+        if not rows:
+            return failures
+        for row in rows:
+            for name in fields:
+                try:
+                    setattr(row, f'{name}_decimal', to_decimal(getattr(row, name)))
+                except InvalidOperation:
+                    failures.append((model._meta.db_table, row.id, name, getattr(row, name)))
+        model.objects.using(using).bulk_update(rows, [f'{name}_decimal' for name in fields])
+        last_id = rows[-1].id
+
+
+def backfill_decimals(apps, schema_editor):
+    """
+    Fills the numeric columns, and aborts the migration when a stored value is not a number:
+    0014 drops the varchar columns, so it would be lost. Fix or clear the listed values and
+    run the migration again.
+    """
+    using = schema_editor.connection.alias
+    failures = backfill(apps.get_model('api', 'Signal'), SIGNAL_PRICE_FIELDS, using)
+    failures += backfill(apps.get_model('api', 'UserTrade'), USER_TRADE_NUMERIC_FIELDS, using)
+    if failures:
+        listed = '\n'.join(f"  {table} id={row_id} {name}={value!r}" for table, row_id, name, value in failures[:MAX_REPORTED_VALUES])
+        more = f"\n  ... and {len(failures) - MAX_REPORTED_VALUES} more" if len(failures) > MAX_REPORTED_VALUES else ''
+        raise ValueError(f"{len(failures)} stored prices or quantities are not numbers and would be lost:\n{listed}{more}")
+
+
+def decimal_field():
+    return models.DecimalField(max_digits=30, decimal_places=12, blank=True, null=True)
+
+
+# Adds a numeric shadow column next to each varchar price column and fills it;
+# 0014_decimal_prices_swap replaces the varchar columns with them.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_partition_history_tables'),
+    ]
+
+    operations = [
+        *[
+            migrations.AddField(model_name='signal', name=f'{name}_decimal', field=decimal_field())
+            for name in SIGNAL_PRICE_FIELDS
+        ],
+        *[
+            migrations.AddField(model_name='usertrade', name=f'{name}_decimal', field=decimal_field())
+            for name in USER_TRADE_NUMERIC_FIELDS
+        ],
+        # Reversed by dropping the shadow columns
+        migrations.RunPython(backfill_decimals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 6.0 on 2026-10-18 09:51
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+BATCH_SIZE = 2000
+
+SIGNAL_PRICE_FIELDS = ('price', 'tpPrice', 'tpOrderPrice', 'slPrice')
+USER_TRADE_NUMERIC_FIELDS = ('exchange_mark_price', 'trade_value', 'trade_qty')
+
+
+def collapse_equal_prices(apps, schema_editor):
+    """
+    Signals whose prices differed only as strings ("100.0" and "100") are duplicates once
+    numeric and would block signal_dedup_uniq. Keep the oldest row of each group, as 0004 did.
+    """
+    Signal = apps.get_model('api', 'Signal')
+    UserTrade = apps.get_model('api', 'UserTrade')
+    OpenPosition = apps.get_model('api', 'OpenPosition')
+    using = schema_editor.connection.alias
+    key = ['strategy_id', 'symbol', 'side', 'tradeSide', 'price_decimal']
+
+    groups = (
+        Signal.objects.using(using)
+        .filter(strategy__isnull=False, tradeSide__isnull=False, price_decimal__isnull=False)
+        .values(*key)
+        .annotate(keep_id=Min('id'), copies=Count('id'))
+        .filter(copies__gt=1)
+    )
+    extra_ids = set()
+    for group in groups:
+        extra = Signal.objects.using(using).filter(**{field: group[field] for field in key}).exclude(id=group['keep_id'])
+        group_ids = list(extra.values_list('id', flat=True))
+        UserTrade.objects.using(using).filter(signal_id__in=group_ids).update(signal_id=group['keep_id'])
+        extra_ids.update(group_ids)
+    if not extra_ids:
+        return
+
+    # A collapsed duplicate no longer counts as an open entry of its position
+    for position in OpenPosition.objects.using(using).all():
+        signal_ids = [signal_id for signal_id in position.signal_ids if signal_id not in extra_ids]
+        if not signal_ids:
+            position.delete()
+        elif len(signal_ids) != len(position.signal_ids):
+            position.signal_ids = signal_ids
+            position.open_count = len(signal_ids)
+            position.latest_signal_id = signal_ids[-1]
+            position.save(update_fields=['signal_ids', 'open_count', 'latest_signal_id'])
+    Signal.objects.using(using).filter(id__in=extra_ids).delete()
+
+
+def to_string(value):
+    """Canonical string of a stored decimal ('100.500000000000' becomes '100.5'), as normalize_decimal writes them."""
+    if value is None:
+        return None
+    return format(value.normalize() or Decimal(0), 'f')
+
+
+def restore(model, fields, using):
+    """Refills the re-added varchar columns from the numeric *_decimal columns, BATCH_SIZE rows per update."""
+    last_id = 0
+    while True:
+        rows = list(model.objects.using(using).filter(id__gt=last_id).order_by('id').only('id', *[f'{name}_decimal' for name in fields])[:BATCH_SIZE])
+        if not rows:
+            return
+        for row in rows:
+            for name in fields:
+                setattr(row, name, to_string(getattr(row, f'{name}_decimal')))
+        model.objects.using(using).bulk_update(rows, list(fields))
+        last_id = rows[-1].id
+
+
+def restore_strings(apps, schema_editor):
+    using = schema_editor.connection.alias
+    restore(apps.get_model('api', 'Signal'), SIGNAL_PRICE_FIELDS, using)
+    restore(apps.get_model('api', 'UserTrade'), USER_TRADE_NUMERIC_FIELDS, using)
+
+
+# Swaps the varchar price columns for the numeric ones 0013_decimal_prices filled.
+# Reversing re-adds the varchar columns and fills them back from the numeric values.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_decimal_prices'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='signal',
+            name='signal_dedup_uniq',
+        ),
+        # Collapsed duplicates are not restored on reverse
+        migrations.RunPython(collapse_equal_prices, migrations.RunPython.noop),
+        # Runs on reverse only, once the varchar columns are back
+        migrations.RunPython(migrations.RunPython.noop, restore_strings),
+        *[
+            operation
+            for name in SIGNAL_PRICE_FIELDS
+            for operation in (
+                migrations.RemoveField(model_name='signal', name=name),
+                migrations.RenameField(model_name='signal', old_name=f'{name}_decimal', new_name=name),
+            )
+        ],
+        *[
+            operation
+            for name in USER_TRADE_NUMERIC_FIELDS
+            for operation in (
+                migrations.RemoveField(model_name='usertrade', name=name),
+                migrations.RenameField(model_name='usertrade', old_name=f'{name}_decimal', new_name=name),
+            )
+        ],
+        migrations.AddConstraint(
+            model_name='signal',
+            constraint=models.UniqueConstraint(condition=models.Q(('strategy__isnull', False)), fields=('strategy', 'symbol', 'side', 'tradeSide', 'price'), name='signal_dedup_uniq'),
+        ),
+    ]
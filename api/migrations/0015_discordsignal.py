@@ -0,0 +1,191 @@
+# Generated by Django 6.0 on 2026-10-18 09:20
+
+from datetime import datetime, timedelta, timezone
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+# The old tables had no timestamps. Merged signals get this sentinel plus their new id in
+# seconds, so they sort before every real signal and keep their order (see created_at's help_text).
+LEGACY_CREATED_AT = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+# Old per-source tables: (source, signal model, take-profit model)
+SOURCE_MODELS = (
+    ('HRJ', 'HRJDiscordSignal', 'HRJTakeProfitTrade'),
+    ('FJ', 'FJDiscordSignal', 'FJTakeProfitTrade'),
+    ('SIGSCAN', 'SIGSCANDiscordSignal', 'SIGSCANTakeProfitTrade'),
+)
+SIGNAL_FIELDS = ('strategy_id', 'asset', 'trade_type', 'entry_price', 'entry_order_type', 'stop_loss')
+
+
+def copy_signals(old_signals, new_signal, new_take_profit, take_profits_of, make_signal):
+    """Copies signals and their take-profit ladders in id order, BATCH_SIZE signals per insert."""
+    last_id = 0
+    while True:
+        batch = list(old_signals.filter(id__gt=last_id).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            return
+        created = new_signal.objects.bulk_create([make_signal(signal) for signal in batch])
+        new_ids = {old.id: new.id for old, new in zip(batch, created)}
+        new_take_profit.objects.bulk_create([
+            new_take_profit(signal_id=new_ids[tp.signal_id], series_num=tp.series_num, tp_price=tp.tp_price)
+            for tp in take_profits_of(list(new_ids)).order_by('signal_id', 'series_num')
+        ])
+        last_id = batch[-1].id
+
+
+def stamp_legacy_signals(signal_model):
+    """Replaces the insert time auto_now_add gave the merged signals with LEGACY_CREATED_AT + id seconds."""
+    ids = list(signal_model.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        signal_model.objects.filter(id__in=batch).update(created_at=models.Case(
+            *[models.When(id=signal_id, then=models.Value(LEGACY_CREATED_AT + timedelta(seconds=signal_id))) for signal_id in batch],
+            output_field=models.DateTimeField(),
+        ))
+
+
+def merge_discord_signals(apps, schema_editor):
+    DiscordSignal = apps.get_model('api', 'DiscordSignal')
+    TakeProfitTrade = apps.get_model('api', 'TakeProfitTrade')
+    for source, signal_model, take_profit_model in SOURCE_MODELS:
+        OldSignal = apps.get_model('api', signal_model)
+        OldTakeProfit = apps.get_model('api', take_profit_model)
+
+        def make_signal(signal, source=source):
+            extra = {'leverage': signal.leverage, 'balance': signal.balance} if hasattr(signal, 'balance') else {}
+            return DiscordSignal(source=source, **{field: getattr(signal, field) for field in SIGNAL_FIELDS}, **extra)
+
+        copy_signals(
+            OldSignal.objects.all(), DiscordSignal, TakeProfitTrade,
+            lambda ids, OldTakeProfit=OldTakeProfit: OldTakeProfit.objects.filter(signal_id__in=ids),
+            make_signal,
+        )
+    stamp_legacy_signals(DiscordSignal)
+
+
+def split_discord_signals(apps, schema_editor):
+    DiscordSignal = apps.get_model('api', 'DiscordSignal')
+    TakeProfitTrade = apps.get_model('api', 'TakeProfitTrade')
+    for source, signal_model, take_profit_model in SOURCE_MODELS:
+        OldSignal = apps.get_model('api', signal_model)
+        OldTakeProfit = apps.get_model('api', take_profit_model)
+        has_balance = any(field.name == 'balance' for field in OldSignal._meta.fields)
+
+        def make_signal(signal, OldSignal=OldSignal, has_balance=has_balance):
+            extra = {'leverage': signal.leverage, 'balance': signal.balance or 0} if has_balance else {}
+            return OldSignal(**{field: getattr(signal, field) for field in SIGNAL_FIELDS}, **extra)
+
+        copy_signals(
+            DiscordSignal.objects.filter(source=source), OldSignal, OldTakeProfit,
+            lambda ids: TakeProfitTrade.objects.filter(signal_id__in=ids),
+            make_signal,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_decimal_prices_swap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscordSignal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text="The channel's signal type, e.g. 'HRJ'.", max_length=50)),
+                ('asset', models.CharField(max_length=255)),
+                ('trade_type', models.CharField(choices=[('long', 'Long'), ('short', 'Short')], max_length=5)),
+                ('leverage', models.IntegerField(default=1)),
+                ('balance', models.DecimalField(blank=True, decimal_places=2, help_text='Percentage of capital allocated (HRJ).', max_digits=12, null=True)),
+                ('entry_price', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('entry_order_type', models.CharField(choices=[('market', 'Market'), ('limit', 'Limit')], max_length=6)),
+                ('stop_loss', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('strategy', models.ForeignKey(blank=True, db_column='strategy_id', null=True, on_delete=django.db.models.deletion.CASCADE, to='api.strategy')),
+            ],
+            options={
+                'verbose_name': 'Discord Signal',
+                'db_table': 'discord_signal',
+                'indexes': [
+                    models.Index(fields=['source', 'asset', 'created_at'], name='discord_signal_source_idx'),
+                    models.Index(fields=['-created_at'], name='discord_signal_created_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='TakeProfitTrade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series_num', models.IntegerField()),
+                ('tp_price', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('signal', models.ForeignKey(db_column='signal_id', on_delete=django.db.models.deletion.CASCADE, to='api.discordsignal')),
+            ],
+            options={
+                'verbose_name': 'Take Profit Trade',
+                'db_table': 'take_profit_trade',
+                'unique_together': {('signal', 'series_num')},
+            },
+        ),
+        migrations.RunPython(merge_discord_signals, split_discord_signals),
+        migrations.DeleteModel(
+            name='HRJTakeProfitTrade',
+        ),
+        migrations.DeleteModel(
+            name='FJTakeProfitTrade',
+        ),
+        migrations.DeleteModel(
+            name='SIGSCANTakeProfitTrade',
+        ),
+        migrations.DeleteModel(
+            name='HRJDiscordSignal',
+        ),
+        migrations.DeleteModel(
+            name='FJDiscordSignal',
+        ),
+        migrations.DeleteModel(
+            name='SIGSCANDiscordSignal',
+        ),
+        # Per-source proxies, so the existing admin pages and permissions keep working. The
+        # DiscordSignalSource mixin (source filter and default) only matters at runtime, so
+        # the historical models use plain DiscordSignal bases.
+        migrations.CreateModel(
+            name='HRJDiscordSignal',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'HRJ Discord Signal',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('api.discordsignal',),
+        ),
+        migrations.CreateModel(
+            name='FJDiscordSignal',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'FJ Discord Signal',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('api.discordsignal',),
+        ),
+        migrations.CreateModel(
+            name='SIGSCANDiscordSignal',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'SIGSCAN Discord Signal',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('api.discordsignal',),
+        ),
+    ]
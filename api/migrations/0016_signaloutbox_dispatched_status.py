@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_discordsignal'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='signaloutbox',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Dispatched', 'Dispatched'), ('Processed', 'Processed'), ('Failed', 'Failed')], default='Pending', max_length=10),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 09:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertrade',
+            name='user_api',
+            field=models.ForeignKey(blank=True, db_column='user_api_id', null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.userapi'),
+        ),
+    ]
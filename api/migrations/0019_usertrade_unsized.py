@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_usertrade_user_api'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertrade',
+            name='reason',
+            field=models.CharField(blank=True, help_text='Why no order was sent (Unsized trades).', max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='usertrade',
+            name='status',
+            field=models.CharField(blank=True, choices=[('Queued', 'Queued'), ('Failed', 'Failed'), ('Unsized', 'Unsized')], max_length=10, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_usertrade_unsized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='signaloutbox',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, help_text='When orders were last sent for the entry.', null=True),
+        ),
+        migrations.AddField(
+            model_name='signaloutbox',
+            name='ingested',
+            field=models.JSONField(blank=True, help_text="The ingested signal's dispatchSignal arguments (signal_message, signal_id, open_trade_id).", null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_signaloutbox_dispatched_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheStats',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('hits', models.BigIntegerField(default=0)),
+                ('misses', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Cache Stats',
+                'verbose_name_plural': 'Cache Stats',
+                'db_table': 'cache_stats',
+            },
+        ),
+    ]
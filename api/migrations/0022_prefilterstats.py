@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_cachestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrefilterStats',
+            fields=[
+                ('mode', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('agree', models.BigIntegerField(default=0)),
+                ('disagree', models.BigIntegerField(default=0)),
+                ('missed_signals', models.BigIntegerField(default=0, help_text='Disagreements where Gemini found a signal the pre-filter would have dropped.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Pre-filter Stats',
+                'verbose_name_plural': 'Pre-filter Stats',
+                'db_table': 'prefilter_stats',
+            },
+        ),
+    ]
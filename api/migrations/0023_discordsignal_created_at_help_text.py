@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_prefilterstats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='discordsignal',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, help_text='Signals merged from the old per-source tables have no real time: 2000-01-01 UTC plus their id in seconds.'),
+        ),
+    ]
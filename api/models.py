@@ -102,22 +102,63 @@ class UserApi(models.Model):
         return f"UserApi {self.id}"
 
 
+class AccountBalance(models.Model):
+    """
+    Latest balance snapshot of an exchange account, refreshed by the refresh_balances command
+    so the signal path can size orders without calling the exchange.
+    """
+    user_api = models.OneToOneField(UserApi, on_delete=models.CASCADE, db_column='user_api_id', related_name='balance')
+    currency = models.CharField(max_length=20, default='USDT')
+    available = models.DecimalField(max_digits=30, decimal_places=12, help_text="Margin available for new positions.")
+    equity = models.DecimalField(max_digits=30, decimal_places=12, blank=True, null=True)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'account_balances'
+        verbose_name = "Account Balance"
+
+    def __str__(self):
+        return f"{self.user_api} {self.available} {self.currency}"
+
+
+class ExchangeSymbolRule(models.Model):
+    """An exchange's lot and tick size rules for one symbol, used to size opening orders."""
+    exchange = models.ForeignKey(SupportedExchange, on_delete=models.CASCADE, db_column='exchange_id')
+    symbol = models.CharField(max_length=50, help_text="The symbol as sent in signals, e.g. 'BTCUSDT'.")
+    qty_step = models.DecimalField(max_digits=30, decimal_places=12, help_text="Order quantities are whole multiples of this.")
+    min_qty = models.DecimalField(max_digits=30, decimal_places=12, default=0)
+    tick_size = models.DecimalField(max_digits=30, decimal_places=12, help_text="Order prices are whole multiples of this.")
+    min_notional = models.DecimalField(max_digits=30, decimal_places=12, default=0, help_text="Minimum order value (qty * price).")
+    max_leverage = models.IntegerField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'exchange_symbol_rules'
+        verbose_name = "Exchange Symbol Rule"
+        unique_together = ('exchange', 'symbol')
+
+    def __str__(self):
+        return f"{self.exchange} {self.symbol}"
+
+
+# Fields that identify a duplicate TradingView signal
+SIGNAL_DEDUP_FIELDS = ['strategy', 'symbol', 'side', 'tradeSide', 'price']
+
+
 class Signal(models.Model):
     strategy = models.ForeignKey(Strategy, on_delete=models.CASCADE, db_column='strategy_id', blank=True, null=True)
     symbol = models.CharField(max_length=255)
     side = models.CharField(max_length=255)
     
-    # Note: Using CharField because SQL definition is varchar(40). 
-    # If you perform math on these, consider changing to DecimalField in the future.
-    price = models.CharField(max_length=40, blank=True, null=True)
+    # Numeric, so "100.0" and "100" are the same price for dedup (see normalize_decimal)
+    price = models.DecimalField(max_digits=30, decimal_places=12, blank=True, null=True)
     orderType = models.CharField(max_length=255, blank=True, null=True)
     
-    tpPrice = models.CharField(max_length=40, blank=True, null=True)
+    tpPrice = models.DecimalField(max_digits=30, decimal_places=12, blank=True, null=True)
     tpStopType = models.CharField(max_length=255, blank=True, null=True)
     tpOrderType = models.CharField(max_length=255, blank=True, null=True)
-    tpOrderPrice = models.CharField(max_length=40, blank=True, null=True)
+    tpOrderPrice = models.DecimalField(max_digits=30, decimal_places=12, blank=True, null=True)
     
-    slPrice = models.CharField(max_length=40, blank=True, null=True)
+    slPrice = models.DecimalField(max_digits=30, decimal_places=12, blank=True, null=True)
     slStopType = models.CharField(max_length=255, blank=True, null=True)
     slOrderType = models.CharField(max_length=255, blank=True, null=True)
     
@@ -129,11 +170,82 @@ class Signal(models.Model):
     class Meta:
         db_table = 'signal'
         verbose_name = "TradingView Signal"
+        indexes = [
+            # Open-trade searches over history: equality on strategy/symbol/side/tradeSide, newest first
+            models.Index(fields=['strategy', 'symbol', 'side', 'tradeSide', '-id'], name='signal_open_trade_idx'),
+        ]
+        constraints = [
+            # Dedup key. The unique index also serves the dedup lookup, and lets the insert
+            # itself reject a duplicate instead of a separate exists() check.
+            models.UniqueConstraint(
+                fields=SIGNAL_DEDUP_FIELDS,
+                condition=models.Q(strategy__isnull=False),
+                name='signal_dedup_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.symbol} {self.side} ({self.id})"
 
 
+class OpenPosition(models.Model):
+    """
+    The OPEN signals of a strategy, symbol and side that no CLOSE has matched yet.
+    Maintained when signals are ingested, so a close resolves its open signal with one
+    unique-key lookup instead of searching Signal history (see rebuild_open_positions).
+    """
+    strategy = models.ForeignKey(Strategy, on_delete=models.CASCADE, db_column='strategy_id')
+    symbol = models.CharField(max_length=255)
+    side = models.CharField(max_length=255, help_text="The opening side (BUY or SELL).")
+    open_count = models.IntegerField(default=0)
+    latest_signal = models.ForeignKey(Signal, on_delete=models.SET_NULL, db_column='latest_signal_id', blank=True, null=True, related_name='+')
+    signal_ids = models.JSONField(default=list, help_text="Unmatched OPEN signal ids, oldest first; closes match the newest.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'open_positions'
+        verbose_name = "Open Position"
+        constraints = [
+            models.UniqueConstraint(fields=['strategy', 'symbol', 'side'], name='open_position_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.strategy_id} {self.symbol} {self.side} x{self.open_count}"
+
+
+class SignalOutbox(models.Model):
+    """Raw TradingView webhook payloads waiting to be run through processTradingViewSignal."""
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        # Signal ingested and orders being sent; resumed once dispatched_at is older than the dispatch timeout
+        ('Dispatched', 'Dispatched'),
+        ('Processed', 'Processed'),
+        ('Failed', 'Failed'),
+    ]
+
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.IntegerField(default=0)
+    result = models.CharField(max_length=255, blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Earliest time the row may be (re)processed.")
+    ingested = models.JSONField(blank=True, null=True, help_text="The ingested signal's dispatchSignal arguments (signal_message, signal_id, open_trade_id).")
+    dispatched_at = models.DateTimeField(blank=True, null=True, help_text="When orders were last sent for the entry.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'signal_outbox'
+        verbose_name = "Signal Outbox Entry"
+        verbose_name_plural = "Signal Outbox"
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='signal_outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Outbox {self.id} ({self.status})"
+
+
 class StrategySubscription(models.Model):
     STATUS_CHOICES = [
         ('Active', 'Active'),
@@ -178,118 +290,244 @@ class StrategySubscription(models.Model):
 
 
 class UserTrade(models.Model):
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Failed', 'Failed'),
+        # Opening order that could not be sized, so none was sent
+        ('Unsized', 'Unsized'),
+    ]
+
     auth_user = models.ForeignKey(auth_user, on_delete=models.RESTRICT, db_column='auth_user_id')
     signal = models.ForeignKey(Signal, on_delete=models.CASCADE, db_column='signal_id')
+    # The subscription's exchange account; a user subscribed through several accounts gets one row per account
+    user_api = models.ForeignKey(UserApi, on_delete=models.SET_NULL, db_column='user_api_id', blank=True, null=True)
     
     position_id = models.CharField(max_length=20, blank=True, null=True)
-    exchange_mark_price = models.CharField(max_length=20, blank=True, null=True)
-    trade_value = models.CharField(max_length=20, blank=True, null=True)
-    trade_qty = models.CharField(max_length=20, blank=True, null=True)
+    exchange_mark_price = models.DecimalField(max_digits=30, decimal_places=12, blank=True, null=True)
+    trade_value = models.DecimalField(max_digits=30, decimal_places=12, blank=True, null=True)
+    trade_qty = models.DecimalField(max_digits=30, decimal_places=12, blank=True, null=True)
+
+    # Set when the order is dispatched to the exchange queue
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, blank=True, null=True)
+    message_id = models.CharField(max_length=100, blank=True, null=True, help_text="SQS MessageId of the queued order.")
+    reason = models.CharField(max_length=100, blank=True, null=True, help_text="Why no order was sent (Unsized trades).")
+    created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'user_trades'
+        indexes = [
+            # getUserData: a closing signal's open positions per subscriber
+            models.Index(fields=['signal', 'auth_user'], name='user_trade_signal_user_idx'),
+        ]
 
     def __str__(self):
         if self.auth_user:
             return f"Trade {self.id} for {self.auth_user.username}"
         return f"Trade {self.id}"
 
-class HRJDiscordSignal(models.Model):
+class DiscordSignal(models.Model):
+    """
+    A trade signal parsed from a Discord channel. `source` is the channel's signal type
+    (HRJ, FJ, SIGSCAN, ...), so a new channel needs no new table.
+    """
     strategy = models.ForeignKey(Strategy, on_delete=models.CASCADE, db_column='strategy_id', blank=True, null=True)
+    source = models.CharField(max_length=50, help_text="The channel's signal type, e.g. 'HRJ'.")
     asset = models.CharField(max_length=255)
     trade_type = models.CharField(max_length=5, choices=[('long', 'Long'), ('short', 'Short')])
     leverage = models.IntegerField(default=1)
-    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True, help_text="Percentage of capital allocated (HRJ).")
     entry_price = models.DecimalField(max_digits=20, decimal_places=10)
     entry_order_type = models.CharField(max_length=6, choices=[('market', 'Market'), ('limit', 'Limit')])
     stop_loss = models.DecimalField(max_digits=20, decimal_places=10)
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Signals merged from the old per-source tables have no real time: 2000-01-01 UTC plus their id in seconds.",
+    )
 
     class Meta:
-        db_table = 'hrj_discord_signal'
-        verbose_name = "HRJ Discord Signal"
-    
-    def __str__(self):
-        return f"{self.asset} {self.trade_type}"
-
-class FJDiscordSignal(models.Model):
-    strategy = models.ForeignKey(Strategy, on_delete=models.CASCADE, db_column='strategy_id', blank=True, null=True)
-    asset = models.CharField(max_length=255)
-    trade_type = models.CharField(max_length=5, choices=[('long', 'Long'), ('short', 'Short')])
-    entry_price = models.DecimalField(max_digits=20, decimal_places=10)
-    entry_order_type = models.CharField(max_length=6, choices=[('market', 'Market'), ('limit', 'Limit')])
-    stop_loss = models.DecimalField(max_digits=20, decimal_places=10)
+        db_table = 'discord_signal'
+        verbose_name = "Discord Signal"
+        indexes = [
+            # A source's signals for an asset over time
+            models.Index(fields=['source', 'asset', 'created_at'], name='discord_signal_source_idx'),
+            # Latest signals across sources
+            models.Index(fields=['-created_at'], name='discord_signal_created_idx'),
+        ]
 
-    class Meta:
-        db_table = 'fj_discord_signal'
-        verbose_name = "FJ Discord Signal"
-    
     def __str__(self):
-        return f"{self.asset} {self.trade_type}"
-    
-class SIGSCANDiscordSignal(models.Model):
-    strategy = models.ForeignKey(Strategy, on_delete=models.CASCADE, db_column='strategy_id', blank=True, null=True)
-    asset = models.CharField(max_length=255)
-    trade_type = models.CharField(max_length=5, choices=[('long', 'Long'), ('short', 'Short')])
-    entry_price = models.DecimalField(max_digits=20, decimal_places=10)
-    entry_order_type = models.CharField(max_length=6, choices=[('market', 'Market'), ('limit', 'Limit')])
-    stop_loss = models.DecimalField(max_digits=20, decimal_places=10)
+        return f"{self.source} {self.asset} {self.trade_type}"
 
-    class Meta:
-        db_table = 'sigscan_discord_signal'
-        verbose_name = "SIGSCAN Discord Signal"
-    
-    def __str__(self):
-        return f"{self.asset} {self.trade_type}"
-    
-class HRJTakeProfitTrade(models.Model):
-    signal = models.ForeignKey(HRJDiscordSignal, on_delete=models.CASCADE, db_column='signal_id')
-    series_num = models.IntegerField(default=1)
+class TakeProfitTrade(models.Model):
+    signal = models.ForeignKey(DiscordSignal, on_delete=models.CASCADE, db_column='signal_id')
+    series_num = models.IntegerField()
     tp_price = models.DecimalField(max_digits=20, decimal_places=10)
 
     class Meta:
-        db_table = 'hrj_take_profit_trade'
-        verbose_name = "HRJ Take Profit Trade"
+        db_table = 'take_profit_trade'
+        verbose_name = "Take Profit Trade"
         unique_together = ('signal', 'series_num')
-    
+
     def __str__(self):
-        return f"TP {self.series_num} for HRJ Signal {self.signal_id}"
+        return f"TP {self.series_num} for Discord Signal {self.signal_id}"
 
-class FJTakeProfitTrade(models.Model):
-    signal = models.ForeignKey(FJDiscordSignal, on_delete=models.CASCADE, db_column='signal_id')
-    series_num = models.IntegerField()
-    tp_price = models.DecimalField(max_digits=20, decimal_places=10)
+
+# Per-source views of DiscordSignal, kept so the HRJ, FJ and SIGSCAN admin pages work as before
+class DiscordSignalSourceManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(source=self.model.SOURCE)
+
+class DiscordSignalSource:
+    SOURCE = None
+
+    def save(self, *args, **kwargs):
+        self.source = self.SOURCE
+        super().save(*args, **kwargs)
+
+class HRJDiscordSignal(DiscordSignalSource, DiscordSignal):
+    SOURCE = 'HRJ'
+    objects = DiscordSignalSourceManager()
 
     class Meta:
-        db_table = 'fj_take_profit_trade'
-        verbose_name = "FJ Take Profit Trade"
-        unique_together = ('signal', 'series_num')
-    
-    def __str__(self):
-        return f"TP {self.series_num} for FJ Signal {self.signal_id}"
+        proxy = True
+        verbose_name = "HRJ Discord Signal"
 
-class SIGSCANTakeProfitTrade(models.Model):
-    signal = models.ForeignKey(SIGSCANDiscordSignal, on_delete=models.CASCADE, db_column='signal_id')
-    series_num = models.IntegerField()
-    tp_price = models.DecimalField(max_digits=20, decimal_places=10)
+class FJDiscordSignal(DiscordSignalSource, DiscordSignal):
+    SOURCE = 'FJ'
+    objects = DiscordSignalSourceManager()
 
     class Meta:
-        db_table = 'sigscan_take_profit_trade'
-        verbose_name = "SIGSCAN Take Profit Trade"
-        unique_together = ('signal', 'series_num')
-    
-    def __str__(self):
-        return f"TP {self.series_num} for SIGSCAN Signal {self.signal_id}"
+        proxy = True
+        verbose_name = "FJ Discord Signal"
+
+class SIGSCANDiscordSignal(DiscordSignalSource, DiscordSignal):
+    SOURCE = 'SIGSCAN'
+    objects = DiscordSignalSourceManager()
+
+    class Meta:
+        proxy = True
+        verbose_name = "SIGSCAN Discord Signal"
 
 class BanditMessages(models.Model):
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Processing', 'Processing'),
+        ('Signal', 'Signal'),
+        ('NoSignal', 'Not a Signal'),
+        ('Failed', 'Failed'),
+        ('Skipped', 'Skipped'),
+    ]
+
     channel_id = models.CharField(max_length=255, blank=True, null=True)
     channel_name = models.CharField(max_length=255, blank=True, null=True)
     message = models.TextField(blank=True, null=True)
+
+    # Parsing state, maintained by the process_bandit_messages worker
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.IntegerField(default=0)
+    parse_latency_ms = models.IntegerField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'banditmessages'
         verbose_name_plural = "Bandit Messages"
+        indexes = [
+            models.Index(fields=['status', 'id'], name='banditmessages_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Message from {self.channel_name} at {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+class GeminiParseCache(models.Model):
+    """Gemini parse results keyed by a hash of the channel and normalized message text."""
+    key = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the channel and normalized message.")
+    channel = models.CharField(max_length=255)
+    result = models.JSONField(help_text="The parsed signal data, or false for a non-signal.")
+    latency_ms = models.IntegerField(default=0, help_text="Gemini latency when the result was first produced.")
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'gemini_parse_cache'
+        verbose_name = "Gemini Parse Cache Entry"
+        verbose_name_plural = "Gemini Parse Cache"
+
+    def __str__(self):
+        return f"{self.channel} {self.key[:12]}"
+
+class GeminiUsage(models.Model):
+    """Token counts and latency of one Gemini request (one row per request, so per batch when micro-batching)."""
+    strategy = models.ForeignKey(Strategy, on_delete=models.SET_NULL, db_column='strategy_id', blank=True, null=True)
+    channel = models.CharField(max_length=255)
+    model_name = models.CharField(max_length=100)
+    messages = models.IntegerField(default=1, help_text="Discord messages parsed by the request.")
+    prompt_tokens = models.IntegerField(default=0)
+    response_tokens = models.IntegerField(default=0)
+    cached_tokens = models.IntegerField(default=0, help_text="Prompt tokens served from Gemini context caching.")
+    latency_ms = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'gemini_usage'
+        verbose_name = "Gemini Usage"
+        verbose_name_plural = "Gemini Usage"
+        indexes = [
+            models.Index(fields=['created_at', 'strategy'], name='gemini_usage_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} {self.prompt_tokens}+{self.response_tokens} tokens"
+
+class CacheVersion(models.Model):
+    """
+    Version counters shared by every worker's per-process caches (see api.caches.SharedVersion).
+    Bumping a counter makes the other workers drop their copy of that cache.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'cache_version'
+        verbose_name = "Cache Version"
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class CacheStats(models.Model):
+    """Hit and miss counts of a per-process cache, summed over every worker (see api.caches.TTLCache)."""
+    name = models.CharField(max_length=50, primary_key=True)
+    hits = models.BigIntegerField(default=0)
+    misses = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'cache_stats'
+        verbose_name = "Cache Stats"
+        verbose_name_plural = "Cache Stats"
+
+    def __str__(self):
+        return f"{self.name} {self.hits} hits / {self.misses} misses"
+
+
+class PrefilterStats(models.Model):
+    """How often the pre-filter agreed with Gemini, per mode, summed over every worker (see api.includes.prefilter)."""
+    mode = models.CharField(max_length=10, primary_key=True)
+    agree = models.BigIntegerField(default=0)
+    disagree = models.BigIntegerField(default=0)
+    missed_signals = models.BigIntegerField(default=0, help_text="Disagreements where Gemini found a signal the pre-filter would have dropped.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'prefilter_stats'
+        verbose_name = "Pre-filter Stats"
+        verbose_name_plural = "Pre-filter Stats"
 
     def __str__(self):
-        return f"Message from {self.channel_name} at {self.created_at.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.mode} {self.agree} agree / {self.disagree} disagree"
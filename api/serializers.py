@@ -10,6 +10,7 @@ from .models import (
     BlogPost,
     BanditMessages,
 )
+from api.includes.sizing import normalize_decimal
 
 class BlogPostSerializer(serializers.ModelSerializer):
     class Meta:        
@@ -60,4 +61,26 @@ class UserTradeSerializer(serializers.ModelSerializer):
 class BanditMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = BanditMessages
-        fields = ['id', 'channel_id', 'channel_name', 'message', 'created_at']
\ No newline at end of file
+        fields = ['id', 'channel_id', 'channel_name', 'message', 'status', 'created_at']
+        read_only_fields = ['status']
+
+def validate_decimal(value):
+    try:
+        normalize_decimal(value)
+    except ValueError as e:
+        raise serializers.ValidationError(str(e))
+    return value
+
+class TradingViewSignalSerializer(serializers.Serializer):
+    """Validates the fields processTradingViewSignal requires before a payload is queued."""
+    strategy = serializers.CharField(max_length=50)
+    auth = serializers.CharField(allow_blank=True)
+    symbol = serializers.CharField(max_length=255)
+    side = serializers.CharField(max_length=255)
+    price = serializers.CharField(max_length=40, validators=[validate_decimal])
+    time = serializers.CharField()
+    tradeSide = serializers.CharField(max_length=20)
+    # Optional prices, stored as numbers like price (services.SIGNAL_PRICE_FIELDS)
+    tpPrice = serializers.CharField(max_length=40, required=False, allow_null=True, allow_blank=True, validators=[validate_decimal])
+    tpOrderPrice = serializers.CharField(max_length=40, required=False, allow_null=True, allow_blank=True, validators=[validate_decimal])
+    slPrice = serializers.CharField(max_length=40, required=False, allow_null=True, allow_blank=True, validators=[validate_decimal])
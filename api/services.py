@@ -1,20 +1,31 @@
 import logging
-import json
+import threading
+import time
 import boto3
-from typing import List, Dict, Union
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Q, Subquery
+from django.utils import timezone
 from decimal import Decimal
-import os
-from pydantic import BaseModel, Field
-
-import google.generativeai as genai
 
 # Define custom exceptions for the service layer
 class DuplicateSignalError(Exception): pass
 class StrategyNotFoundError(Exception): pass
 class NoSubscribersError(Exception): pass
+class InvalidSignalError(Exception): pass
+
+# Returned by ingestSignal instead of a signal id when the signal already exists
+DUPLICATE_SIGNAL = 'duplicate'
 
-from api.models import BlogPost, Strategy, Signal, StrategySubscription, UserTrade
-from api.includes.bitunix import createBitunixOrder
+from api.models import BlogPost, Strategy, Signal, OpenPosition, SignalOutbox, StrategySubscription, UserApi, UserTrade, AccountBalance, SIGNAL_DEDUP_FIELDS
+from api.includes.exchanges import ExchangeAPIError, get_exchange_adapter
+from api.includes.sizing import normalize_decimal, round_price, size_positions
+from api.caches import getCachedStrategy, getStrategyRoster, getSymbolRules
 
 # Get an instance of a logger for the current module
 logger = logging.getLogger(__name__)
@@ -37,9 +48,9 @@ def authenticate(password, auth):
         return False
 
 def getStrategyID(strat_name, auth):
-    """Retrieve strategy ID from the database using the Django ORM."""
+    """Retrieve strategy ID through the per-process strategy cache."""
     try:
-        strategy = Strategy.objects.get(name=strat_name)
+        strategy = getCachedStrategy(name=strat_name)
         if authenticate(strategy.password, auth) == True:
             logger.debug(f"Authentication passed for {strat_name}")
             logger.debug(f"Strategy ID: {strategy.strategy_id} found for {strat_name}")
@@ -98,286 +109,744 @@ def createSignalMessage(data, strategy_id):
         else:
             signalDict['slOrderPrice'] = None
 
+    # Canonical strings, so equal prices dedup and render the same (e.g. "100.0" -> "100")
+    for field in SIGNAL_PRICE_FIELDS:
+        try:
+            signalDict[field] = normalize_decimal(signalDict[field])
+        except ValueError as e:
+            raise InvalidSignalError(f"Invalid {field}: {e}") from None
+
     logger.debug(f"Signal Message: {signalDict}")
     return signalDict
 
-def dupeSignalCheck(signal_message):
-    """Checks for a duplicate signal"""
-    is_duplicate = Signal.objects.filter(
-        symbol=signal_message['symbol'],
-        strategy_id=signal_message['strategy_id'],
-        side=signal_message['side'],
-        tradeSide=signal_message['tradeSide'],
-        price=signal_message['price']
-    ).exists()
-
-    logger.debug(f"Dupe Check Result: {is_duplicate}")
-    return is_duplicate
-
-def addSignalToDB(signal_message):
-    """Adds the signal to the database and returns the signal_id"""
-    # The 'strategy_id' key in signal_message holds the ID, but the model field is 'strategy'.
-    # We create an instance of the Strategy model to assign it.
-    strategy_instance = Strategy.objects.get(pk=signal_message['strategy_id'])
-
-    new_signal = Signal.objects.create(
-        strategy=strategy_instance,
-        symbol=signal_message['symbol'],
-        side=signal_message['side'],
-        price=signal_message['price'],
-        orderType=signal_message['orderType'],
-        tpPrice=signal_message['tpPrice'],
-        tpStopType=signal_message['tpStopType'],
-        tpOrderType=signal_message['tpOrderType'],
-        tpOrderPrice=signal_message['tpOrderPrice'],
-        slPrice=signal_message['slPrice'],
-        slStopType=signal_message['slStopType'],
-        slOrderType=signal_message['slOrderType'],
-        tradeSide=signal_message['tradeSide']
-    )
-    logger.debug(f"Signal Added with ID: {new_signal.id}")
-    return new_signal.id
+# Signal columns stored as numbers
+SIGNAL_PRICE_FIELDS = ('price', 'tpPrice', 'tpOrderPrice', 'slPrice')
+
+# Signal columns written on ingest, in insert order
+SIGNAL_INGEST_FIELDS = (
+    'symbol', 'side', 'price', 'orderType',
+    'tpPrice', 'tpStopType', 'tpOrderType', 'tpOrderPrice',
+    'slPrice', 'slStopType', 'slOrderType', 'tradeSide',
+)
+
+def ingestSignal(signal_message):
+    """
+    Dedups and stores the signal in one statement.
 
-def getExchangeList(signal_id):
+    Returns the new signal_id, or DUPLICATE_SIGNAL when the signal_dedup_uniq
+    constraint already holds a matching row. The database decides, so concurrent
+    gunicorn workers handling the same webhook cannot both insert it.
+    """
+    now = timezone.now()
+    values = {'strategy': signal_message['strategy_id'], 'created_at': now, 'updated_at': now}
+    values.update({field: signal_message[field] for field in SIGNAL_INGEST_FIELDS})
+
+    if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+        # INSERT ... ON CONFLICT DO NOTHING RETURNING id: a single round trip that returns no row for a duplicate
+        qn = connection.ops.quote_name
+        fields = [Signal._meta.get_field(name) for name in values]
+        conflict_columns = [Signal._meta.get_field(name).column for name in SIGNAL_DEDUP_FIELDS]
+        sql = (
+            f"INSERT INTO {qn(Signal._meta.db_table)} ({', '.join(qn(field.column) for field in fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(fields))}) "
+            # The target must repeat the partial index predicate of signal_dedup_uniq
+            f"ON CONFLICT ({', '.join(qn(column) for column in conflict_columns)}) WHERE {qn('strategy_id')} IS NOT NULL "
+            f"DO NOTHING RETURNING {qn(Signal._meta.pk.column)}"
+        )
+        params = [field.get_db_prep_save(values[field.name], connection) for field in fields]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        signal_id = row[0] if row else DUPLICATE_SIGNAL
+    else:
+        # Fallback for backends without ON CONFLICT ... RETURNING: let the constraint reject the insert
+        try:
+            with transaction.atomic():
+                signal_id = Signal.objects.create(**{('strategy_id' if name == 'strategy' else name): value for name, value in values.items()}).id
+        except IntegrityError:
+            signal_id = DUPLICATE_SIGNAL
+
+    logger.debug(f"Signal ingest result: {signal_id}")
+    return signal_id
+
+def getExchangeList(strategy_id):
     """Gets a list of exchanges tied to the strategy being used"""
-    try:
-        signal = Signal.objects.get(pk=signal_id)
-        subscriptions = StrategySubscription.objects.filter(
-            strategy=signal.strategy,
-            status='Active'
-        ).select_related('user_api__exchange')
-
-        exchange_names = {sub.user_api.exchange.name for sub in subscriptions if sub.user_api and sub.user_api.exchange}
-        logger.debug(f"Exchange queues to send to: {exchange_names}")
-        return list(exchange_names)
-    except Signal.DoesNotExist:
-        logger.error(f"Signal with ID {signal_id} not found.")
-        return []
+    exchange_names = {entry.exchange_name for entry in getStrategyRoster(strategy_id)}
+    logger.debug(f"Exchange queues to send to: {exchange_names}")
+    return list(exchange_names)
+
+def openingSide(closing_side):
+    """The side of the position a closing signal on closing_side closes."""
+    return "BUY" if closing_side == "SELL" else "SELL"
+
+def openPosition(signal_message, signal_id):
+    """
+    Adds an ingested OPEN signal to its strategy/symbol/side open position.
+    Runs in the transaction that ingested the signal; the position row is locked until it commits.
+    """
+    position, _ = OpenPosition.objects.select_for_update().get_or_create(
+        strategy_id=signal_message['strategy_id'], symbol=signal_message['symbol'], side=signal_message['side']
+    )
+    position.signal_ids.append(signal_id)
+    position.open_count = len(position.signal_ids)
+    position.latest_signal_id = signal_id
+    position.save()
+
+def closePosition(signal_message):
+    """
+    Matches an ingested CLOSE signal to the newest unmatched OPEN signal on the opposite
+    side and removes it from the open position, deleting the position once nothing is open.
+    Runs in the transaction that ingested the signal.
+
+    Returns the open signal's id, or None when nothing is open.
+    """
+    position = OpenPosition.objects.select_for_update().filter(
+        strategy_id=signal_message['strategy_id'], symbol=signal_message['symbol'], side=openingSide(signal_message['side'])
+    ).first()
+    if position is None or not position.signal_ids:
+        logger.warning(f"No open trade found for closing signal: {signal_message}")
+        return None
+
+    signal_id = position.signal_ids.pop()
+    if position.signal_ids:
+        position.open_count = len(position.signal_ids)
+        position.latest_signal_id = position.signal_ids[-1]
+        position.save()
+    else:
+        position.delete()
+    logger.debug(f"Open Trade ID: {signal_id} closed, {len(position.signal_ids)} still open.")
+    return signal_id
 
 def findOpenTrade(signal_message):
-    """Finds the open trade tied to the signal"""
-    closing_side = signal_message['side']
-    opening_side = "BUY" if closing_side == "SELL" else "SELL"
-
-    open_trade_signal = Signal.objects.filter(
-        symbol=signal_message['symbol'],
-        strategy_id=signal_message['strategy_id'],
-        side=opening_side,
-        tradeSide='OPEN'
-    ).order_by('-id').first()
-
-    if open_trade_signal:
-        logger.debug(f"Open Trade ID: {open_trade_signal.id} found.")
-        return open_trade_signal.id
-    
-    logger.warning(f"No open trade found for closing signal: {signal_message}")
-    return None
+    """Finds the open trade a closing signal would close, without closing it."""
+    open_trade_id = OpenPosition.objects.filter(
+        strategy_id=signal_message['strategy_id'], symbol=signal_message['symbol'], side=openingSide(signal_message['side'])
+    ).values_list('latest_signal_id', flat=True).first()
+
+    if open_trade_id is None:
+        logger.warning(f"No open trade found for closing signal: {signal_message}")
+    return open_trade_id
+
+def subscriberKey(user_item):
+    """
+    Identifies one subscription in dispatch results and user_trades: a user subscribed through
+    several exchange accounts places one order per account.
+    """
+    return (user_item['user_id'], user_item.get('user_api_id'))
 
 def getUserData(strategy, openTradeId):
     """Look up strategy data and get all user API keys, leverage amount and order qty"""
-    subscriptions = StrategySubscription.objects.filter(
-        strategy_id=strategy,
-        status='Active'
-    ).select_related('auth_user', 'user_api__exchange')
+    roster = getStrategyRoster(strategy)
 
     user_data_list = []
     if openTradeId != None:
-        # For closing trades, fetch associated open trade data
-        open_trades = UserTrade.objects.filter(signal_id=openTradeId).select_related('auth_user')
-        trades_by_user = {trade.auth_user.id: trade for trade in open_trades}
-
-        for sub in subscriptions:
-            if sub.auth_user.id in trades_by_user:
-                trade = trades_by_user[sub.auth_user.id]
-                user_data_list.append({
-                    'api_key': sub.user_api.api_key, 'api_secret': sub.user_api.api_secret,
-                    'user_id': sub.auth_user.id, 'name': sub.user_api.exchange.name,
-                    'portfolio_percentage': sub.portfolio_percentage, 'leverage_amount': sub.leverage_amount,
-                    'max_tp_trades': sub.max_tp_trades, 'enable_sl_trail': sub.enable_sl_trail, 'enable_sms_confirm': sub.enable_sms_confirm,
-                    'position_id': trade.position_id, 'trade_qty': trade.trade_qty
-                })
+        # For closing trades, fetch the subscribers' orders for the open signal (rows written
+        # before dispatch statuses were recorded have no status and are kept; orders that were
+        # never queued have no position to close). The orders
+        # were written after their signal, which lets PostgreSQL skip older user_trades partitions.
+        # Each subscription is matched to the order of its own exchange account; rows written
+        # before user_trades recorded the account are matched by user alone.
+        open_trades = UserTrade.objects.filter(
+            signal_id=openTradeId,
+            auth_user_id__in=[entry.user_id for entry in roster],
+            created_at__gte=Subquery(Signal.objects.filter(id=openTradeId).values('created_at')[:1])
+        ).exclude(status__in=['Failed', 'Unsized']).values('auth_user_id', 'user_api_id', 'position_id', 'trade_qty')
+        trades_by_subscriber = {(trade['auth_user_id'], trade['user_api_id']): trade for trade in open_trades}
+
+        for entry in roster:
+            trade = trades_by_subscriber.get((entry.user_id, entry.user_api_id)) or trades_by_subscriber.get((entry.user_id, None))
+            if trade is not None:
+                user_item = entry.asUserData()
+                user_item.update({'position_id': trade['position_id'], 'trade_qty': trade['trade_qty']})
+                user_data_list.append(user_item)
     else:
         # For opening trades
-        for sub in subscriptions:
-            user_data_list.append({
-                'api_key': sub.user_api.api_key, 'api_secret': sub.user_api.api_secret,
-                'user_id': sub.auth_user.id, 'name': sub.user_api.exchange.name,
-                'portfolio_percentage': sub.portfolio_percentage, 'leverage_amount': sub.leverage_amount,
-                'max_tp_trades': sub.max_tp_trades, 'enable_sl_trail': sub.enable_sl_trail, 'enable_sms_confirm': sub.enable_sms_confirm
-            })
+        user_data_list = [entry.asUserData() for entry in roster]
 
     logger.debug(f"User Data: {user_data_list}")
     return user_data_list
 
+def getBalances(user_api_ids, max_age=None):
+    """
+    Returns {user_api_id: available balance} from the refresh_balances snapshots, in one query.
+    Snapshots older than max_age seconds (default BALANCE_MAX_AGE) are left out.
+    """
+    max_age = settings.BALANCE_MAX_AGE if max_age is None else max_age
+    snapshots = AccountBalance.objects.filter(
+        user_api_id__in=[user_api_id for user_api_id in user_api_ids if user_api_id is not None],
+        refreshed_at__gte=timezone.now() - timedelta(seconds=max_age)
+    ).values_list('user_api_id', 'available')
+    return dict(snapshots)
+
+def unsizedReason(balance, percentage):
+    """Why size_positions could not size a subscriber."""
+    if balance is None:
+        return 'no balance snapshot'
+    if not percentage:
+        return 'no portfolio percentage'
+    return 'below exchange minimums'
+
+def sizeOpenTrades(signal_message, user_data):
+    """
+    Sets trade_qty and order_price for every subscriber of an opening signal, sizing each
+    exchange's subscribers in one pass from their balance snapshot, portfolio percentage and
+    leverage. Subscribers that cannot be sized (no symbol rules, no fresh balance, below the
+    exchange minimums) get an unsized_reason instead, and createTrade sends them no order.
+    """
+    by_exchange = {}
+    for user_item in user_data:
+        by_exchange.setdefault(user_item['name'], []).append(user_item)
+
+    rules_by_exchange = {}
+    for exchange_name, items in by_exchange.items():
+        rules = getSymbolRules(exchange_name, signal_message['symbol'])
+        if rules is None:
+            logger.warning(f"No symbol rules for {signal_message['symbol']} on {exchange_name}, its subscribers get no order.")
+            for item in items:
+                item['unsized_reason'] = 'no symbol rules'
+        else:
+            rules_by_exchange[exchange_name] = rules
+    if not rules_by_exchange:
+        return
+
+    balances = getBalances(
+        user_item.get('user_api_id') for exchange_name in rules_by_exchange for user_item in by_exchange[exchange_name]
+    )
+    for exchange_name, rules in rules_by_exchange.items():
+        items = by_exchange[exchange_name]
+        price = round_price(signal_message['price'], rules.tick_size)
+        item_balances = [balances.get(item.get('user_api_id')) for item in items]
+        quantities = size_positions(
+            price,
+            item_balances,
+            [item['portfolio_percentage'] for item in items],
+            [item['leverage_amount'] for item in items],
+            rules
+        )
+        for item, balance, quantity in zip(items, item_balances, quantities):
+            if quantity is None:
+                item['unsized_reason'] = unsizedReason(balance, item['portfolio_percentage'])
+            else:
+                item['trade_qty'] = quantity
+                item['order_price'] = str(price)
+
+        unsized = quantities.count(None)
+        if unsized:
+            logger.info(f"{unsized} of {len(items)} {exchange_name} subscribers could not be sized for {signal_message['symbol']}.")
+
 def createTrade(signal_message, user_data, signal_id, exchange_list):
+    """
+    Builds each subscriber's exchange order and dispatches them to the exchange queues.
+    Opening orders that could not be sized are not sent; they are recorded as Unsized.
+    Returns the per-subscription result map produced by dispatchTrades, with the unsized
+    subscribers added as {'exchange', 'status': 'unsized', 'message_id': None, 'reason'}.
+    """
     # Bug fix: Use a dictionary comprehension to avoid all keys sharing the same list reference.
     user_records = {exchange: [] for exchange in exchange_list}
     logger.debug(f"Exchange List: {user_records}")
 
+    if signal_message['tradeSide'] != 'CLOSE':
+        sizeOpenTrades(signal_message, user_data)
+
+    # Adapters and their order templates are resolved once per exchange, not per subscriber
+    adapters = {}
+    templates = {}
+    unsized = []
     for user_item in user_data:
-        if user_item['name'] == 'Bitunix':
-            # Create the exchange-specific order using the correct user data
-            bitunixOrder = createBitunixOrder(signal_message, user_item)
-            # Merge the generated order into the user's data payload
-            user_item.update(bitunixOrder)
-            sendToQueue(user_item, 'Bitunix')
-        #if user_data[i]['name'] == 'Coinbase':
-        #    user_data[i].update(coinbaseOrder)
-        #    sendToQueue(user_data[i], 'Coinbase')
-    return user_records
-
-def sendToQueue(user_trade, exchange_name):
-    logger.debug(f"Send to Queue: {user_trade}")
-
-    if user_trade["name"] == 'Bitunix':
-        # Boto3 will automatically find credentials from environment variables.
-        # Removed commented-out keys for security hygiene.
-        client = boto3.client('sqs', region_name='us-east-1')
-        response = client.send_message(
-            QueueUrl=f"https://sqs.us-east-1.amazonaws.com/531367011239/{user_trade['name']}_Queue",
-            MessageBody=json.dumps(user_trade)
+        exchange_name = user_item['name']
+        if exchange_name not in adapters:
+            adapters[exchange_name] = get_exchange_adapter(exchange_name)
+            if adapters[exchange_name] is None:
+                logger.warning(f"No exchange adapter registered for '{exchange_name}', its subscribers are skipped.")
+            else:
+                templates[exchange_name] = adapters[exchange_name].order_template(signal_message)
+        adapter = adapters[exchange_name]
+        if adapter is None:
+            continue
+        if user_item.get('unsized_reason'):
+            unsized.append(user_item)
+            continue
+        user_records.setdefault(adapter.name, []).append(user_item)
+
+    results = dispatchTrades(user_records, templates)
+    for user_item in unsized:
+        results[subscriberKey(user_item)] = {
+            'exchange': adapters[user_item['name']].name, 'status': 'unsized', 'message_id': None, 'reason': user_item['unsized_reason'],
+        }
+    if unsized:
+        logger.info(f"{len(unsized)} subscribers of signal {signal_id} were not sent an order: they could not be sized.")
+    recordUserTrades(signal_id, [*chain.from_iterable(user_records.values()), *unsized], results)
+    return results
+
+# UserTrade columns written on dispatch, in insert order
+USER_TRADE_DISPATCH_FIELDS = ('auth_user_id', 'user_api_id', 'signal_id', 'position_id', 'trade_qty', 'status', 'message_id', 'reason')
+
+# UserTrade status of each dispatch result status
+USER_TRADE_STATUSES = {'queued': 'Queued', 'failed': 'Failed', 'unsized': 'Unsized'}
+
+def recordUserTrades(signal_id, user_trades, results):
+    """
+    Writes one UserTrade per subscriber in user_trades that has a dispatch result, with the
+    SQS message id and whether the order was queued, in a single insert. Closing signals
+    find their subscribers' positions through these rows (see getUserData).
+
+    Returns the number of rows written.
+    """
+    rows = []
+    for user_trade in user_trades:
+        result = results.get(subscriberKey(user_trade))
+        if result is None:
+            continue
+        rows.append((
+            user_trade['user_id'], user_trade.get('user_api_id'), signal_id, user_trade.get('position_id'), user_trade.get('trade_qty'),
+            USER_TRADE_STATUSES[result['status']], result['message_id'], result.get('reason'),
+        ))
+    if not rows:
+        return 0
+
+    if connection.vendor == 'postgresql':
+        # bulk_create prepares every value of every row in Python (tens of ms per 1k rows);
+        # INSERT ... SELECT FROM unnest sends one array per column instead
+        qn = connection.ops.quote_name
+        fields = [UserTrade._meta.get_field(name) for name in USER_TRADE_DISPATCH_FIELDS]
+        created_at = UserTrade._meta.get_field('created_at')
+        sql = (
+            f"INSERT INTO {qn(UserTrade._meta.db_table)} "
+            f"({', '.join(qn(field.column) for field in fields)}, {qn(created_at.column)}) "
+            f"SELECT *, %s FROM unnest({', '.join(f'%s::{field.db_type(connection)}[]' for field in fields)})"
         )
-        logger.debug(f"Send to Queue Response: {response}")
+        params = [created_at.get_db_prep_save(timezone.now(), connection), *map(list, zip(*rows))]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+    else:
+        UserTrade.objects.bulk_create([UserTrade(**dict(zip(USER_TRADE_DISPATCH_FIELDS, row))) for row in rows])
 
-def processTradingViewSignal(data):
-    try:
-        strategy_id = getStrategyID(data['strategy'], data['auth'])
-        if strategy_id == None:
-            raise StrategyNotFoundError(f"Strategy '{data['strategy']}' not found.")
+    logger.debug(f"Recorded {len(rows)} user trades for signal {signal_id}")
+    return len(rows)
 
-        signal_message = createSignalMessage(data, strategy_id)
 
-        if not dupeSignalCheck(signal_message):
-            signal_id = addSignalToDB(signal_message)
-            exchange_list = getExchangeList(signal_id)
-            if signal_message['tradeSide'] == 'CLOSE':
-                openTradeId = findOpenTrade(signal_message)
-            else:
-                openTradeId = None
-            user_data = getUserData(signal_message['strategy_id'], openTradeId)
-            if not user_data:
-                raise NoSubscribersError(f"No active user subscriptions found for strategy_id: {signal_message['strategy_id']}. Halting trade creation.")
+# Dispatch pool shared by every signal handled in this process.
+_dispatch_executor = None
+_dispatch_executor_lock = threading.Lock()
 
-            createTrade(signal_message, user_data, signal_id, exchange_list)
-        else:
-            raise DuplicateSignalError("Duplicate signal found. Ignoring.")
+def getDispatchExecutor():
+    """Returns the bounded thread pool used to fan orders out, sized by DISPATCH_MAX_WORKERS."""
+    global _dispatch_executor
+    if _dispatch_executor is None:
+        with _dispatch_executor_lock:
+            if _dispatch_executor is None:
+                _dispatch_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'DISPATCH_MAX_WORKERS', 8),
+                    thread_name_prefix='tradefly-dispatch'
+                )
+    return _dispatch_executor
 
-    except (StrategyNotFoundError, DuplicateSignalError, NoSubscribersError) as e:
-        # Re-raise known exceptions to be handled by the view
-        raise e
-    except Exception as e:
-        # Log and re-raise any unexpected exceptions
-        logger.error(f"An unexpected error occurred in processTradingViewSignal: {e}", exc_info=True)
-        raise
+def dispatchTrades(user_records, templates=None):
+    """
+    Fans the orders in user_records ({exchange_name: [user_trade, ...]}) out to the
+    exchange queues. Each SQS batch runs as its own task on the dispatch pool, so the
+    webhook waits roughly as long as the slowest batch rather than the sum of all of them.
+    Message bodies are rendered by the exchange's OrderTemplate in templates when given,
+    otherwise the user trades are serialized as they are.
+
+    Returns a dict keyed by subscriberKey, (user_id, user_api_id):
+        {'exchange': <name>, 'status': 'queued' | 'failed', 'message_id': <SQS MessageId or None>}
+    """
+    client = getSQSClient()
+    executor = getDispatchExecutor()
+
+    futures = {}
+    for exchange_name, user_trades in user_records.items():
+        if not user_trades:
+            continue
+        adapter = get_exchange_adapter(exchange_name)
+        template = (templates or {}).get(exchange_name)
+        render = template.render if template is not None else adapter.serialize
+        queue_url = SQS_QUEUE_URL.format(queue_name=adapter.queue_name)
+        for start in range(0, len(user_trades), SQS_MAX_BATCH_SIZE):
+            batch = user_trades[start:start + SQS_MAX_BATCH_SIZE]
+            entries = {str(index): render(user_trade) for index, user_trade in enumerate(batch)}
+            future = executor.submit(sendBatchToQueue, client, queue_url, entries)
+            futures[future] = (exchange_name, batch)
+
+    results = {}
+    for future in as_completed(futures):
+        exchange_name, batch = futures[future]
+        try:
+            message_ids = future.result()
+        except Exception as e:
+            logger.error(f"Dispatch to {exchange_name} failed: {e}", exc_info=True)
+            message_ids = {}
+
+        for index, user_trade in enumerate(batch):
+            message_id = message_ids.get(str(index))
+            results[subscriberKey(user_trade)] = {
+                'exchange': exchange_name,
+                'status': 'queued' if message_id else 'failed',
+                'message_id': message_id,
+            }
 
+    logger.debug(f"Dispatch Results: {results}")
+    return results
+
+
+# SQS settings. send_message_batch accepts at most 10 entries per call.
+SQS_REGION = 'us-east-1'
+SQS_QUEUE_URL = "https://sqs.us-east-1.amazonaws.com/531367011239/{queue_name}"
+SQS_MAX_BATCH_SIZE = 10
+SQS_MAX_SEND_ATTEMPTS = 3
+SQS_RETRY_BACKOFF = 0.05
+# Error codes of calls SQS refused outright, so none of the batch was enqueued
+SQS_THROTTLING_ERROR_CODES = {'Throttling', 'ThrottlingException', 'RequestThrottled', 'AWS.SimpleQueueService.RequestThrottled'}
+
+_sqs_client = None
+_sqs_client_lock = threading.Lock()
+
+def getSQSClient():
+    """Returns the SQS client shared by this process, creating it on first use."""
+    global _sqs_client
+    if _sqs_client is None:
+        with _sqs_client_lock:
+            if _sqs_client is None:
+                # Boto3 will automatically find credentials from environment variables.
+                # Clients are thread-safe, so one instance serves every request in the worker.
+                # botocore's own retries would resend a batch after a read timeout, when SQS may
+                # already hold it; sendBatchToQueue retries only the failures that are safe to resend.
+                _sqs_client = boto3.client('sqs', region_name=SQS_REGION, config=Config(retries={'total_max_attempts': 1}))
+    return _sqs_client
+
+def sendToQueue(user_trades, exchange_name):
+    """
+    Sends a list of user trades to the exchange queue using send_message_batch.
 
+    Returns a list aligned with user_trades holding the SQS MessageId of each
+    entry, or None for entries that could not be delivered.
+    """
+    logger.debug(f"Send to Queue ({exchange_name}): {len(user_trades)} trade(s)")
+    client = getSQSClient()
+    adapter = get_exchange_adapter(exchange_name)
+    queue_url = SQS_QUEUE_URL.format(queue_name=adapter.queue_name)
+
+    message_ids = [None] * len(user_trades)
+    for start in range(0, len(user_trades), SQS_MAX_BATCH_SIZE):
+        entries = {
+            str(index): adapter.serialize(user_trades[index])
+            for index in range(start, min(start + SQS_MAX_BATCH_SIZE, len(user_trades)))
+        }
+        for entry_id, message_id in sendBatchToQueue(client, queue_url, entries).items():
+            message_ids[int(entry_id)] = message_id
+    return message_ids
 
-#######################################################################################################
+def isSafeToResend(error):
+    """
+    True when a failed send_message_batch call certainly enqueued nothing: the connection
+    was never made, or SQS throttled the call. Anything else (a read timeout, a dropped
+    connection, a server error) may have come after SQS accepted the batch.
+    """
+    if isinstance(error, (EndpointConnectionError, ConnectTimeoutError)):
+        return True
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in SQS_THROTTLING_ERROR_CODES
 
-# --- 1. Pydantic Schemas for Structured Output ---
+def sendBatchToQueue(client, queue_url, entries):
+    """
+    Sends up to SQS_MAX_BATCH_SIZE message bodies, keyed by entry id, in one
+    send_message_batch call. Only the entries that failed are retried, and a call that
+    raised is only retried when isSafeToResend, so an order is never queued twice.
 
-# Defines the structure for a single Take Profit (TP) entry
-class HRJTakeProfitTradesSchema(BaseModel):
-    """Corresponds to the HRJTakeProfitTrades model."""
-    series_num: int = Field(..., description="The sequential number of the take-profit target (e.g., 1, 2, 3...).")
-    tp_price: float = Field(..., description="The price at which to take profit.")
+    Returns a dict of entry id -> MessageId (None if the entry was never delivered).
+    """
+    results = {entry_id: None for entry_id in entries}
+    pending = dict(entries)
 
-# Defines the main trade signal structure, nesting the TP list
-class HRJDiscordSignalsSchema(BaseModel):
-    """Corresponds to the HRJDiscordSignals model."""
-    asset: str = Field(..., description="The cryptocurrency asset pair (e.g., 'LINK/USDT').")
-    trade_type: str = Field(..., description="The trade direction, must be 'long' or 'short' in lowercase.")
-    leverage: int = Field(..., description="The leverage multiplier (e.g., 5).")
-    balance: float = Field(..., description="The percentage of capital allocated (e.g., 3.00 for 3%).")
-    entry_price: float = Field(..., description="The price to enter the trade.")
-    entry_order_type: str = Field(..., description="The order type, must be 'market' or 'limit' in lowercase.")
-    stop_loss: float = Field(..., description="The stop-loss price.")
-    # Renaming this field to match the original model structure is complex with Pydantic
-    # so we keep it as a list of TP schemas
-    take_profits: List[HRJTakeProfitTradesSchema] = Field(..., description="A list of take-profit targets.")
+    for attempt in range(1, SQS_MAX_SEND_ATTEMPTS + 1):
+        try:
+            response = client.send_message_batch(
+                QueueUrl=queue_url,
+                Entries=[{'Id': entry_id, 'MessageBody': body} for entry_id, body in pending.items()]
+            )
+        except Exception as e:
+            if not isSafeToResend(e):
+                # SQS may hold the batch already, so it is reported as not delivered rather than resent
+                logger.error(f"send_message_batch to {queue_url} failed on attempt {attempt}, {len(pending)} entries may have been queued and are not resent: {e}")
+                pending = {}
+                break
+            # Nothing was queued (throttled, no connection), so every pending entry is retried
+            logger.warning(f"send_message_batch to {queue_url} failed on attempt {attempt}: {e}")
+            response = {'Failed': [{'Id': entry_id, 'SenderFault': False} for entry_id in pending]}
+
+        for success in response.get('Successful', []):
+            results[success['Id']] = success['MessageId']
+            pending.pop(success['Id'], None)
+
+        retryable = {}
+        for failure in response.get('Failed', []):
+            if failure.get('SenderFault'):
+                # Sender faults (bad payload, oversize message) will fail again, so drop them.
+                logger.error(f"SQS rejected entry {failure['Id']} for {queue_url}: {failure.get('Code')} {failure.get('Message')}")
+            elif failure['Id'] in pending:
+                retryable[failure['Id']] = pending[failure['Id']]
+        pending = retryable
+
+        if not pending:
+            break
+        if attempt < SQS_MAX_SEND_ATTEMPTS:
+            time.sleep(SQS_RETRY_BACKOFF * 2 ** (attempt - 1))
+
+    if pending:
+        logger.error(f"Giving up on {len(pending)} SQS entries for {queue_url} after {SQS_MAX_SEND_ATTEMPTS} attempts.")
+    logger.debug(f"Send to Queue Response: {results}")
+    return results
+
+def ingestTradingViewSignal(data):
+    """
+    Authenticates and stores a TradingView payload and updates its open position, in one
+    transaction. Returns (signal_message, signal_id, openTradeId) for dispatchSignal.
+    """
+    strategy_id = getStrategyID(data['strategy'], data['auth'])
+    if strategy_id == None:
+        raise StrategyNotFoundError(f"Strategy '{data['strategy']}' not found.")
 
+    signal_message = createSignalMessage(data, strategy_id)
 
-def create_gemini_prompt(signal_message: str) -> str:
+    # The signal row and its open position change commit together
+    with transaction.atomic():
+        signal_id = ingestSignal(signal_message)
+        if signal_id == DUPLICATE_SIGNAL:
+            raise DuplicateSignalError("Duplicate signal found. Ignoring.")
+        openTradeId = None
+        if signal_message['tradeSide'] == 'CLOSE':
+            openTradeId = closePosition(signal_message)
+        elif signal_message['tradeSide'] == 'OPEN':
+            openPosition(signal_message, signal_id)
+    return signal_message, signal_id, openTradeId
+
+def dispatchSignal(signal_message, signal_id, openTradeId, resend=False):
     """
-    Creates a highly structured prompt for the Gemini API to parse a trade signal message.
+    Sends an ingested signal's orders to the exchange queues. Returns the per-subscription results of createTrade.
+
+    With resend, subscribers that already have a queued (or unsized) user_trades row for the
+    signal are left out, so an interrupted dispatch is finished without repeating their orders.
     """
-    # The prompt is simplified because the Pydantic schema will handle the output format.
-    prompt = f"""You are an expert API endpoint for a trading bot. Your task is to analyze a plain text message and determine if it is a complete trade signal.
+    exchange_list = getExchangeList(signal_message['strategy_id'])
+    user_data = getUserData(signal_message['strategy_id'], openTradeId)
+    if not user_data:
+        raise NoSubscribersError(f"No active user subscriptions found for strategy_id: {signal_message['strategy_id']}. Halting trade creation.")
+
+    if resend:
+        recorded = set(
+            UserTrade.objects.filter(signal_id=signal_id)
+            .filter(Q(message_id__isnull=False) | Q(status='Unsized'))
+            .values_list('auth_user_id', 'user_api_id')
+        )
+        user_data = [user_item for user_item in user_data if subscriberKey(user_item) not in recorded]
+        logger.info(f"Resending signal {signal_id} to {len(user_data)} subscribers without a recorded order.")
+        if not user_data:
+            return {}
+
+    return createTrade(signal_message, user_data, signal_id, exchange_list)
+
+def processTradingViewSignal(data):
+    try:
+        return dispatchSignal(*ingestTradingViewSignal(data))
 
-If the message is a trade signal, you MUST extract the necessary values and return a minified JSON object that strictly adheres to the provided schema. The JSON output will be validated against the schema.
+    except (StrategyNotFoundError, DuplicateSignalError, NoSubscribersError, InvalidSignalError) as e:
+        # Re-raise known exceptions to be handled by the view
+        raise e
+    except Exception as e:
+        # Log and re-raise any unexpected exceptions
+        logger.error(f"An unexpected error occurred in processTradingViewSignal: {e}", exc_info=True)
+        raise
 
-If the message is NOT a complete trade signal (e.g., it's a trade update like 'TP hit', a general comment, or missing critical data), you MUST respond with the single word: false
 
-**Extraction Rules:**
-1. Extract numerical values only (e.g., 5 from '5X', 3.00 from '3% of capital').
-2. The 'trade_type' must be lowercase.
-3. The 'entry_order_type' must be lowercase and inferred from the text (e.g., 'limit order' -> 'limit', 'market' -> 'market').
 
----
+def enqueueTradingViewSignal(data):
+    """Stores a validated TradingView payload in the signal outbox with a single insert."""
+    entry = SignalOutbox.objects.create(payload=dict(data))
+    logger.debug(f"Signal queued in outbox with ID: {entry.id}")
+    return entry.id
 
-**Message to process:**
-{signal_message}
-"""
-    return prompt
+def getOutboxLag():
+    """Returns the age in seconds of the oldest pending outbox entry (0 when the outbox is drained)."""
+    oldest = SignalOutbox.objects.filter(status='Pending').order_by('created_at').values_list('created_at', flat=True).first()
+    if oldest is None:
+        return 0.0
+    return (timezone.now() - oldest).total_seconds()
 
-def call_gemini_api(prompt: str) -> Union[str, Dict]:
+def processOutboxEntry(max_attempts=5, retry_delay=5):
     """
-    Calls the Gemini API with a given prompt, enforcing Pydantic-based JSON output.
+    Claims the next pending outbox entry, ingests its signal and dispatches its orders.
 
-    Args:
-        prompt: The prompt to send to the Gemini API.
+    The row is locked (SELECT ... FOR UPDATE SKIP LOCKED) while the signal is ingested, and
+    is marked Dispatched, with its dispatchSignal arguments and dispatched_at, in the same
+    transaction. Until then a failure rolls everything back and the entry is retried. Orders
+    are sent after that commit. If dispatch fails, or the worker dies before the entry is
+    Processed, resumeDispatchedEntry sends the orders that were not recorded once the entry is
+    SIGNAL_OUTBOX_DISPATCH_TIMEOUT seconds old, so dispatch is at-least-once. Several workers
+    can drain the outbox concurrently.
 
-    Returns:
-        The text response (JSON string or 'false'), or an error message string.
+    Returns the claimed SignalOutbox instance, or None when nothing is pending.
     """
-    try:
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            return "Error: GEMINI_API_KEY not found in environment variables."
+    with transaction.atomic():
+        entry = (
+            SignalOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='Pending', available_at__lte=timezone.now())
+            .order_by('id')
+            .first()
+        )
+        if entry is None:
+            return None
 
-        # Configure once globally or within the function if preferred
-        genai.configure(api_key=api_key)
+        entry.attempts += 1
+        try:
+            # Savepoint so a failed signal only rolls back its own writes, not the outbox bookkeeping.
+            with transaction.atomic():
+                signal_message, signal_id, openTradeId = ingestTradingViewSignal(entry.payload)
+            entry.status = 'Dispatched'
+            entry.ingested = {'signal_message': signal_message, 'signal_id': signal_id, 'open_trade_id': openTradeId}
+            entry.dispatched_at = timezone.now()
+        except (StrategyNotFoundError, DuplicateSignalError, InvalidSignalError) as e:
+            entry.status = 'Processed'
+            entry.result = str(e)[:255]
+        except Exception as e:
+            entry.last_error = str(e)
+            if entry.attempts >= max_attempts:
+                entry.status = 'Failed'
+                logger.error(f"Outbox entry {entry.id} failed after {entry.attempts} attempts: {e}")
+            else:
+                entry.available_at = timezone.now() + timedelta(seconds=retry_delay * 2 ** (entry.attempts - 1))
+                logger.warning(f"Outbox entry {entry.id} failed on attempt {entry.attempts}, will retry: {e}")
+        entry.save()
 
-        model = genai.GenerativeModel('gemini-2.5-flash')
+    if entry.status == 'Dispatched':
+        dispatchOutboxEntry(entry)
+    elif entry.status != 'Pending':
+        finishOutboxEntry(entry)
+    return entry
 
-        # 1. Define the desired output structure using the Pydantic schema
-        generation_config = genai.GenerationConfig(
-            response_mime_type="application/json",
-            response_schema=HRJDiscordSignalsSchema,
-        )
+def resumeDispatchedEntry(max_attempts=5, timeout=None):
+    """
+    Claims the oldest entry left Dispatched for more than timeout seconds (default
+    SIGNAL_OUTBOX_DISPATCH_TIMEOUT), because its dispatch failed or its worker died, and
+    sends the orders of the subscribers that have none recorded yet. The entry is
+    stamped again first, so no other worker resumes it at the same time.
 
-        response = model.generate_content(
-            contents=prompt,
-            generation_config=generation_config,
+    Returns the resumed SignalOutbox instance, or None when no entry is overdue.
+    """
+    timeout = settings.SIGNAL_OUTBOX_DISPATCH_TIMEOUT if timeout is None else timeout
+    with transaction.atomic():
+        entry = (
+            SignalOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='Dispatched', dispatched_at__lte=timezone.now() - timedelta(seconds=timeout))
+            .order_by('id')
+            .first()
         )
+        if entry is None:
+            return None
 
-        response_text = response.text.strip()
-        
-        # 2. Handle the 'false' non-signal case separately
-        if response_text.lower() == "false":
-             return "false"
+        entry.attempts += 1
+        if entry.ingested is None:
+            # Dispatched before the dispatch arguments were recorded
+            entry.status = 'Failed'
+            entry.last_error = "Dispatch was interrupted and its signal is not recorded on the entry."
+        elif entry.attempts > max_attempts:
+            entry.status = 'Failed'
+        else:
+            entry.dispatched_at = timezone.now()
+        entry.save(update_fields=['attempts', 'status', 'last_error', 'dispatched_at'])
 
-        # 3. For a successful JSON response, parse it and return the required format
-        try:
-            parsed_data = json.loads(response_text)
-            
-            # Restructure the 'take_profits' list to match the two-model Django structure
-            take_profits_data = parsed_data.pop("take_profits", [])
-            
-            final_json = {
-                "HRJDiscordSignals": parsed_data,
-                "HRJTakeProfitTrades": take_profits_data
-            }
-            
-            # Return the final JSON as a string for minification/transfer purposes
-            return json.dumps(final_json) 
-            
-        except json.JSONDecodeError:
-            # This should rarely happen with response_schema, but is a robust fallback
-            return f"Error: Failed to decode JSON from API response: {response_text}"
+    if entry.status == 'Failed':
+        logger.error(f"Outbox entry {entry.id} failed during dispatch after {entry.attempts} attempts: {entry.last_error}")
+        finishOutboxEntry(entry)
+        return entry
 
+    logger.warning(f"Outbox entry {entry.id} was not processed within {timeout}s of dispatch, sending its unrecorded orders.")
+    dispatchOutboxEntry(entry, resend=True)
+    return entry
+
+def dispatchOutboxEntry(entry, resend=False):
+    """
+    Sends a Dispatched entry's orders (see dispatchSignal for resend) and marks it Processed.
+    On failure the entry stays Dispatched for resumeDispatchedEntry.
+    """
+    try:
+        results = dispatchSignal(
+            entry.ingested['signal_message'], entry.ingested['signal_id'], entry.ingested['open_trade_id'], resend=resend
+        )
+        entry.status = 'Processed'
+        entry.result = f"Dispatched to {len(results)} subscriber(s)."
+    except NoSubscribersError as e:
+        entry.status = 'Processed'
+        entry.result = str(e)[:255]
     except Exception as e:
-        return f"An unexpected error occurred while calling the Gemini API: {e}"
-            
-    
-       
\ No newline at end of file
+        entry.last_error = str(e)
+        entry.save(update_fields=['last_error'])
+        logger.error(f"Outbox entry {entry.id} failed during dispatch, its unrecorded orders are resent after the dispatch timeout: {e}", exc_info=True)
+        return
+    finishOutboxEntry(entry)
+
+def finishOutboxEntry(entry):
+    """Stamps a Processed or Failed entry with processed_at and saves its outcome."""
+    entry.processed_at = timezone.now()
+    logger.info(f"Outbox entry {entry.id} {entry.status.lower()} after {(entry.processed_at - entry.created_at).total_seconds():.3f}s: {entry.result or entry.last_error}")
+    entry.save(update_fields=['status', 'result', 'last_error', 'processed_at'])
+
+
+def fetchAccountBalance(account):
+    """Fetches one (user_api_id, exchange_name, api_key, api_secret) account's balance through its exchange adapter."""
+    user_api_id, exchange_name, api_key, api_secret = account
+    adapter = get_exchange_adapter(exchange_name)
+    if adapter is None:
+        raise ExchangeAPIError(f"No exchange adapter registered for '{exchange_name}'.")
+    return adapter.fetch_balance(api_key, api_secret)
+
+def supportsBalances(exchange_name):
+    """False for exchanges whose adapter cannot fetch balances; unregistered exchanges are fetched and fail."""
+    adapter = get_exchange_adapter(exchange_name)
+    return adapter is None or adapter.supports_balances
+
+def refreshBalances(max_age=None, workers=None):
+    """
+    Refetches the balance of every subscribed exchange account whose snapshot is missing or
+    older than max_age seconds (default BALANCE_REFRESH_INTERVAL), BALANCE_REFRESH_WORKERS
+    accounts at a time, and upserts the snapshots in one statement. Accounts whose fetch
+    fails keep their previous snapshot, which getBalances stops using once it is too old.
+
+    Returns (refreshed, failed) counts.
+    """
+    max_age = settings.BALANCE_REFRESH_INTERVAL if max_age is None else max_age
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    accounts = list(
+        UserApi.objects.filter(
+            strategysubscription__status='Active',
+            exchange__isnull=False, api_key__isnull=False, api_secret__isnull=False
+        ).exclude(balance__refreshed_at__gte=cutoff)
+        .distinct().values_list('id', 'exchange__name', 'api_key', 'api_secret')
+    )
+    # Accounts on exchanges without balance support are not fetched (and sized without a snapshot)
+    accounts = [account for account in accounts if supportsBalances(account[1])]
+    if not accounts:
+        return 0, 0
+
+    snapshots = []
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers or settings.BALANCE_REFRESH_WORKERS, thread_name_prefix='tradefly-balances') as executor:
+        futures = {executor.submit(fetchAccountBalance, account): account for account in accounts}
+        for future in as_completed(futures):
+            user_api_id, exchange_name = futures[future][:2]
+            try:
+                snapshot = future.result()
+            except Exception as e:
+                failed += 1
+                logger.warning(f"Could not refresh the {exchange_name} balance of UserApi {user_api_id}: {e}")
+                continue
+            snapshots.append(AccountBalance(
+                user_api_id=user_api_id, currency=snapshot.currency, available=snapshot.available,
+                equity=snapshot.equity, refreshed_at=timezone.now()
+            ))
+
+    AccountBalance.objects.bulk_create(
+        snapshots, update_conflicts=True, unique_fields=['user_api'],
+        update_fields=['currency', 'available', 'equity', 'refreshed_at']
+    )
+    logger.info(f"Refreshed {len(snapshots)} account balances, {failed} failed.")
+    return len(snapshots), failed
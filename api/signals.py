@@ -0,0 +1,29 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.models import Strategy, StrategySubscription, UserApi, SupportedExchange, ExchangeSymbolRule
+from api.caches import strategy_cache, roster_version, symbol_rules_cache
+
+
+@receiver([post_save, post_delete], sender=Strategy)
+def clear_strategy_cache(sender, instance, **kwargs):
+    """Drop cached strategies when one changes (a rename leaves the old name key behind, so clear all)."""
+    strategy_cache.clear()
+
+
+@receiver([post_save, post_delete], sender=StrategySubscription)
+@receiver([post_save, post_delete], sender=UserApi)
+@receiver([post_save, post_delete], sender=SupportedExchange)
+def clear_roster_cache(sender, instance, **kwargs):
+    """
+    Rebuild subscriber rosters after any subscription, API key or exchange change, in every
+    worker. Queryset update() and bulk_create() send no signals; call roster_version.bump() after them.
+    """
+    roster_version.bump()
+
+
+@receiver([post_save, post_delete], sender=ExchangeSymbolRule)
+@receiver([post_save, post_delete], sender=SupportedExchange)
+def clear_symbol_rules_cache(sender, instance, **kwargs):
+    """Reload lot and tick size rules after a rule or exchange changes."""
+    symbol_rules_cache.clear()
@@ -1,10 +1,55 @@
-from django.test import TestCase
+from django.test import TestCase, SimpleTestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
+from unittest import skipUnless
 from unittest.mock import patch
+from types import SimpleNamespace
+import asyncio
+import gzip
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from io import StringIO
+from decimal import Decimal, InvalidOperation
+from datetime import timedelta
+from django.utils import timezone
+from django.core.management import call_command
+from asgiref.sync import sync_to_async
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
 
-from .models import BanditMessages, Strategy, SignalTrigger
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+
+from .models import (
+    BanditMessages, Strategy, SignalTrigger, Signal, SignalOutbox, SupportedExchange, UserApi, StrategySubscription,
+    DiscordSignal, TakeProfitTrade, HRJDiscordSignal, FJDiscordSignal, GeminiUsage, ExchangeSymbolRule,
+    AccountBalance, UserTrade, OpenPosition, CacheVersion, CacheStats, PrefilterStats, GeminiParseCache,
+)
+from .serializers import TradingViewSignalSerializer
+from api import services
+from api.includes import gemini
+from api.includes import signal_schemas
+from api.includes.signal_parser import parse_signal
+from api.includes.signal_sources import SIGNAL_SOURCES, SignalSource
+from google.generativeai.types import generation_types
+from api.includes.prefilter import Prefilter, prefilter, rule_score
+from api.includes.prompt_registry import PromptRegistry
+from api.includes.exchanges import (
+    EXCHANGE_ADAPTERS, ExchangeAdapter, ExchangeAPIError, get_exchange_adapter, register_exchange_adapter,
+)
+from api.management.commands import process_bandit_messages, train_prefilter
+from api.management.commands.rebuild_open_positions import replay_positions
+from api.includes.gemini_client import AsyncGeminiClient, CircuitBreaker, RetryBudget, GeminiClientError, CircuitOpenError
+from api.includes.sizing import SymbolRules, normalize_decimal, round_price, size_positions
+from api.includes import partitions
+from api.caches import TTLCache, strategy_cache, roster_cache, roster_version, gemini_cache, symbol_rules_cache
 
 # Create your tests here.
 
@@ -15,6 +60,7 @@ class BanditMessagesViewTest(APITestCase):
 
     def setUp(self):
         """Set up the necessary objects for the tests."""
+        gemini_cache.clear()
         # We need a SignalTrigger and a Strategy for the save function to find.
         hrj_trigger = SignalTrigger.objects.create(name='hrj', description='HRJ Signals')
         Strategy.objects.create(name='HRJ Strategy', signal_trigger=hrj_trigger)
@@ -34,14 +80,11 @@ class BanditMessagesViewTest(APITestCase):
         self.assertEqual(BanditMessages.objects.count(), 1)
         self.assertEqual(BanditMessages.objects.get().message, "Hello world")
 
-    @patch('api.views.save_signal_from_gemini_response')
-    @patch('api.views.generate_prompt')
-    @patch('api.views.call_gemini_api')
-    def test_create_message_signal_channel_gemini_returns_false(self, mock_generate_prompt, mock_call_gemini, mock_save_signal):
+    @patch('api.includes.gemini.parse_signal_message')
+    def test_create_message_signal_channel_is_queued(self, mock_parse):
         """
-        Test message creation when Gemini determines it's not a valid signal.
+        Messages from monitored channels are stored as Pending without parsing in the request.
         """
-        mock_call_gemini.return_value = "false"
         url = reverse('bandit-messages')
         data = {
             "channel_id": "54321",
@@ -50,9 +93,72 @@ class BanditMessagesViewTest(APITestCase):
         }
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(BanditMessages.objects.count(), 1)
-        mock_call_gemini.assert_called_once_with(mock_generate_prompt.assert_called_once_with("HRJ", "This is not a signal"))
+        self.assertEqual(response.data['status'], 'Pending')
+        self.assertEqual(BanditMessages.objects.get().status, 'Pending')
+        mock_parse.assert_not_called()
+
+    @patch('api.includes.gemini.save_signal_from_gemini_response')
+    @patch('api.includes.gemini.generate_prompt')
+    @patch('api.includes.gemini.call_gemini_api')
+    def test_worker_gemini_returns_false(self, mock_call_gemini, mock_generate_prompt, mock_save_signal):
+        """
+        Test message processing when Gemini determines it's not a valid signal.
+        """
+        mock_call_gemini.return_value = "false"
+        BanditMessages.objects.create(channel_id="54321", channel_name="HRJ", message="This is not a signal")
+
+        messages = gemini.claim_pending_messages(10)
+        self.assertEqual([message.status for message in messages], ['Processing'])
+        self.assertEqual(gemini.process_bandit_message(messages[0]), 'NoSignal')
+
+        mock_generate_prompt.assert_called_once_with("HRJ", "This is not a signal")
+        mock_call_gemini.assert_called_once_with(mock_generate_prompt.return_value, "HRJ")
         mock_save_signal.assert_not_called() # Ensure we don't try to save the 'false' response
+        message = BanditMessages.objects.get()
+        self.assertEqual((message.status, message.attempts), ('NoSignal', 1))
+        self.assertIsNotNone(message.parse_latency_ms)
+        self.assertEqual(gemini.claim_pending_messages(10), [])
+
+    @patch('api.includes.gemini.call_gemini_api', return_value=None)
+    def test_worker_retries_then_fails(self, mock_call_gemini):
+        BanditMessages.objects.create(channel_id="54321", channel_name="HRJ", message="gm")
+        self.assertEqual(gemini.process_bandit_message(gemini.claim_pending_messages(10)[0], max_attempts=2), 'Pending')
+        self.assertEqual(gemini.process_bandit_message(gemini.claim_pending_messages(10)[0], max_attempts=2), 'Failed')
+        message = BanditMessages.objects.get()
+        self.assertEqual((message.status, message.attempts), ('Failed', 2))
+        self.assertEqual(message.last_error, "Signal parsing failed.")
+
+    def test_non_monitored_channel_is_skipped(self):
+        response = self.client.post(reverse('bandit-messages'), {"channel_id": "1", "channel_name": "general", "message": "hi"}, format='json')
+        self.assertEqual(response.data['status'], 'Skipped')
+        self.assertEqual(gemini.claim_pending_messages(10), [])
+
+    @patch('api.includes.gemini.call_gemini_api')
+    def test_message_is_routed_to_discord_signal(self, mock_call_gemini):
+        """
+        A monitored channel's message goes from the Bandit endpoint through the worker into
+        DiscordSignal, for an existing source and for one added only to SIGNAL_SOURCES.
+        """
+        strategy_cache.clear()
+        messages = {
+            'FJ': "SOL/USDT (long) 12h chart\nEntry: 127,70 - (limit long)\nTP1: 134,66\nTP2: 143,16\nSL: 114,04",
+            'NEWCHAN': "ARB/USDT (SHORT)\nEntry: 0,4 (market)\nTP1: 0,35\nSL: 0,45",
+        }
+        with patch.dict('api.includes.signal_sources.SIGNAL_SOURCES', {'NEWCHAN': SignalSource('NEWCHAN', comma_decimal=True, unslashed_asset=True)}):
+            for channel_name, message in messages.items():
+                Strategy.objects.create(name=channel_name)
+                response = self.client.post(reverse('bandit-messages'), {"channel_id": "54321", "channel_name": channel_name, "message": message}, format='json')
+                self.assertEqual(response.data['status'], 'Pending')
+            self.assertEqual([gemini.process_bandit_message(message) for message in gemini.claim_pending_messages(10)], ['Signal', 'Signal'])
+            self.assertEqual(signal_schemas.get_response_schema('newchan').__name__, 'NEWCHANSignalResponse')
+
+        mock_call_gemini.assert_not_called()
+        signals = {signal.source: signal for signal in DiscordSignal.objects.all()}
+        self.assertEqual((signals['FJ'].asset, signals['FJ'].entry_price), ('SOL/USDT', Decimal('127.7')))
+        self.assertEqual((signals['NEWCHAN'].asset, signals['NEWCHAN'].trade_type), ('ARBUSDT', 'short'))
+        self.assertEqual(list(signals['NEWCHAN'].takeprofittrade_set.values_list('tp_price', flat=True)), [Decimal('0.35')])
+        self.assertEqual(list(FJDiscordSignal.objects.values_list('id', flat=True)), [signals['FJ'].id])
+        self.assertEqual(signals['FJ'].takeprofittrade_set.count(), 2)
 
     def test_create_message_invalid_data(self):
         """
@@ -64,3 +170,1519 @@ class BanditMessagesViewTest(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(BanditMessages.objects.count(), 0)
+
+
+class FakeSQSClient:
+    """
+    Local stand-in for the boto3 SQS client that records every API call.
+    Entry ids listed in fail_once fail (retryably) the first time they are sent; the
+    exceptions in errors are raised by the first calls, one per call.
+    """
+
+    def __init__(self, fail_once=(), errors=()):
+        self.fail_once = set(fail_once)
+        self.errors = list(errors)
+        self.batch_calls = []
+        self.messages = []
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self.batch_calls.append((QueueUrl, [entry['Id'] for entry in Entries]))
+        if self.errors:
+            raise self.errors.pop(0)
+        self.messages.extend(json.loads(entry['MessageBody']) for entry in Entries)
+        successful, failed = [], []
+        for entry in Entries:
+            if entry['Id'] in self.fail_once:
+                self.fail_once.discard(entry['Id'])
+                failed.append({'Id': entry['Id'], 'SenderFault': False, 'Code': 'InternalError'})
+            else:
+                successful.append({'Id': entry['Id'], 'MessageId': f"msg-{entry['Id']}"})
+        return {'Successful': successful, 'Failed': failed}
+
+
+class SQSFanOutTest(SimpleTestCase):
+    """
+    Test suite for the batched SQS fan-out used by createTrade.
+    """
+
+    def setUp(self):
+        self.signal_message = {
+            'strategy_id': 1, 'symbol': 'BTCUSDT', 'side': 'BUY', 'price': '100000', 'tradeSide': 'OPEN',
+            'orderType': 'MARKET', 'tpPrice': None, 'tpStopType': None, 'tpOrderType': None, 'tpOrderPrice': None,
+            'slPrice': None, 'slStopType': None, 'slOrderType': None, 'slOrderPrice': None,
+        }
+        # Sizing and UserTrade rows are covered by PositionSizingTest and UserTradeRecordTest
+        for target in ('api.services.sizeOpenTrades', 'api.services.recordUserTrades'):
+            patcher = patch(target, return_value=None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def make_user_data(self, count):
+        return [{'api_key': f'key{i}', 'api_secret': f'secret{i}', 'user_id': i, 'name': 'Bitunix'} for i in range(count)]
+
+    @patch('api.services.time.sleep')
+    def test_fan_out_uses_batches_of_ten(self, mock_sleep):
+        fake_client = FakeSQSClient()
+        with patch('api.services.getSQSClient', return_value=fake_client):
+            services.createTrade(self.signal_message, self.make_user_data(25), 1, ['Bitunix'])
+
+        self.assertEqual(len(fake_client.batch_calls), 3)
+        self.assertEqual(sorted(len(ids) for _, ids in fake_client.batch_calls), [5, 10, 10])
+        self.assertTrue(fake_client.batch_calls[0][0].endswith('/Bitunix_Queue'))
+        mock_sleep.assert_not_called()
+
+    @patch('api.services.time.sleep')
+    def test_only_failed_entries_are_retried(self, mock_sleep):
+        fake_client = FakeSQSClient(fail_once={'3', '7'})
+        with patch('api.services.getSQSClient', return_value=fake_client):
+            message_ids = services.sendToQueue(self.make_user_data(10), 'Bitunix')
+
+        self.assertEqual(len(fake_client.batch_calls), 2)
+        self.assertEqual(fake_client.batch_calls[1][1], ['3', '7'])
+        self.assertEqual(message_ids, [f'msg-{i}' for i in range(10)])
+
+    @patch('api.services.time.sleep')
+    def test_create_trade_returns_per_user_results(self, mock_sleep):
+        fake_client = FakeSQSClient()
+        with patch('api.services.getSQSClient', return_value=fake_client):
+            results = services.createTrade(self.signal_message, self.make_user_data(12), 1, ['Bitunix'])
+
+        self.assertEqual(set(results), {(i, None) for i in range(12)})
+        self.assertTrue(all(result['status'] == 'queued' for result in results.values()))
+        self.assertEqual(results[(11, None)], {'exchange': 'Bitunix', 'status': 'queued', 'message_id': 'msg-1'})
+
+    def test_rejected_entries_are_reported_as_failed(self):
+        fake_client = FakeSQSClient()
+        fake_client.send_message_batch = lambda QueueUrl, Entries: {
+            'Successful': [{'Id': entry['Id'], 'MessageId': 'ok'} for entry in Entries if entry['Id'] != '0'],
+            'Failed': [{'Id': '0', 'SenderFault': True, 'Code': 'InvalidMessageContents'}],
+        }
+        with patch('api.services.getSQSClient', return_value=fake_client):
+            results = services.dispatchTrades({'Bitunix': self.make_user_data(3)})
+
+        self.assertEqual(results[(0, None)]['status'], 'failed')
+        self.assertIsNone(results[(0, None)]['message_id'])
+        self.assertEqual(results[(2, None)]['status'], 'queued')
+
+    @patch('api.services.boto3.client')
+    def test_sqs_client_is_reused(self, mock_boto_client):
+        with patch('api.services._sqs_client', None):
+            first = services.getSQSClient()
+            second = services.getSQSClient()
+        self.assertIs(first, second)
+        mock_boto_client.assert_called_once()
+        self.assertEqual(mock_boto_client.call_args.kwargs['config'].retries, {'total_max_attempts': 1})
+
+    @patch('api.services.time.sleep')
+    def test_throttled_batch_is_resent(self, mock_sleep):
+        throttled = ClientError({'Error': {'Code': 'RequestThrottled', 'Message': 'Slow down'}}, 'SendMessageBatch')
+        fake_client = FakeSQSClient(errors=[throttled, EndpointConnectionError(endpoint_url='https://sqs')])
+        with patch('api.services.getSQSClient', return_value=fake_client):
+            message_ids = services.sendToQueue(self.make_user_data(2), 'Bitunix')
+
+        self.assertEqual(len(fake_client.batch_calls), 3)
+        self.assertEqual(message_ids, ['msg-0', 'msg-1'])
+
+    @patch('api.services.time.sleep')
+    def test_batch_is_not_resent_after_a_read_timeout(self, mock_sleep):
+        # SQS may have queued the batch before the response was lost
+        fake_client = FakeSQSClient(errors=[ReadTimeoutError(endpoint_url='https://sqs')])
+        with patch('api.services.getSQSClient', return_value=fake_client):
+            results = services.dispatchTrades({'Bitunix': self.make_user_data(2)})
+
+        self.assertEqual(len(fake_client.batch_calls), 1)
+        self.assertEqual({result['status'] for result in results.values()}, {'failed'})
+
+
+@override_settings(TRADINGVIEW_ASYNC_ACK=True)
+class SignalOutboxTest(APITestCase):
+    """
+    Test suite for the asynchronous TradingView acknowledgement and outbox worker.
+    """
+
+    payload = {
+        "strategy": "BTC Strategy", "auth": "secret", "symbol": "BTCUSDT", "side": "BUY",
+        "price": "100000", "time": "2026-01-01T00:00:00Z", "tradeSide": "OPEN",
+    }
+
+    def post_signal(self, data):
+        return self.client.post(reverse('process-tradingview-signal'), data, format='json', REMOTE_ADDR='52.89.214.238')
+
+    @patch('api.views.processTradingViewSignal')
+    def test_webhook_queues_signal_and_returns_202(self, mock_process):
+        response = self.post_signal(self.payload)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(SignalOutbox.objects.get().payload, self.payload)
+        mock_process.assert_not_called()
+
+    def test_webhook_rejects_incomplete_payload(self):
+        response = self.post_signal({"strategy": "BTC Strategy"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(SignalOutbox.objects.count(), 0)
+
+    def test_webhook_rejects_invalid_optional_price(self):
+        response = self.post_signal(dict(self.payload, slPrice='MARKET'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('slPrice', response.data['message'])
+        self.assertEqual(SignalOutbox.objects.count(), 0)
+
+    @override_settings(TRADINGVIEW_ASYNC_ACK=False)
+    def test_sync_webhook_rejects_invalid_price(self):
+        strategy_cache.clear()
+        Strategy.objects.create(name='BTC Strategy', password='secret')
+        response = self.post_signal(dict(self.payload, tpPrice='NaN'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tpPrice', response.data['message'])
+        self.assertFalse(Signal.objects.exists())
+
+    @patch('api.services.dispatchSignal', return_value={1: {'status': 'queued'}})
+    @patch('api.services.ingestTradingViewSignal')
+    def test_failed_entry_is_retried_then_processed(self, mock_ingest, mock_dispatch):
+        entry = SignalOutbox.objects.create(payload=self.payload)
+        mock_ingest.side_effect = [RuntimeError("database unavailable"), ({}, 1, None)]
+
+        services.processOutboxEntry(retry_delay=0)
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('Pending', 1))
+        self.assertEqual(entry.last_error, "database unavailable")
+        self.assertGreater(services.getOutboxLag(), 0)
+        mock_dispatch.assert_not_called()
+
+        services.processOutboxEntry(retry_delay=0)
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('Processed', 2))
+        self.assertEqual(entry.result, "Dispatched to 1 subscriber(s).")
+        self.assertIsNotNone(entry.processed_at)
+        self.assertIsNone(services.processOutboxEntry())
+        self.assertEqual(services.getOutboxLag(), 0.0)
+
+    @patch('api.services.ingestTradingViewSignal', side_effect=services.DuplicateSignalError("Duplicate signal found. Ignoring."))
+    def test_duplicate_signal_is_not_retried(self, mock_ingest):
+        SignalOutbox.objects.create(payload=self.payload)
+        entry = services.processOutboxEntry()
+        self.assertEqual(entry.status, 'Processed')
+        self.assertEqual(entry.result, "Duplicate signal found. Ignoring.")
+
+    @patch('api.services.sizeOpenTrades')
+    def test_interrupted_dispatch_is_resumed_without_resending_recorded_orders(self, mock_size):
+        roster_cache.clear()
+        strategy_cache.clear()
+        strategy = Strategy.objects.create(name='BTC Strategy', password='secret')
+        exchange = SupportedExchange.objects.create(name='Bitunix')
+        accounts = []
+        for i in range(2):
+            user = get_user_model().objects.create(username=f'trader{i}')
+            accounts.append(UserApi.objects.create(auth_user=user, exchange=exchange, api_key=f'key{i}', api_secret='s'))
+            StrategySubscription.objects.create(auth_user=user, strategy=strategy, user_api=accounts[-1], portfolio_percentage=10)
+        SignalOutbox.objects.create(payload=self.payload)
+
+        with patch('api.services.dispatchTrades', side_effect=RuntimeError("worker killed")):
+            entry = services.processOutboxEntry(retry_delay=0)
+        self.assertEqual((entry.status, entry.attempts, entry.last_error), ('Dispatched', 1, "worker killed"))
+        self.assertIsNotNone(entry.dispatched_at)
+        # Not claimed as pending again, and not resumed before the dispatch timeout
+        self.assertIsNone(services.processOutboxEntry(retry_delay=0))
+        self.assertIsNone(services.resumeDispatchedEntry())
+        out = StringIO()
+        call_command('drain_signal_outbox', '--stats', '--dispatch-timeout', '0', stdout=out)
+        self.assertIn("dispatched=1 overdue=1", out.getvalue())
+
+        # The first subscriber's order made it to the queue before the worker died
+        signal = Signal.objects.get(strategy=strategy)
+        UserTrade.objects.create(auth_user=accounts[0].auth_user, user_api=accounts[0], signal=signal, status='Queued', message_id='msg-early')
+        fake_client = FakeSQSClient()
+        with patch('api.services.getSQSClient', return_value=fake_client):
+            entry = services.resumeDispatchedEntry(timeout=0)
+
+        self.assertEqual((entry.status, entry.attempts, entry.result), ('Processed', 2, "Dispatched to 1 subscriber(s)."))
+        self.assertEqual([message['user_id'] for message in fake_client.messages], [accounts[1].auth_user_id])
+        self.assertEqual(UserTrade.objects.filter(signal=signal, message_id__isnull=False).count(), 2)
+        self.assertIsNone(services.resumeDispatchedEntry(timeout=0))
+
+    @patch('api.services.dispatchSignal', side_effect=RuntimeError("exchange queue unavailable"))
+    @patch('api.services.ingestTradingViewSignal', return_value=({}, 1, None))
+    def test_dispatch_is_given_up_after_max_attempts(self, mock_ingest, mock_dispatch):
+        SignalOutbox.objects.create(payload=self.payload)
+        services.processOutboxEntry(max_attempts=2)
+        self.assertEqual(services.resumeDispatchedEntry(max_attempts=2, timeout=0).status, 'Dispatched')
+        entry = services.resumeDispatchedEntry(max_attempts=2, timeout=0)
+        self.assertEqual((entry.status, entry.attempts), ('Failed', 3))
+        self.assertEqual(mock_dispatch.call_count, 2)
+        self.assertIsNotNone(entry.processed_at)
+
+
+class StrategyCacheTest(TestCase):
+    """
+    Test suite for the per-process strategy cache used by getStrategyID.
+    """
+
+    def setUp(self):
+        strategy_cache.clear()
+        self.strategy = Strategy.objects.create(name='BTC Strategy', password='secret')
+
+    def test_repeat_lookups_are_served_from_cache(self):
+        self.assertEqual(services.getStrategyID('BTC Strategy', 'secret'), self.strategy.strategy_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(services.getStrategyID('BTC Strategy', 'secret'), self.strategy.strategy_id)
+            self.assertIsNone(services.getStrategyID('BTC Strategy', 'wrong'))
+        self.assertGreaterEqual(strategy_cache.stats()['hits'], 2)
+
+    def test_cache_stats_are_summed_across_workers(self):
+        strategy_cache.flush_stats()
+        CacheStats.objects.all().delete()
+        services.getStrategyID('BTC Strategy', 'secret')
+        services.getStrategyID('BTC Strategy', 'secret')
+        services.getStrategyID('BTC Strategy', 'secret')
+        # Another worker's copy of the cache, flushing its own counts
+        other_worker = TTLCache(ttl=60, name='strategy')
+        other_worker.get('ETH Strategy')
+        other_worker.flush_stats()
+
+        out = StringIO()
+        call_command('cache_stats', stdout=out)
+        self.assertIn("strategy hits=2 misses=2 hit_ratio=0.500", out.getvalue())
+        self.assertIn("roster hits=", out.getvalue())
+
+    def test_saving_strategy_invalidates_cache(self):
+        services.getStrategyID('BTC Strategy', 'secret')
+        self.strategy.password = 'rotated'
+        self.strategy.save()
+        self.assertIsNone(services.getStrategyID('BTC Strategy', 'secret'))
+        self.assertEqual(services.getStrategyID('BTC Strategy', 'rotated'), self.strategy.strategy_id)
+
+    def test_deleted_strategy_is_not_served(self):
+        services.getStrategyID('BTC Strategy', 'secret')
+        self.strategy.delete()
+        self.assertIsNone(services.getStrategyID('BTC Strategy', 'secret'))
+
+
+class StrategyRosterCacheTest(TestCase):
+    """
+    Test suite for the cached subscriber roster behind getUserData and getExchangeList.
+    """
+
+    def setUp(self):
+        roster_cache.clear()
+        roster_version.reset()
+        self.strategy = Strategy.objects.create(name='BTC Strategy', password='secret')
+        exchange = SupportedExchange.objects.create(name='Bitunix')
+        self.users = [get_user_model().objects.create(username=f'trader{i}') for i in range(3)]
+        self.subscriptions = []
+        for user in self.users:
+            user_api = UserApi.objects.create(auth_user=user, exchange=exchange, api_key=f'key-{user.id}', api_secret='s')
+            self.subscriptions.append(StrategySubscription.objects.create(
+                auth_user=user, strategy=self.strategy, user_api=user_api, portfolio_percentage=10, leverage_amount=5
+            ))
+        # A subscription without API credentials cannot be routed and is left out of the roster
+        StrategySubscription.objects.create(auth_user=get_user_model().objects.create(username='nokeys'), strategy=self.strategy)
+
+    def test_roster_is_built_once(self):
+        # One read of the shared roster version, one roster query
+        with self.assertNumQueries(2):
+            user_data = services.getUserData(self.strategy.strategy_id, None)
+            exchanges = services.getExchangeList(self.strategy.strategy_id)
+
+        self.assertEqual(exchanges, ['Bitunix'])
+        self.assertEqual([item['user_id'] for item in user_data], [user.id for user in self.users])
+        self.assertEqual(user_data[0]['api_key'], f'key-{self.users[0].id}')
+        self.assertEqual(user_data[0]['leverage_amount'], 5)
+
+    def test_user_data_dicts_are_not_shared(self):
+        services.getUserData(self.strategy.strategy_id, None)[0]['orderList'] = []
+        self.assertNotIn('orderList', services.getUserData(self.strategy.strategy_id, None)[0])
+
+    def test_subscription_change_invalidates_roster(self):
+        services.getUserData(self.strategy.strategy_id, None)
+        self.subscriptions[0].status = 'Disabled'
+        self.subscriptions[0].save()
+        self.assertEqual(len(services.getUserData(self.strategy.strategy_id, None)), 2)
+
+    def test_change_in_another_worker_is_seen_after_version_check(self):
+        services.getUserData(self.strategy.strategy_id, None)
+        # Another worker disables a subscription: its save bumps the shared version, not our cache
+        StrategySubscription.objects.filter(id=self.subscriptions[0].id).update(status='Disabled')
+        CacheVersion.objects.filter(name='roster').update(version=F('version') + 1)
+        self.assertEqual(len(services.getUserData(self.strategy.strategy_id, None)), 3)
+        with patch.object(roster_version, 'interval', 0):
+            self.assertEqual(len(services.getUserData(self.strategy.strategy_id, None)), 2)
+
+    def test_edited_subscription_is_dispatched_with_new_settings(self):
+        signal_message = {
+            'strategy_id': self.strategy.strategy_id, 'symbol': 'BTCUSDT', 'side': 'BUY', 'price': '100000', 'tradeSide': 'OPEN',
+            'orderType': 'MARKET', 'tpPrice': None, 'slPrice': None,
+        }
+        signal = Signal.objects.create(strategy=self.strategy, symbol='BTCUSDT', side='BUY', tradeSide='OPEN', price='100000')
+
+        def dispatch():
+            fake_client = FakeSQSClient()
+            # Not sized, so the orders carry the roster settings unchanged
+            with patch('api.services.getSQSClient', return_value=fake_client), patch('api.services.sizeOpenTrades'):
+                services.dispatchSignal(signal_message, signal.id, None)
+            return fake_client.messages
+
+        self.assertEqual(len(dispatch()), 3)
+        self.subscriptions[0].leverage_amount = 10
+        self.subscriptions[0].save()
+        self.assertEqual(dispatch()[0]['leverage_amount'], 10)
+
+        # update() sends no signals, so it has to bump the roster version itself
+        StrategySubscription.objects.filter(id=self.subscriptions[1].id).update(status='Disabled')
+        roster_version.bump()
+        self.assertEqual(len(dispatch()), 2)
+
+
+class SignalDedupConstraintTest(TestCase):
+    """
+    Test suite for the database-enforced signal dedup.
+    """
+
+    def setUp(self):
+        strategy = Strategy.objects.create(name='BTC Strategy', password='secret')
+        self.signal_message = services.createSignalMessage({
+            'symbol': 'BTCUSDT', 'side': 'BUY', 'price': '100000', 'time': '2026-01-01T00:00:00Z', 'tradeSide': 'OPEN',
+        }, strategy.strategy_id)
+
+    def test_second_insert_is_reported_as_duplicate(self):
+        with self.assertNumQueries(1):
+            signal_id = services.ingestSignal(self.signal_message)
+        self.assertEqual(Signal.objects.get().id, signal_id)
+        with self.assertNumQueries(1):
+            self.assertEqual(services.ingestSignal(self.signal_message), services.DUPLICATE_SIGNAL)
+        self.assertEqual(Signal.objects.count(), 1)
+
+    def test_different_price_is_not_a_duplicate(self):
+        services.ingestSignal(self.signal_message)
+        services.ingestSignal(dict(self.signal_message, price='100001'))
+        self.assertEqual(Signal.objects.count(), 2)
+
+    def test_equal_prices_written_differently_are_duplicates(self):
+        strategy_id = self.signal_message['strategy_id']
+        signal_id = services.ingestSignal(self.signal_message)
+        retyped = services.createSignalMessage({
+            'symbol': 'BTCUSDT', 'side': 'BUY', 'price': '100000.00', 'time': '2026-01-01T00:00:00Z', 'tradeSide': 'OPEN',
+        }, strategy_id)
+        self.assertEqual(retyped['price'], '100000')
+        self.assertEqual(services.ingestSignal(retyped), services.DUPLICATE_SIGNAL)
+        self.assertEqual(Signal.objects.get(id=signal_id).price, Decimal('100000'))
+
+    def test_invalid_price_is_rejected(self):
+        self.assertEqual(normalize_decimal(' 65000.10 '), '65000.1')
+        self.assertEqual(normalize_decimal('1e-7'), '0.0000001')
+        self.assertIsNone(normalize_decimal(''))
+        for price in ('MARKET', 'NaN', '1e18'):
+            with self.assertRaises(ValueError):
+                normalize_decimal(price)
+        serializer = TradingViewSignalSerializer(data={
+            'strategy': 'BTC Strategy', 'auth': 'secret', 'symbol': 'BTCUSDT', 'side': 'BUY',
+            'price': 'MARKET', 'time': '2026-01-01T00:00:00Z', 'tradeSide': 'OPEN',
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('price', serializer.errors)
+
+        payload = dict(serializer.initial_data, price='65000', tpPrice='66000.0', tpOrderPrice=None, slPrice='')
+        self.assertTrue(TradingViewSignalSerializer(data=payload).is_valid())
+        for field in ('tpPrice', 'tpOrderPrice', 'slPrice'):
+            serializer = TradingViewSignalSerializer(data=dict(payload, **{field: '1e18'}))
+            self.assertFalse(serializer.is_valid())
+            self.assertEqual(list(serializer.errors), [field])
+
+    def test_swap_migration_reverse_writes_canonical_strings(self):
+        # 0014 refills the varchar columns on reverse with the strings normalize_decimal would write
+        migration = importlib.import_module('api.migrations.0014_decimal_prices_swap')
+        for value in ('100.500000000000', '0E-12', '-0.000000000001', '1e17'):
+            self.assertEqual(migration.to_string(Decimal(value)), normalize_decimal(value))
+        self.assertIsNone(migration.to_string(None))
+
+    def test_backfill_migration_aborts_on_values_that_are_not_numbers(self):
+        migration = importlib.import_module('api.migrations.0013_decimal_prices')
+        self.assertEqual(migration.to_decimal(' 100.5 '), Decimal('100.500000000000'))
+        self.assertIsNone(migration.to_decimal('  '))
+        for value in ('MARKET', 'NaN', '1e18'):
+            with self.assertRaises(InvalidOperation):
+                migration.to_decimal(value)
+
+        # 0014 drops the varchar columns, so the migration stops instead of writing NULL
+        failures = [[('signal', 7, 'price', 'MARKET')], [('user_trades', 9, 'trade_qty', '1,5')]]
+        apps = SimpleNamespace(get_model=lambda app_label, model_name: None)
+        schema_editor = SimpleNamespace(connection=SimpleNamespace(alias='default'))
+        with patch.object(migration, 'backfill', side_effect=failures):
+            with self.assertRaisesMessage(ValueError, "2 stored prices or quantities are not numbers"):
+                migration.backfill_decimals(apps, schema_editor)
+        with patch.object(migration, 'backfill', return_value=[]):
+            migration.backfill_decimals(apps, schema_editor)
+
+    def test_merged_signals_get_sentinel_timestamps_in_id_order(self):
+        # 0015 replaces the insert time of signals copied from the per-source tables
+        migration = importlib.import_module('api.migrations.0015_discordsignal')
+        signals = [
+            DiscordSignal.objects.create(
+                source=source, asset='BTCUSDT', trade_type='long', entry_price=1, entry_order_type='market', stop_loss=1
+            ) for source in ('HRJ', 'HRJ', 'FJ')
+        ]
+        with patch.object(migration, 'BATCH_SIZE', 2):
+            migration.stamp_legacy_signals(DiscordSignal)
+        stamped = list(DiscordSignal.objects.order_by('created_at').values_list('id', 'created_at'))
+        self.assertEqual(stamped, [
+            (signal.id, migration.LEGACY_CREATED_AT + timedelta(seconds=signal.id)) for signal in signals
+        ])
+
+    @patch('api.services.connection.vendor', 'other')
+    def test_fallback_insert_reports_duplicate(self):
+        self.assertNotEqual(services.ingestSignal(self.signal_message), services.DUPLICATE_SIGNAL)
+        self.assertEqual(services.ingestSignal(self.signal_message), services.DUPLICATE_SIGNAL)
+        self.assertIsNotNone(Signal.objects.get().created_at)
+
+
+class SaveGeminiSignalTest(TestCase):
+    """
+    Test suite for persisting parsed Discord signals.
+    """
+
+    fj_signal = {
+        "FJDiscordSignals": {"asset": "SOL/USDT", "trade_type": "long", "entry_price": 127.70, "entry_order_type": "limit", "stop_loss": 114.04},
+        "FJTakeProfitTrades": [{"series_num": n, "tp_price": 130 + n} for n in range(1, 8)],
+    }
+    hrj_signal = {
+        "HRJDiscordSignals": {"asset": "LINK/USDT", "trade_type": "long", "leverage": 5, "balance": 3.00, "entry_price": 12.32, "entry_order_type": "limit", "stop_loss": 9.89},
+        "HRJTakeProfitTrades": [{"series_num": 1, "tp_price": 14.92}, {"series_num": 2, "tp_price": 18.73}],
+    }
+
+    def setUp(self):
+        strategy_cache.clear()
+        Strategy.objects.create(name='FJ')
+        Strategy.objects.create(name='HRJ')
+
+    def count_inserts(self, queries):
+        return sum(1 for query in queries if query['sql'].startswith('INSERT'))
+
+    def test_take_profit_ladder_is_bulk_inserted(self):
+        with CaptureQueriesContext(connection) as queries:
+            signal = gemini.save_signal_from_gemini_response(self.fj_signal, 'fj')
+        self.assertEqual(self.count_inserts(queries), 2)
+        self.assertEqual(signal.source, 'FJ')
+        self.assertEqual(TakeProfitTrade.objects.filter(signal=signal).count(), 7)
+
+    def test_batch_save_reports_rows_per_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            row_counts = gemini.save_signals_from_gemini_responses([
+                (self.hrj_signal, 'HRJ'), (self.fj_signal, 'FJ'), (self.hrj_signal, 'hrj'), ({"bogus": {}}, 'FJ'),
+            ])
+        self.assertEqual(row_counts, {'discord_signal': 3, 'take_profit_trade': 11})
+        # One insert per table, whatever the mix of sources
+        self.assertEqual(self.count_inserts(queries), 2)
+        self.assertEqual(HRJDiscordSignal.objects.count(), 2)
+        self.assertEqual(FJDiscordSignal.objects.get().takeprofittrade_set.count(), 7)
+
+    def test_new_source_needs_no_new_table(self):
+        Strategy.objects.create(name='NEWCHAN')
+        signal = gemini.save_signal_from_gemini_response({
+            "NEWCHANDiscordSignals": {"asset": "BTC/USDT", "trade_type": "short", "entry_price": 100000, "entry_order_type": "market", "stop_loss": 105000},
+            "NEWCHANTakeProfitTrades": [{"series_num": 1, "tp_price": 95000}],
+        }, 'newchan')
+        self.assertEqual(signal.source, 'NEWCHAN')
+        self.assertIsNone(gemini.save_signal_from_gemini_response(self.fj_signal, 'unknown'))
+
+        gemini.save_signal_from_gemini_response(self.hrj_signal, 'HRJ')
+        latest = DiscordSignal.objects.order_by('-created_at', '-id').values_list('source', 'asset')
+        self.assertEqual(list(latest), [('HRJ', 'LINK/USDT'), ('NEWCHAN', 'BTC/USDT')])
+        # The per-source proxies behind the admin pages only see their own rows
+        self.assertEqual(list(HRJDiscordSignal.objects.values_list('asset', 'leverage')), [('LINK/USDT', 5)])
+        self.assertFalse(FJDiscordSignal.objects.exists())
+        self.assertEqual(FJDiscordSignal.objects.create(asset='SOL/USDT', trade_type='long', entry_price=1, entry_order_type='limit', stop_loss=1).source, 'FJ')
+
+
+class LocalSignalParserTest(SimpleTestCase):
+    """
+    Test suite for the regex fast path that runs before Gemini.
+    """
+
+    def test_fj_signal_with_comma_decimals(self):
+        message = """**TRX/USDT (long)** 1d chart
+
+        Entry: 0,27434 - (limit long)
+
+        TP1: 0,2865
+        TP2: 0,3029
+
+        SL: 0,2548
+
+        R:R: 6,40
+        <@&1354945711879491767>"""
+        signal_data, confidence = parse_signal('FJ', message)
+        self.assertEqual(confidence, 1.0)
+        self.assertEqual(signal_data, {
+            "FJDiscordSignals": {"asset": "TRX/USDT", "trade_type": "long", "entry_price": 0.27434, "entry_order_type": "limit", "stop_loss": 0.2548},
+            "FJTakeProfitTrades": [{"series_num": 1, "tp_price": 0.2865}, {"series_num": 2, "tp_price": 0.3029}],
+        })
+
+    def test_hrj_signal_includes_leverage_and_balance(self):
+        message = "SOL/USDT (LONG)\nLeverage: 5X \nBalance: 3% of capital\nEntry: 126.00 - (limit order)\nTP1: 146.77\nTP2: 172.55\nSL: 105.25\nR:R: 6"
+        signal_data, confidence = parse_signal('HRJ', message)
+        self.assertEqual(confidence, 1.0)
+        self.assertEqual(signal_data["HRJDiscordSignals"]["leverage"], 5)
+        self.assertEqual(signal_data["HRJDiscordSignals"]["balance"], 3.0)
+
+    def test_target_notice_is_not_parsed(self):
+        self.assertEqual(parse_signal('FJ', "TP 1 was reached @Brigade ⚔️"), (None, 0.0))
+
+    def test_inconsistent_ladder_has_low_confidence(self):
+        message = "ETH/USDT (SHORT)\nEntry: 3000 (limit order)\nTP1: 3100\nSL: 3200"
+        signal_data, confidence = parse_signal('SIGSCAN', message)
+        self.assertEqual(signal_data["SIGSCANDiscordSignals"]["asset"], "ETHUSDT")
+        self.assertLess(confidence, 0.9)
+
+
+@patch('api.includes.gemini.generate_prompt', return_value="prompt")
+@patch('api.includes.gemini.call_gemini_api', return_value="false")
+class GeminiResultCacheTest(TestCase):
+    """
+    Test suite for the content-hash cache in front of Gemini.
+    """
+
+    def setUp(self):
+        gemini_cache.clear()
+
+    def test_gemini_is_only_called_when_local_parse_fails(self, mock_call_gemini, mock_generate_prompt):
+        gemini.parse_signal_message('HRJ', "SOL/USDT (LONG)\nLeverage: 5X\nBalance: 3%\nEntry: 126 (market)\nTP1: 146\nSL: 105")
+        mock_call_gemini.assert_not_called()
+        gemini.parse_signal_message('HRJ', "gm everyone")
+        mock_call_gemini.assert_called_once()
+
+    def test_reposted_message_is_served_from_cache(self, mock_call_gemini, mock_generate_prompt):
+        hits = gemini_cache.stats()['hits']
+        self.assertEqual(gemini.parse_signal_message('FJ', "TP 1 was reached  @Brigade"), "false")
+        self.assertEqual(gemini.parse_signal_message('FJ', " TP 1 was reached\n@Brigade "), "false")
+        mock_call_gemini.assert_called_once()
+        self.assertEqual(gemini_cache.stats()['hits'], hits + 1)
+
+    def test_cached_results_survive_restart(self, mock_call_gemini, mock_generate_prompt):
+        signal_data = {"FJDiscordSignals": {"asset": "SOL/USDT"}, "FJTakeProfitTrades": []}
+        mock_call_gemini.return_value = signal_data
+        gemini.parse_signal_message('FJ', "SOL looks ready")
+        gemini_cache.clear()  # simulate a fresh worker
+
+        self.assertEqual(gemini.parse_signal_message('FJ', "SOL looks ready"), signal_data)
+        mock_call_gemini.assert_called_once()
+        self.assertEqual(gemini_cache.persisted_stats()['hits'], 1)
+
+    def test_channel_is_part_of_the_key(self, mock_call_gemini, mock_generate_prompt):
+        gemini.parse_signal_message('FJ', "hello")
+        gemini.parse_signal_message('HRJ', "hello")
+        self.assertEqual(mock_call_gemini.call_count, 2)
+
+    def test_memory_hits_are_counted_without_queries(self, mock_call_gemini, mock_generate_prompt):
+        gemini_cache.set('FJ', "gm", "false", 0.5)
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertEqual(gemini_cache.get('FJ', "gm"), "false")
+        self.assertEqual(GeminiParseCache.objects.get().hits, 0)
+
+        # gemini_cache_stats (and the periodic flush) write the counts back
+        out = StringIO()
+        call_command('gemini_cache_stats', stdout=out)
+        self.assertIn("hits=3", out.getvalue())
+        with patch.object(gemini_cache, 'flush_interval', 0):
+            gemini_cache.get('FJ', "gm")
+        self.assertEqual(GeminiParseCache.objects.get().hits, 4)
+
+    def test_concurrent_store_of_the_same_message_is_an_upsert(self, mock_call_gemini, mock_generate_prompt):
+        # Another worker stored the message between our lookup and our write
+        GeminiParseCache.objects.create(key=gemini_cache.make_key('FJ', "gm"), channel='FJ', result=False, hits=2)
+        signal_data = {"FJDiscordSignals": {"asset": "SOL/USDT"}, "FJTakeProfitTrades": []}
+        gemini_cache.set('FJ', "gm", signal_data, 1.25)
+        entry = GeminiParseCache.objects.get()
+        self.assertEqual((entry.result, entry.latency_ms, entry.hits), (signal_data, 1250, 2))
+
+
+NO_SIGNAL = '{"is_signal": false, "signal": null}'
+
+
+class StubTransport:
+    """Async transport replaying a script of responses / exceptions, recording peak concurrency."""
+
+    def __init__(self, *script, delay=0):
+        self.script = list(script)
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, prompt, generation_config=None, cached_content=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            outcome = self.script.pop(0) if self.script else NO_SIGNAL
+            if isinstance(outcome, Exception):
+                raise outcome
+            return SimpleNamespace(text=outcome, usage_metadata=SimpleNamespace(
+                prompt_token_count=len(prompt) // 4, candidates_token_count=len(outcome) // 4, cached_content_token_count=0,
+            ))
+        finally:
+            self.in_flight -= 1
+
+
+class AsyncGeminiClientTest(SimpleTestCase):
+    """
+    Test suite for the asyncio Gemini client, run against a stub transport.
+    """
+
+    def make_client(self, transport, **kwargs):
+        kwargs.setdefault('backoff_base', 0)
+        return AsyncGeminiClient(transport=transport, model_name='stub', max_concurrency=kwargs.pop('max_concurrency', 4),
+                                 timeout=kwargs.pop('timeout', 1), max_attempts=kwargs.pop('max_attempts', 3), **kwargs)
+
+    def test_transient_errors_are_retried(self):
+        transport = StubTransport(ConnectionError("reset"), ConnectionError("reset"), "false")
+        response = asyncio.run(self.make_client(transport).generate("prompt"))
+        self.assertEqual((response.text, transport.calls), ("false", 3))
+
+    def test_deadline_is_enforced(self):
+        transport = StubTransport(delay=1)
+        with self.assertRaises(GeminiClientError):
+            asyncio.run(self.make_client(transport, timeout=0.01, max_attempts=2).generate("prompt"))
+        self.assertEqual(transport.calls, 2)
+
+    def test_non_retryable_errors_fail_fast(self):
+        transport = StubTransport(ValueError("bad request"))
+        with self.assertRaises(GeminiClientError):
+            asyncio.run(self.make_client(transport).generate("prompt"))
+        self.assertEqual(transport.calls, 1)
+
+    def test_retry_budget_limits_retries(self):
+        transport = StubTransport(*[ConnectionError("reset")] * 10)
+        client = self.make_client(transport, max_attempts=5, retry_budget=RetryBudget(ratio=0, capacity=1))
+        with self.assertRaisesRegex(GeminiClientError, "budget"):
+            asyncio.run(client.generate("prompt"))
+        self.assertEqual(transport.calls, 2)
+
+    def test_concurrency_is_capped(self):
+        transport = StubTransport(delay=0.01)
+        client = self.make_client(transport, max_concurrency=3)
+
+        async def burst():
+            await asyncio.gather(*(client.generate("prompt") for _ in range(10)))
+
+        asyncio.run(burst())
+        self.assertEqual((transport.calls, transport.max_in_flight), (10, 3))
+
+    def test_circuit_breaker_opens_and_recovers(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+        transport = StubTransport(ConnectionError("down"), ConnectionError("down"), "false")
+        client = self.make_client(transport, max_attempts=1, circuit_breaker=breaker)
+        for _ in range(2):
+            with self.assertRaises(GeminiClientError):
+                asyncio.run(client.generate("prompt"))
+
+        with self.assertRaises(CircuitOpenError):
+            asyncio.run(client.generate("prompt"))
+        self.assertEqual(transport.calls, 2)
+
+        now[0] = 31.0  # half-open: one trial call goes through and closes the circuit
+        self.assertEqual(asyncio.run(client.generate("prompt")).text, "false")
+        self.assertFalse(breaker.is_open)
+
+    def test_half_open_trial_always_ends(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=lambda: now[0])
+        breaker.record_failure()
+        transport = StubTransport(ValueError("bad request"), "false")
+        client = self.make_client(transport, max_attempts=1, circuit_breaker=breaker)
+
+        # A non-retryable error during the trial re-opens the circuit instead of wedging it half-open
+        now[0] = 31.0
+        with self.assertRaises(GeminiClientError):
+            asyncio.run(client.generate("prompt"))
+        self.assertTrue(breaker.is_open)
+        now[0] = 62.0
+        self.assertFalse(breaker.rejecting)
+        self.assertEqual(asyncio.run(client.generate("prompt")).text, "false")
+
+        # A cancelled trial gives no verdict, so the next call is let through
+        breaker.record_failure()
+        now[0] = 93.0
+        slow = self.make_client(StubTransport(delay=1), circuit_breaker=breaker)
+
+        async def cancel_trial():
+            task = asyncio.create_task(slow.generate("prompt"))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_trial())
+        self.assertFalse(breaker.rejecting)
+        self.assertTrue(breaker.allow())
+
+
+class AsyncBanditWorkerTest(TestCase):
+    """
+    Test suite for the asyncio Bandit message worker path.
+    """
+
+    def setUp(self):
+        gemini_cache.clear()
+
+    async def test_message_is_parsed_through_the_client(self):
+        await BanditMessages.objects.acreate(channel_id="54321", channel_name="HRJ", message="gm")
+        client = AsyncGeminiClient(transport=StubTransport(NO_SIGNAL), model_name='stub')
+        message = (await sync_to_async(gemini.claim_pending_messages)(10))[0]
+
+        self.assertEqual(await gemini.process_bandit_message_async(message, client), 'NoSignal')
+        self.assertEqual((await BanditMessages.objects.aget()).status, 'NoSignal')
+
+    async def test_token_usage_is_recorded_per_request(self):
+        trigger = await SignalTrigger.objects.acreate(name='fj', description='FJ Signals')
+        strategy = await Strategy.objects.acreate(name='FJ', signal_trigger=trigger)
+        client = AsyncGeminiClient(transport=StubTransport(f"[{NO_SIGNAL}, {NO_SIGNAL}]"), model_name='stub')
+        batcher = gemini.GeminiBatcher(client, window=0.01, max_size=10)
+        await asyncio.gather(batcher.parse('FJ', "gm"), batcher.parse('FJ', "gn"))
+
+        usage = await GeminiUsage.objects.aget()
+        self.assertEqual((usage.channel, usage.strategy_id, usage.messages), ('FJ', strategy.pk, 2))
+        self.assertGreater(usage.prompt_tokens, 0)
+
+    async def test_open_circuit_defers_without_using_an_attempt(self):
+        await BanditMessages.objects.acreate(channel_id="54321", channel_name="HRJ", message="gm")
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure()
+        client = AsyncGeminiClient(transport=StubTransport(), model_name='stub', circuit_breaker=breaker)
+        message = (await sync_to_async(gemini.claim_pending_messages)(10))[0]
+
+        self.assertEqual(await gemini.process_bandit_message_async(message, client, max_attempts=1), 'Pending')
+        message = await BanditMessages.objects.aget()
+        self.assertEqual((message.status, message.attempts), ('Pending', 0))
+
+    async def test_worker_leaves_messages_pending_while_the_breaker_refuses(self):
+        await BanditMessages.objects.acreate(channel_id="54321", channel_name="HRJ", message="gm")
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.allow()  # a half-open trial is in flight elsewhere
+        client = AsyncGeminiClient(transport=StubTransport(), model_name='stub', circuit_breaker=breaker)
+        options = {'loop': False, 'interval': 0, 'batch_size': 10, 'stale_after': 300, 'max_attempts': 3}
+
+        await process_bandit_messages.Command().run(client, None, options)
+        message = await BanditMessages.objects.aget()
+        self.assertEqual((message.status, message.attempts), ('Pending', 0))
+
+
+@patch('api.includes.prompt_registry.prompt_registry.record_usage')
+class GeminiBatcherTest(SimpleTestCase):
+    """
+    Test suite for micro-batching Discord messages into one Gemini request.
+    """
+
+    def run_batch(self, batcher, signal_type, messages):
+        async def burst():
+            return await asyncio.gather(*(batcher.parse(signal_type, message) for message in messages))
+        return asyncio.run(burst())
+
+    def test_burst_is_sent_as_one_request(self, mock_record_usage):
+        signal = {"asset": "sol/usdt", "trade_type": "long", "entry_price": 127.7, "entry_order_type": "limit",
+                  "stop_loss": 114.04, "take_profits": [{"series_num": 1, "tp_price": 134.66}]}
+        transport = StubTransport(json.dumps([json.loads(NO_SIGNAL), {"is_signal": True, "signal": signal}, json.loads(NO_SIGNAL)]))
+        client = AsyncGeminiClient(transport=transport, model_name='stub')
+        results = self.run_batch(gemini.GeminiBatcher(client, window=0.01, max_size=10), 'FJ', ["gm", "SOL long", "gn"])
+        self.assertEqual(results[1]["FJDiscordSignals"]["asset"], "SOL/USDT")
+        self.assertEqual(results[1]["FJTakeProfitTrades"], [{"series_num": 1, "tp_price": 134.66}])
+        self.assertEqual((results[0], results[2]), ("false", "false"))
+        self.assertEqual(transport.calls, 1)
+
+    def test_batch_prompt_holds_template_once(self, mock_record_usage):
+        prompt = gemini.generate_batch_prompt('HRJ', ["first", "second"])
+        self.assertEqual(prompt.count("### FEW-SHOT EXAMPLES:"), 1)
+        self.assertIn("exactly 2 responses", prompt)
+        self.assertIn("### MESSAGE 2\nsecond", prompt)
+
+    def test_max_size_splits_batches(self, mock_record_usage):
+        pair = f"[{NO_SIGNAL}, {NO_SIGNAL}]"
+        transport = StubTransport(pair, pair, NO_SIGNAL)
+        client = AsyncGeminiClient(transport=transport, model_name='stub')
+        results = self.run_batch(gemini.GeminiBatcher(client, window=0.01, max_size=2), 'HRJ', ["a", "b", "c", "d", "e"])
+        self.assertEqual(results, ["false"] * 5)
+        self.assertEqual(transport.calls, 3)
+
+    def test_unsplittable_response_falls_back_to_single_requests(self, mock_record_usage):
+        transport = StubTransport(f"[{NO_SIGNAL}]", NO_SIGNAL, NO_SIGNAL)
+        client = AsyncGeminiClient(transport=transport, model_name='stub')
+        results = self.run_batch(gemini.GeminiBatcher(client, window=0.01, max_size=10), 'HRJ', ["a", "b"])
+        self.assertEqual(results, ["false", "false"])
+        self.assertEqual(transport.calls, 3)
+
+
+class PrefilterTest(SimpleTestCase):
+    """
+    Test suite for the local pre-filter in front of Gemini.
+    """
+
+    def test_corpus_non_signals_are_rejected_and_signals_kept(self):
+        corpus = json.loads((Path(__file__).parent / 'includes' / 'signal_parser_corpus.json').read_text())
+        scorer = Prefilter(mode='enforce', threshold=0.1, model_path='')
+        for item in corpus:
+            with self.subTest(message=item['message'][:40]):
+                self.assertEqual(scorer.rejects(item['message']), item['expected'] == "false")
+
+    def test_free_form_messages_are_left_to_gemini(self):
+        self.assertEqual(rule_score("Going long BTC around 65k, stop 63k"), 0.5)
+
+    @patch('api.includes.gemini.call_gemini_api')
+    def test_enforce_mode_skips_gemini(self, mock_call_gemini):
+        with patch.object(prefilter, 'mode', 'enforce'):
+            self.assertEqual(gemini.parse_signal_message('FJ', "TP 2 was reached @Brigade"), "false")
+        mock_call_gemini.assert_not_called()
+
+    def test_shadow_mode_counts_disagreements(self):
+        scorer = Prefilter(mode='shadow', threshold=0.1, model_path='')
+        self.assertFalse(scorer.rejects("TP 2 was reached"))
+        scorer.observe('FJ', "TP 2 was reached", "false")
+        scorer.observe('FJ', "TP 2 was reached", {"FJDiscordSignals": {}})
+        self.assertEqual(scorer.stats()['agree'], 1)
+        self.assertEqual(scorer.stats()['missed_signals'], 1)
+
+
+class PrefilterStatsTest(TestCase):
+    """
+    Test suite for the pre-filter agreement counts shared across workers.
+    """
+
+    def test_counts_from_every_thread_and_worker_are_reported(self):
+        workers = [Prefilter(mode='shadow', threshold=0.1, model_path='', flush_interval=3600) for _ in range(2)]
+        threads = [
+            threading.Thread(target=lambda: [workers[0].observe('FJ', "TP 2 was reached", "false") for _ in range(200)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        workers[1].observe('FJ', "TP 2 was reached", {"FJDiscordSignals": {}})
+        self.assertEqual(workers[0].stats()['agree'], 800)
+        for worker in workers:
+            worker.flush_stats()
+
+        out = StringIO()
+        call_command('prefilter_stats', stdout=out)
+        self.assertIn("shadow agree=800 disagree=1 missed_signals=1 agreement=0.999", out.getvalue())
+        self.assertEqual(PrefilterStats.objects.get(mode='shadow').agree, 800)
+
+
+class TrainPrefilterTest(TestCase):
+    """
+    Test suite for the training data of the train_prefilter command.
+    """
+
+    def setUp(self):
+        gemini_cache.clear()
+
+    def create_message(self, message, status, verdict=None):
+        BanditMessages.objects.create(channel_id="54321", channel_name="FJ", message=message, status=status)
+        if verdict is not None:
+            gemini_cache.set('FJ', message, verdict, 0.5)
+
+    def test_only_gemini_verdicts_are_labels(self):
+        signal_data = {"FJDiscordSignals": {"asset": "SOL/USDT"}, "FJTakeProfitTrades": []}
+        self.create_message("SOL looks ready", 'Signal', signal_data)
+        self.create_message("gm everyone", 'NoSignal', "false")
+        # Decided by the pre-filter and the local parser, without Gemini
+        self.create_message("TP 1 was reached @Brigade", 'NoSignal')
+        self.create_message("SOL/USDT LONG\nEntry: 126\nTP1: 146\nSL: 105", 'Signal')
+        # Unmonitored channel
+        self.create_message("BTC breaking out", 'Skipped', signal_data)
+
+        self.assertEqual(train_prefilter.labelled_messages(), (["SOL looks ready", "gm everyone"], [1, 0]))
+
+    def test_empty_messages_are_skipped(self):
+        self.create_message("gm everyone", 'NoSignal', "false")
+        self.create_message(None, 'NoSignal')
+        self.create_message("", 'NoSignal', "false")
+        self.create_message("  \n ", 'NoSignal', "false")
+
+        self.assertEqual(train_prefilter.labelled_messages(), (["gm everyone"], [0]))
+
+
+class SignalSchemaTest(SimpleTestCase):
+    """
+    Test suite for the structured-output schemas used on the live Gemini path.
+    """
+
+    def test_response_validates_into_model_ready_dict(self):
+        corpus = json.loads((Path(__file__).parent / 'includes' / 'signal_parser_corpus.json').read_text())
+        for item in corpus:
+            if item['expected'] == "false":
+                continue
+            with self.subTest(channel=item['channel']):
+                main_signal_data = dict(item['expected'][f"{item['channel']}DiscordSignals"])
+                main_signal_data['take_profits'] = item['expected'][f"{item['channel']}TakeProfitTrades"]
+                response = json.dumps({"is_signal": True, "signal": main_signal_data})
+                self.assertEqual(signal_schemas.validate_response(item['channel'], response), item['expected'])
+
+    def test_sigscan_asset_is_stored_without_slash(self):
+        response = {"is_signal": True, "signal": {"asset": "ARB/USDT", "trade_type": "long", "entry_price": 0.33,
+                    "entry_order_type": "limit", "stop_loss": 0.32, "take_profits": []}}
+        signal_data = signal_schemas.validate_response('SIGSCAN', json.dumps(response))
+        self.assertEqual(signal_data["SIGSCANDiscordSignals"]["asset"], "ARBUSDT")
+
+    def test_non_signal_and_invalid_responses(self):
+        self.assertEqual(signal_schemas.validate_response('HRJ', NO_SIGNAL), "false")
+        self.assertIsNone(signal_schemas.validate_response('FJ', '{"is_signal": true, "signal": {"asset": "SOL/USDT", "trade_type": "up"}}'))
+        self.assertIsNone(signal_schemas.validate_response('FJ', '{"is_signal": true, "signal": null}'))
+
+    def test_generation_configs_are_accepted_by_the_sdk(self):
+        for signal_type in SIGNAL_SOURCES:
+            # Every source needs a prompt template as well
+            self.assertEqual(gemini.prompt_registry.get(signal_type).signal_type, signal_type)
+            for batch in (False, True):
+                config = generation_types.to_generation_config_dict(signal_schemas.generation_config(signal_type, batch=batch))
+                self.assertEqual(config['response_mime_type'], "application/json")
+
+
+class PromptRegistryTest(TestCase):
+    """
+    Test suite for the compiled prompt templates, context caching and usage reporting.
+    """
+
+    def test_prompts_are_built_from_compiled_templates(self):
+        self.assertEqual(gemini.generate_prompt('fj', "gm"), gemini.FJ_TEMPLATE + "\ngm")
+        self.assertTrue(gemini.generate_batch_prompt('FJ', ["gm", "gn"]).startswith(gemini.prompt_registry.get('FJ').head))
+        with self.assertRaises(ValueError):
+            gemini.generate_prompt('XYZ', "gm")
+
+    def test_context_cache_is_off_by_default(self):
+        prompt = gemini.generate_prompt('HRJ', "gm")
+        self.assertEqual(gemini.prompt_registry.for_request('HRJ', prompt), (prompt, None))
+
+    @override_settings(GEMINI_CONTEXT_CACHE_TTL=3600)
+    @patch('google.generativeai.caching.CachedContent.create', return_value=SimpleNamespace(name='cachedContents/hrj'))
+    def test_cached_head_is_not_resent(self, mock_create):
+        registry = PromptRegistry()
+        registry.register('HRJ', gemini.HRJ_TEMPLATE)
+        contents, cached_content = registry.for_request('HRJ', registry.get('HRJ').prefix + "gm")
+        self.assertEqual(cached_content.name, 'cachedContents/hrj')
+        self.assertEqual(contents, "### INPUT MESSAGE TO PROCESS:\n\ngm")
+        registry.for_request('HRJ', registry.get('HRJ').prefix + "gn")
+        mock_create.assert_called_once()
+
+    @override_settings(GEMINI_CONTEXT_CACHE_TTL=3600)
+    def test_async_requests_create_the_cache_off_the_event_loop(self):
+        registry = PromptRegistry()
+        registry.register('HRJ', gemini.HRJ_TEMPLATE)
+        prompt = registry.get('HRJ').prefix + "gm"
+        create_threads = []
+
+        def create(**kwargs):
+            create_threads.append(threading.current_thread())
+            return SimpleNamespace(name='cachedContents/hrj')
+
+        async def request_twice():
+            return [await registry.for_request_async('HRJ', prompt) for _ in range(2)]
+
+        with patch('google.generativeai.caching.CachedContent.create', side_effect=create):
+            requests = asyncio.run(request_twice())
+        self.assertEqual([cached_content.name for _, cached_content in requests], ['cachedContents/hrj'] * 2)
+        self.assertEqual(len(create_threads), 1)
+        self.assertIsNot(create_threads[0], threading.current_thread())
+
+    def test_usage_report_shows_cost_per_strategy(self):
+        strategy = Strategy.objects.create(name='HRJ')
+        GeminiUsage.objects.create(strategy=strategy, channel='HRJ', model_name='stub', messages=1,
+                                   prompt_tokens=1_000_000, response_tokens=0, latency_ms=800)
+        out = StringIO()
+        call_command('gemini_usage_report', stdout=out)
+        self.assertIn("HRJ", out.getvalue())
+        self.assertIn("total cost usd 0.3000", out.getvalue())
+
+
+class ExchangeAdapterTest(SimpleTestCase):
+    """
+    Test suite for the exchange adapter registry used by createTrade.
+    """
+
+    def setUp(self):
+        self.signal_message = {
+            'strategy_id': 1, 'symbol': 'BTCUSDT', 'side': 'BUY', 'price': '100000', 'tradeSide': 'OPEN',
+            'orderType': 'MARKET', 'tpPrice': None, 'slPrice': None,
+        }
+        for target in ('api.services.sizeOpenTrades', 'api.services.recordUserTrades'):
+            patcher = patch(target, return_value=None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_bitunix_adapter_is_registered_at_startup(self):
+        adapter = get_exchange_adapter('Bitunix')
+        self.assertEqual((adapter.name, adapter.queue_name), ('Bitunix', 'Bitunix_Queue'))
+        self.assertEqual(adapter.build_order(self.signal_message, {})["symbol"], "BTCUSDT")
+
+    @patch.dict(EXCHANGE_ADAPTERS)
+    def test_new_exchange_is_routed_by_its_adapter(self):
+        @register_exchange_adapter
+        class PaperAdapter(ExchangeAdapter):
+            name = 'Paper'
+            queue_name = 'Paper_Orders'
+
+            def build_order(self, signal_message, user_item):
+                return {'paper': signal_message['symbol']}
+
+        fake_client = FakeSQSClient()
+        user_data = [{'user_id': 1, 'name': 'Paper'}, {'user_id': 2, 'name': 'Bitunix'}, {'user_id': 3, 'name': 'Unknown'}]
+        with patch('api.services.getSQSClient', return_value=fake_client):
+            results = services.createTrade(self.signal_message, user_data, 1, ['Paper', 'Bitunix', 'Unknown'])
+
+        self.assertEqual(set(results), {(1, None), (2, None)})
+        self.assertEqual(results[(1, None)]['exchange'], 'Paper')
+        self.assertEqual(sorted(url.rsplit('/', 1)[1] for url, _ in fake_client.batch_calls), ['Bitunix_Queue', 'Paper_Orders'])
+        self.assertEqual(user_data[0]['paper'], 'BTCUSDT')
+
+    def test_bitunix_template_matches_a_rebuilt_order(self):
+        adapter = get_exchange_adapter('Bitunix')
+        closing = dict(self.signal_message, tradeSide='CLOSE', slPrice='95000', slStopType='MARK_PRICE',
+                       slOrderType='MARKET', slOrderPrice=None)
+        user_items = [
+            {'user_id': 1, 'api_key': 'k"1', 'trade_qty': '0.5', 'position_id': 'pos-1', 'order_price': '100000.0'},
+            {'user_id': 2, 'api_key': 'k2'},
+            # A closing trade's quantity as read back from user_trades
+            {'user_id': 3, 'trade_qty': Decimal('0.500000000000'), 'position_id': 'pos-3'},
+            {},
+        ]
+        for signal_message in (self.signal_message, closing):
+            template = adapter.order_template(signal_message)
+            for user_item in user_items:
+                rebuilt = ExchangeAdapter.order_template(adapter, signal_message).render(dict(user_item))
+                self.assertEqual(json.loads(template.render(user_item)), json.loads(rebuilt))
+        self.assertEqual(json.loads(template.render(user_items[2]))['orderList'][0]['qty'], '0.5')
+
+
+class PositionSizingTest(TestCase):
+    """
+    Test suite for the vectorized position sizing of opening trades.
+    """
+
+    def setUp(self):
+        symbol_rules_cache.clear()
+        self.rules = SymbolRules(
+            qty_step=Decimal('0.001'), min_qty=Decimal('0.002'), tick_size=Decimal('0.1'),
+            min_notional=Decimal('5'), max_leverage=20,
+        )
+
+    def test_quantities_are_floored_to_the_step_as_exact_strings(self):
+        quantities = size_positions(Decimal('50000'), [1000, 2500.5, Decimal('100')], [10, 50, 100], [5, 2, 1], self.rules)
+        # 500 / 50000 = 0.01; 2500.5 / 50000 = 0.05001 -> 0.05; 100 / 50000 = 0.002
+        self.assertEqual(quantities, ['0.010', '0.050', '0.002'])
+
+    def test_unsizable_subscribers_get_no_quantity(self):
+        quantities = size_positions(
+            Decimal('50000'), [None, 1000, 50, 1000, 1000], [10, None, 10, 0, 10], [5, 5, 1, 5, 100], self.rules
+        )
+        # Unknown balance, unset percentage, below min qty, zero percentage; leverage 100 is capped at 20
+        self.assertEqual(quantities, [None, None, None, None, '0.040'])
+
+    def test_price_is_rounded_to_the_tick_size(self):
+        self.assertEqual(str(round_price('65000.06', Decimal('0.100000000000'))), '65000.1')
+        self.assertEqual(str(round_price(65004.9, Decimal('10'))), '65000')
+
+    def test_open_orders_are_sized_from_symbol_rules(self):
+        self.signal = Signal.objects.create(symbol='BTCUSDT', side='BUY', tradeSide='OPEN', price='50000.04')
+        exchange = SupportedExchange.objects.create(name='Bitunix')
+        ExchangeSymbolRule.objects.create(
+            exchange=exchange, symbol='BTCUSDT', qty_step=Decimal('0.001'), min_qty=Decimal('0.001'),
+            tick_size=Decimal('0.1'), min_notional=Decimal('5'),
+        )
+        signal_message = {
+            'strategy_id': 1, 'symbol': 'BTCUSDT', 'side': 'BUY', 'price': '50000.04', 'tradeSide': 'OPEN',
+            'orderType': 'LIMIT', 'tpPrice': None, 'slPrice': None,
+        }
+        accounts = [UserApi.objects.create(exchange=exchange, api_key=f'key{i}', api_secret='s') for i in range(3)]
+        AccountBalance.objects.create(user_api=accounts[0], available=Decimal('1000'), refreshed_at=timezone.now())
+        # Too old to size from
+        AccountBalance.objects.create(user_api=accounts[1], available=Decimal('1000'), refreshed_at=timezone.now() - timedelta(hours=1))
+        # Below the minimum order value
+        AccountBalance.objects.create(user_api=accounts[2], available=Decimal('1'), refreshed_at=timezone.now())
+        users = [get_user_model().objects.create(username=f'trader{i}') for i in range(3)]
+        user_data = [
+            {'user_id': user.id, 'user_api_id': account.id, 'name': 'Bitunix', 'portfolio_percentage': 10, 'leverage_amount': 5}
+            for user, account in zip(users, accounts)
+        ]
+        fake_client = FakeSQSClient()
+        with patch('api.services.getSQSClient', return_value=fake_client):
+            results = services.createTrade(signal_message, user_data, self.signal.id, ['Bitunix'])
+
+        orders = {message['user_id']: message['orderList'][0] for message in fake_client.messages}
+        self.assertEqual(list(orders), [users[0].id])
+        self.assertEqual((orders[users[0].id]['qty'], orders[users[0].id]['price']), ('0.010', '50000.0'))
+        self.assertEqual(results[(users[1].id, accounts[1].id)]['status'], 'unsized')
+        trades = UserTrade.objects.filter(signal=self.signal).order_by('auth_user_id')
+        self.assertEqual(
+            [(trade.status, trade.reason, trade.message_id) for trade in trades],
+            [('Queued', None, 'msg-0'), ('Unsized', 'no balance snapshot', None), ('Unsized', 'below exchange minimums', None)],
+        )
+
+    def test_nothing_is_sent_without_symbol_rules(self):
+        signal_message = {
+            'strategy_id': 1, 'symbol': 'DOGEUSDT', 'side': 'BUY', 'price': '0.1', 'tradeSide': 'OPEN',
+            'orderType': 'MARKET', 'tpPrice': None, 'slPrice': None,
+        }
+        user_data = [{'user_id': 1, 'user_api_id': 1, 'name': 'Bitunix', 'portfolio_percentage': 10, 'leverage_amount': 5}]
+        fake_client = FakeSQSClient()
+        with patch('api.services.getSQSClient', return_value=fake_client), patch('api.services.recordUserTrades') as mock_record:
+            results = services.createTrade(signal_message, user_data, 1, ['Bitunix'])
+
+        self.assertEqual(fake_client.batch_calls, [])
+        self.assertEqual(results[(1, 1)], {'exchange': 'Bitunix', 'status': 'unsized', 'message_id': None, 'reason': 'no symbol rules'})
+        self.assertEqual(mock_record.call_args.args[1], user_data)
+
+
+class StubBitunixClient:
+    """Offline stand-in for BitunixClient returning a fixed futures account per API key."""
+
+    def __init__(self, available, failing=()):
+        self.available = available
+        self.failing = set(failing)
+        self.calls = []
+
+    def get_account(self, api_key, api_secret, margin_coin='USDT'):
+        self.calls.append(api_key)
+        if api_key in self.failing:
+            raise ExchangeAPIError("Bitunix /api/v1/futures/account returned code 10003: Invalid api key")
+        return [{
+            'marginCoin': margin_coin, 'available': self.available[api_key], 'frozen': '10', 'margin': '40',
+            'crossUnrealizedPNL': '-5.5', 'isolationUnrealizedPNL': '0',
+        }]
+
+
+class AccountBalanceTest(TestCase):
+    """
+    Test suite for the balance snapshots refreshed by refresh_balances and read by sizing.
+    """
+
+    def setUp(self):
+        exchange = SupportedExchange.objects.create(name='Bitunix')
+        strategy = Strategy.objects.create(name='BTC Strategy')
+        self.accounts = []
+        for i in range(3):
+            user = get_user_model().objects.create(username=f'trader{i}')
+            account = UserApi.objects.create(auth_user=user, exchange=exchange, api_key=f'key{i}', api_secret='s')
+            StrategySubscription.objects.create(auth_user=user, strategy=strategy, user_api=account, portfolio_percentage=10)
+            self.accounts.append(account)
+        # Unsubscribed credentials are never fetched
+        UserApi.objects.create(exchange=exchange, api_key='idle', api_secret='s')
+        self.exchange_client = StubBitunixClient({'key0': '1000.5', 'key1': '250', 'key2': '75'})
+        patcher = patch.object(get_exchange_adapter('Bitunix'), 'client', self.exchange_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refresh_stores_one_snapshot_per_account(self):
+        self.assertEqual(services.refreshBalances(), (3, 0))
+        self.assertEqual(sorted(self.exchange_client.calls), ['key0', 'key1', 'key2'])
+        snapshot = AccountBalance.objects.get(user_api=self.accounts[0])
+        self.assertEqual((snapshot.currency, snapshot.available, snapshot.equity), ('USDT', Decimal('1000.5'), Decimal('1045')))
+
+        # Fresh snapshots are not refetched; stale ones are updated in place
+        self.assertEqual(services.refreshBalances(), (0, 0))
+        AccountBalance.objects.filter(user_api=self.accounts[1]).update(refreshed_at=timezone.now() - timedelta(hours=1))
+        self.exchange_client.available['key1'] = '300'
+        self.assertEqual(services.refreshBalances(), (1, 0))
+        self.assertEqual(AccountBalance.objects.count(), 3)
+        self.assertEqual(AccountBalance.objects.get(user_api=self.accounts[1]).available, Decimal('300'))
+
+    def test_failed_fetch_does_not_block_other_accounts(self):
+        self.exchange_client.failing.add('key1')
+        out = StringIO()
+        call_command('refresh_balances', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'refreshed=2 failed=1')
+        self.assertFalse(AccountBalance.objects.filter(user_api=self.accounts[1]).exists())
+
+    @patch.dict(EXCHANGE_ADAPTERS)
+    def test_exchanges_without_balance_support_are_not_fetched(self):
+        @register_exchange_adapter
+        class PaperAdapter(ExchangeAdapter):
+            name = 'Paper'
+
+        paper = UserApi.objects.create(exchange=SupportedExchange.objects.create(name='Paper'), api_key='paper', api_secret='s')
+        StrategySubscription.objects.create(auth_user=self.accounts[0].auth_user, strategy=Strategy.objects.get(), user_api=paper)
+        with patch.object(PaperAdapter, 'fetch_balance') as mock_fetch_balance:
+            self.assertEqual(services.refreshBalances(), (3, 0))
+        mock_fetch_balance.assert_not_called()
+        self.assertFalse(AccountBalance.objects.filter(user_api=paper).exists())
+
+    def test_balances_are_read_in_one_query_and_stale_ones_skipped(self):
+        services.refreshBalances()
+        AccountBalance.objects.filter(user_api=self.accounts[2]).update(refreshed_at=timezone.now() - timedelta(hours=1))
+        with self.assertNumQueries(1):
+            balances = services.getBalances([account.id for account in self.accounts])
+        self.assertEqual(balances, {self.accounts[0].id: Decimal('1000.5'), self.accounts[1].id: Decimal('250')})
+
+
+class UserTradeRecordTest(TestCase):
+    """
+    Test suite for the UserTrade rows written when a signal is dispatched.
+    """
+
+    def setUp(self):
+        roster_cache.clear()
+        symbol_rules_cache.clear()
+        self.strategy = Strategy.objects.create(name='BTC Strategy')
+        exchange = SupportedExchange.objects.create(name='Bitunix')
+        self.users = [get_user_model().objects.create(username=f'trader{i}') for i in range(3)]
+        for user in self.users:
+            user_api = UserApi.objects.create(auth_user=user, exchange=exchange, api_key=f'key{user.id}', api_secret='s')
+            StrategySubscription.objects.create(auth_user=user, strategy=self.strategy, user_api=user_api, portfolio_percentage=10)
+        self.signal_message = {
+            'strategy_id': self.strategy.strategy_id, 'symbol': 'BTCUSDT', 'side': 'BUY', 'price': '100000', 'tradeSide': 'OPEN',
+            'orderType': 'MARKET', 'tpPrice': None, 'slPrice': None,
+        }
+        self.open_signal = Signal.objects.create(strategy=self.strategy, symbol='BTCUSDT', side='BUY', tradeSide='OPEN', price='100000')
+        services.openPosition(self.signal_message, self.open_signal.id)
+        # Sizing is covered by PositionSizingTest
+        patcher = patch('api.services.sizeOpenTrades')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def dispatch_open_signal(self):
+        # The exchange queue rejects the second subscriber's order
+        fake_client = FakeSQSClient()
+        send = fake_client.send_message_batch
+        fake_client.send_message_batch = lambda QueueUrl, Entries: {
+            'Successful': send(QueueUrl, [entry for entry in Entries if entry['Id'] != '1'])['Successful'],
+            'Failed': [{'Id': '1', 'SenderFault': True, 'Code': 'InvalidMessageContents'}],
+        }
+        user_data = services.getUserData(self.strategy.strategy_id, None)
+        with patch('api.services.getSQSClient', return_value=fake_client):
+            return services.createTrade(self.signal_message, user_data, self.open_signal.id, ['Bitunix'])
+
+    def test_dispatch_writes_every_subscriber_in_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.dispatch_open_signal()
+        inserts = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('INSERT INTO "user_trades"')]
+        self.assertEqual(len(inserts), 1)
+
+        trades = {trade.auth_user_id: trade for trade in UserTrade.objects.filter(signal=self.open_signal)}
+        self.assertEqual(set(trades), {user.id for user in self.users})
+        self.assertEqual((trades[self.users[0].id].status, trades[self.users[0].id].message_id), ('Queued', 'msg-0'))
+        self.assertEqual((trades[self.users[1].id].status, trades[self.users[1].id].message_id), ('Failed', None))
+
+    def test_close_resolves_positions_from_dispatched_trades(self):
+        self.dispatch_open_signal()
+        UserTrade.objects.filter(auth_user=self.users[0]).update(position_id='pos-0', trade_qty='0.5')
+        close_message = dict(self.signal_message, side='SELL', tradeSide='CLOSE')
+
+        open_signal_id = services.findOpenTrade(close_message)
+        self.assertEqual(open_signal_id, self.open_signal.id)
+        user_data = services.getUserData(self.strategy.strategy_id, open_signal_id)
+
+        # The subscriber whose open order was never queued has no position to close
+        self.assertEqual([item['user_id'] for item in user_data], [self.users[0].id, self.users[2].id])
+        self.assertEqual((user_data[0]['position_id'], user_data[0]['trade_qty']), ('pos-0', Decimal('0.5')))
+
+    def test_each_account_of_a_user_keeps_its_own_order(self):
+        # The first subscriber also trades the strategy from a second account
+        second_api = UserApi.objects.create(auth_user=self.users[0], exchange=SupportedExchange.objects.get(name='Bitunix'), api_key='second', api_secret='s')
+        StrategySubscription.objects.create(auth_user=self.users[0], strategy=self.strategy, user_api=second_api, portfolio_percentage=10)
+        roster_cache.clear()
+        results = self.dispatch_open_signal()
+
+        self.assertEqual(len(results), 4)
+        trades = {trade.user_api_id: trade for trade in UserTrade.objects.filter(signal=self.open_signal, auth_user=self.users[0])}
+        self.assertEqual(len(trades), 2)
+        self.assertEqual(trades[second_api.id].message_id, 'msg-3')
+        self.assertEqual(results[(self.users[0].id, second_api.id)]['message_id'], 'msg-3')
+
+        for user_api_id, trade in trades.items():
+            UserTrade.objects.filter(id=trade.id).update(position_id=f'pos-{user_api_id}')
+        user_data = services.getUserData(self.strategy.strategy_id, self.open_signal.id)
+        positions = {item['user_api_id']: item['position_id'] for item in user_data if item['user_id'] == self.users[0].id}
+        self.assertEqual(positions, {user_api_id: f'pos-{user_api_id}' for user_api_id in trades})
+
+
+class OpenPositionTest(TestCase):
+    """
+    Test suite for the open_positions table maintained when TradingView signals are ingested.
+    """
+
+    def setUp(self):
+        strategy_cache.clear()
+        self.strategy = Strategy.objects.create(name='BTC Strategy', password='secret')
+        patch('api.services.createTrade', return_value={}).start()
+        self.get_user_data = patch('api.services.getUserData', return_value=[{'user_id': 1}]).start()
+        self.addCleanup(patch.stopall)
+
+    def ingest(self, side, trade_side, price):
+        services.processTradingViewSignal({
+            'strategy': 'BTC Strategy', 'auth': 'secret', 'symbol': 'BTCUSDT', 'side': side,
+            'price': price, 'time': '2026-01-01T00:00:00Z', 'tradeSide': trade_side,
+        })
+        return Signal.objects.latest('id').id
+
+    def position(self):
+        return OpenPosition.objects.filter(strategy=self.strategy, symbol='BTCUSDT', side='BUY').first()
+
+    def test_overlapping_positions_close_newest_first(self):
+        first = self.ingest('BUY', 'OPEN', '100000')
+        second = self.ingest('BUY', 'OPEN', '101000')
+        self.assertEqual((self.position().open_count, self.position().latest_signal_id), (2, second))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(services.findOpenTrade({'strategy_id': self.strategy.strategy_id, 'symbol': 'BTCUSDT', 'side': 'SELL'}), second)
+
+        self.ingest('SELL', 'CLOSE', '102000')
+        self.assertEqual(self.get_user_data.call_args.args, (self.strategy.strategy_id, second))
+        self.assertEqual((self.position().open_count, self.position().signal_ids), (1, [first]))
+
+        self.ingest('SELL', 'CLOSE', '103000')
+        self.assertEqual(self.get_user_data.call_args.args, (self.strategy.strategy_id, first))
+        self.assertIsNone(self.position())
+
+    def test_close_without_open_position_matches_nothing(self):
+        self.ingest('SELL', 'CLOSE', '100000')
+        self.assertEqual(self.get_user_data.call_args.args, (self.strategy.strategy_id, None))
+        self.assertFalse(OpenPosition.objects.exists())
+
+    def test_rebuild_regenerates_positions_from_history(self):
+        first = self.ingest('BUY', 'OPEN', '100000')
+        self.ingest('BUY', 'OPEN', '101000')
+        self.ingest('SELL', 'CLOSE', '102000')
+        short = self.ingest('SELL', 'OPEN', '99000')
+        expected = sorted(OpenPosition.objects.values_list('side', 'open_count', 'latest_signal_id', 'signal_ids'))
+        self.assertEqual(expected, [('BUY', 1, first, [first]), ('SELL', 1, short, [short])])
+
+        OpenPosition.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_open_positions', stdout=out)
+        self.assertEqual(sorted(OpenPosition.objects.values_list('side', 'open_count', 'latest_signal_id', 'signal_ids')), expected)
+        self.assertIn('rebuilt 2 open positions', out.getvalue())
+
+    def test_migration_backfill_replays_like_the_rebuild(self):
+        # 0011 fills open_positions from history with its own copy of the replay
+        migration = importlib.import_module('api.migrations.0011_openposition')
+        signals = [
+            (1, 7, 'BTCUSDT', 'BUY', 'OPEN'), (2, 7, 'BTCUSDT', 'BUY', 'OPEN'), (3, 7, 'BTCUSDT', 'SELL', 'CLOSE'),
+            (4, 7, 'ETHUSDT', 'SELL', 'OPEN'), (5, 7, 'ETHUSDT', 'BUY', 'CLOSE'), (6, 7, 'SOLUSDT', 'BUY', 'CLOSE'),
+        ]
+        self.assertEqual(migration.replay_positions(signals), {(7, 'BTCUSDT', 'BUY'): [1]})
+        self.assertEqual(migration.replay_positions(signals), replay_positions(signals))
+
+
+class HistoryArchiveTest(TestCase):
+    """
+    Test suite for the archive_history retention command.
+    """
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        self.strategy = Strategy.objects.create(name='BTC Strategy')
+        self.user = get_user_model().objects.create(username='trader')
+        old = timezone.now() - timedelta(days=200)
+
+        self.expired = self.create_signal('100000')
+        self.traded = self.create_signal('101000')
+        self.open = self.create_signal('102000')
+        self.recent = self.create_signal('103000')
+        OpenPosition.objects.create(strategy=self.strategy, symbol='BTCUSDT', side='BUY', open_count=1, latest_signal=self.open, signal_ids=[self.open.id])
+        self.old_trade = UserTrade.objects.create(auth_user=self.user, signal=self.traded, trade_qty='0.5', status='Queued')
+        self.open_trade = UserTrade.objects.create(auth_user=self.user, signal=self.open, trade_qty='0.25', status='Queued')
+        self.old_message = BanditMessages.objects.create(channel_name='bandit', message='old', status='NoSignal')
+        self.recent_message = BanditMessages.objects.create(channel_name='bandit', message='recent')
+
+        Signal.objects.exclude(id=self.recent.id).update(created_at=old)
+        UserTrade.objects.update(created_at=old)
+        BanditMessages.objects.filter(id=self.old_message.id).update(created_at=old)
+
+    def create_signal(self, price):
+        return Signal.objects.create(strategy=self.strategy, symbol='BTCUSDT', side='BUY', tradeSide='OPEN', price=price)
+
+    def archived(self, table):
+        rows = []
+        for path in sorted(Path(self.archive_dir, table).glob('*.jsonl.gz')):
+            with gzip.open(path, 'rt', encoding='utf-8') as archive:
+                rows.extend(json.loads(line) for line in archive)
+        return rows
+
+    def test_expired_rows_are_archived_then_deleted(self):
+        out = StringIO()
+        call_command('archive_history', days=180, archive_dir=self.archive_dir, stdout=out)
+
+        # The old trade goes first, which frees its signal; the open position's signal and its trade stay
+        self.assertEqual(sorted(Signal.objects.values_list('id', flat=True)), [self.open.id, self.recent.id])
+        self.assertEqual(list(UserTrade.objects.values_list('id', flat=True)), [self.open_trade.id])
+        self.assertEqual(list(BanditMessages.objects.values_list('id', flat=True)), [self.recent_message.id])
+
+        self.assertEqual([row['id'] for row in self.archived('signal')], [self.expired.id, self.traded.id])
+        self.assertEqual([(row['signal_id'], Decimal(row['trade_qty'])) for row in self.archived('user_trades')], [(self.traded.id, Decimal('0.5'))])
+        self.assertEqual([row['message'] for row in self.archived('banditmessages')], ['old'])
+        self.assertIn('signal: archived 2 rows', out.getvalue())
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('archive_history', days=180, archive_dir=self.archive_dir, dry_run=True, stdout=out)
+
+        self.assertEqual(Signal.objects.count(), 4)
+        self.assertEqual(UserTrade.objects.count(), 2)
+        self.assertEqual(BanditMessages.objects.count(), 2)
+        self.assertEqual(os.listdir(self.archive_dir), [])
+        self.assertIn('user_trades: would archive 1 rows', out.getvalue())
+
+    @patch('api.includes.partitions.drop_partition')
+    def test_partition_with_referenced_rows_is_kept(self, mock_drop):
+        month = partitions.month_start(timezone.now() - timedelta(days=200))
+        listed = lambda table: {month: partitions.partition_name(table, month)} if table in partitions.PARTITIONED_TABLES else {}
+        out = StringIO()
+        with patch('api.includes.partitions.list_partitions', side_effect=listed):
+            call_command('archive_history', days=30, archive_dir=self.archive_dir, stdout=out)
+
+        # The user_trades month holds the open signal's trade, so only its expired rows go
+        mock_drop.assert_called_once_with('banditmessages', partitions.partition_name('banditmessages', month))
+        self.assertIn(f"user_trades: kept partition {partitions.partition_name('user_trades', month)}", out.getvalue())
+        self.assertEqual(list(UserTrade.objects.values_list('id', flat=True)), [self.open_trade.id])
+
+    def test_partition_months(self):
+        december = partitions.month_start(timezone.now().replace(year=2025, month=12, day=31))
+        self.assertEqual(partitions.add_months(december, 1), december.replace(year=2026, month=1))
+        self.assertEqual(partitions.add_months(december, -12), december.replace(year=2024))
+        self.assertEqual(partitions.partition_name('user_trades', december), 'user_trades_2025_12')
+        # Plain tables outside PostgreSQL have no partitions to manage
+        if connection.vendor != 'postgresql':
+            self.assertEqual(partitions.list_partitions('user_trades'), {})
+
+
+@skipUnless(connection.vendor == 'postgresql', "Tables are only partitioned on PostgreSQL.")
+class PostgresPartitionTest(TestCase):
+    """
+    Test suite for the monthly partitions migration 0012 creates on PostgreSQL.
+    """
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        # Older than any partition the migration created, so its rows land in the default partition
+        self.month = partitions.add_months(partitions.month_start(timezone.now()), -8)
+        self.message = BanditMessages.objects.create(channel_name='bandit', message='old', status='NoSignal')
+        BanditMessages.objects.filter(id=self.message.id).update(created_at=self.month + timedelta(days=3))
+
+    def partition_ids(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT id FROM {connection.ops.quote_name(name)}")
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_create_partition_moves_rows_out_of_the_default_partition(self):
+        name = partitions.partition_name('banditmessages', self.month)
+        self.assertIn(self.message.id, self.partition_ids(partitions.default_partition_name('banditmessages')))
+
+        partitions.create_partition('banditmessages', self.month)
+
+        self.assertEqual(partitions.list_partitions('banditmessages')[self.month], name)
+        self.assertEqual(self.partition_ids(name), [self.message.id])
+        self.assertNotIn(self.message.id, self.partition_ids(partitions.default_partition_name('banditmessages')))
+        # New rows still get ids from the table's sequence
+        self.assertGreater(BanditMessages.objects.create(message='new').id, self.message.id)
+
+    def test_archive_history_drops_expired_partitions(self):
+        partitions.create_partition('banditmessages', self.month)
+        out = StringIO()
+        call_command('archive_history', days=30, archive_dir=self.archive_dir, stdout=out)
+
+        self.assertNotIn(self.month, partitions.list_partitions('banditmessages'))
+        self.assertFalse(BanditMessages.objects.filter(id=self.message.id).exists())
+        with gzip.open(Path(self.archive_dir, 'banditmessages', f"{partitions.partition_name('banditmessages', self.month)}.jsonl.gz"), 'rt') as archive:
+            self.assertEqual([json.loads(line)['id'] for line in archive], [self.message.id])
+        self.assertIn("banditmessages: dropped 1 partitions", out.getvalue())
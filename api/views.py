@@ -1,14 +1,15 @@
 import os
 from dotenv import load_dotenv # type: ignore
 from django.shortcuts import render
+from django.conf import settings
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.renderers import JSONRenderer
 from .models import BlogPost, Signal, HRJDiscordSignal, FJDiscordSignal
-from .serializers import BlogPostSerializer, SignalSerializer, BanditMessageSerializer
-from api.services import createBlogPost, processTradingViewSignal, DuplicateSignalError, StrategyNotFoundError, NoSubscribersError
-from api.includes.gemini import generate_prompt, call_gemini_api, save_signal_from_gemini_response
+from .serializers import BlogPostSerializer, SignalSerializer, BanditMessageSerializer, TradingViewSignalSerializer
+from api.services import createBlogPost, processTradingViewSignal, enqueueTradingViewSignal, DuplicateSignalError, StrategyNotFoundError, NoSubscribersError, InvalidSignalError
+from api.includes.gemini import generate_prompt, call_gemini_api
 import json
 
 import logging
@@ -95,6 +96,9 @@ class ProcessTradingViewSignal(APIView):
             logger.warning(f"Forbidden request to ProcessTradingViewSignal from unauthorized IP: {client_ip}")
             return Response({"status": "error", "message": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
 
+        if settings.TRADINGVIEW_ASYNC_ACK:
+            return self.enqueue(request, client_ip)
+
         try:
             logger.info(f"Received TradingView signal from authorized IP {client_ip}: {request.data}")
             processTradingViewSignal(request.data)
@@ -102,6 +106,9 @@ class ProcessTradingViewSignal(APIView):
         except StrategyNotFoundError as e:
             logger.warning(str(e))
             return Response({"status": "error", "message": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except InvalidSignalError as e:
+            logger.warning(f"Invalid TradingView signal from {client_ip}: {e}")
+            return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except DuplicateSignalError as e:
             logger.info(str(e))
             return Response({"status": "success", "message": str(e)}, status=status.HTTP_200_OK)
@@ -112,6 +119,21 @@ class ProcessTradingViewSignal(APIView):
             logger.error(f"An unhandled error occurred while processing TradingView signal: {e}", exc_info=True)
             return Response({"status": "error", "message": "An internal server error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def enqueue(self, request, client_ip):
+        """Validates the payload and stores it in the signal outbox; the drain_signal_outbox worker does the rest."""
+        serializer = TradingViewSignalSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.warning(f"Invalid TradingView signal from {client_ip}: {serializer.errors}")
+            return Response({"status": "error", "message": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            outbox_id = enqueueTradingViewSignal(request.data)
+            logger.info(f"Queued TradingView signal from authorized IP {client_ip} as outbox entry {outbox_id}")
+            return Response({"status": "accepted", "message": "Signal queued for processing.", "id": outbox_id}, status=status.HTTP_202_ACCEPTED)
+        except Exception as e:
+            logger.error(f"Failed to queue TradingView signal: {e}", exc_info=True)
+            return Response({"status": "error", "message": "An internal server error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 
 
 
@@ -154,7 +176,7 @@ class callGeminiApi(APIView):
 
         print("--- Testing HRJ Signal ---")
         prompt_hrj = generate_prompt("HRJ", hrj_message)
-        result_hrj = call_gemini_api(prompt_hrj)
+        result_hrj = call_gemini_api(prompt_hrj, "HRJ")
         if result_hrj:
             print(json.dumps(result_hrj, indent=2))
             logger.info(json.dumps(result_hrj, indent=2))
@@ -165,7 +187,7 @@ class callGeminiApi(APIView):
 
         print("\n--- Testing FJ Signal ---")
         prompt_fj = generate_prompt("FJ", fj_message)
-        result_fj = call_gemini_api(prompt_fj)
+        result_fj = call_gemini_api(prompt_fj, "FJ")
         if result_fj:
             print(json.dumps(result_fj, indent=2))
             logger.info(json.dumps(result_fj, indent=2))
@@ -176,7 +198,7 @@ class callGeminiApi(APIView):
 
         print("\n--- Testing Non-Signal ---")
         prompt_spam = generate_prompt("HRJ", spam_message)
-        result_spam = call_gemini_api(prompt_spam)
+        result_spam = call_gemini_api(prompt_spam, "HRJ")
         print(result_spam)
         logger.info(result_spam)
 
@@ -186,6 +208,7 @@ class callGeminiApi(APIView):
 class BanditMessages(APIView):
     """
     Receives and stores messages from the Bandit discord bot.
+    Messages from monitored channels are queued as Pending for the process_bandit_messages worker.
     """
     def post(self, request, format=None):
         logger.info(f"Received message from Bandit bot for channel: {request.data.get('channel_name')}")
@@ -197,23 +220,10 @@ class BanditMessages(APIView):
         
         if serializer.is_valid():
             try:
-                serializer.save()
-                logger.info(f"Successfully saved message for channel ID: {serializer.data.get('channel_id')}")
-                
-                channel_name = request.data.get('channel_name')
                 channel_id = request.data.get('channel_id')
-                message_content = request.data.get('message')
-
-                if channel_id in channels_to_process:
-                    logger.info(f"Processing message from '{channel_name}' channel with Gemini.")
-                    prompt = generate_prompt(channel_name, message_content)
-                    gemini_response = call_gemini_api(prompt)
-
-                    if gemini_response and gemini_response != "false":
-                        logger.info(f"Gemini returned valid signal data for '{channel_name}'. Saving to database.")
-                        save_signal_from_gemini_response(gemini_response, channel_name)
-                    else:
-                        logger.info(f"Gemini determined the message from '{channel_name}' is not a valid signal.")
+                message_status = 'Pending' if channel_id in channels_to_process else 'Skipped'
+                serializer.save(status=message_status)
+                logger.info(f"Successfully saved message for channel ID: {serializer.data.get('channel_id')} ({message_status})")
 
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             except Exception as e:
@@ -115,6 +115,79 @@ REST_FRAMEWORK = {
     
 }
 
+# Trade dispatch
+# Number of threads used to fan signal orders out to the exchange queues.
+DISPATCH_MAX_WORKERS = int(os.getenv('DISPATCH_MAX_WORKERS', 8))
+
+# Per-process caches
+# Seconds a cached Strategy stays valid. Saves in this process clear it immediately;
+# the TTL bounds staleness for changes made through other workers.
+STRATEGY_CACHE_TTL = int(os.getenv('STRATEGY_CACHE_TTL', 60))
+# Seconds a strategy's active subscriber roster stays valid.
+ROSTER_CACHE_TTL = int(os.getenv('ROSTER_CACHE_TTL', 60))
+# Seconds between reads of the shared roster version (cache_version table). Subscription,
+# API key and exchange saves bump it, so every worker drops its rosters within this delay.
+ROSTER_VERSION_CHECK_INTERVAL = float(os.getenv('ROSTER_VERSION_CHECK_INTERVAL', 1.0))
+# Seconds an exchange's lot and tick size rules (ExchangeSymbolRule) stay valid.
+SYMBOL_RULES_CACHE_TTL = int(os.getenv('SYMBOL_RULES_CACHE_TTL', 300))
+# Seconds between writes of each worker's strategy, roster and symbol rules cache hit counts to cache_stats.
+CACHE_STATS_FLUSH_INTERVAL = float(os.getenv('CACHE_STATS_FLUSH_INTERVAL', 30))
+
+# Account balances
+# refresh_balances refetches snapshots older than BALANCE_REFRESH_INTERVAL seconds, using
+# BALANCE_REFRESH_WORKERS concurrent exchange calls. Order sizing ignores snapshots older
+# than BALANCE_MAX_AGE seconds.
+BALANCE_REFRESH_INTERVAL = int(os.getenv('BALANCE_REFRESH_INTERVAL', 60))
+BALANCE_REFRESH_WORKERS = int(os.getenv('BALANCE_REFRESH_WORKERS', 8))
+BALANCE_MAX_AGE = int(os.getenv('BALANCE_MAX_AGE', 300))
+
+# History retention
+# archive_history moves signal, banditmessages and user_trades rows older than RETENTION_DAYS
+# into gzip JSONL files under ARCHIVE_DIR and deletes them. On PostgreSQL banditmessages and
+# user_trades are partitioned by month; whole expired months are dropped as partitions and
+# PARTITION_MONTHS_AHEAD future partitions are kept created.
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 180))
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', 3))
+
+# TradingView webhook
+# When enabled the webhook only validates the payload, stores it in the signal outbox
+# and answers 202. The drain_signal_outbox management command processes the outbox.
+TRADINGVIEW_ASYNC_ACK = os.getenv('TRADINGVIEW_ASYNC_ACK', 'False') == 'True'
+# Seconds an outbox entry may stay Dispatched before drain_signal_outbox resends the orders
+# that were not recorded (its worker died or dispatch failed).
+SIGNAL_OUTBOX_DISPATCH_TIMEOUT = int(os.getenv('SIGNAL_OUTBOX_DISPATCH_TIMEOUT', 300))
+
+# Discord signal parsing
+# Minimum confidence (0-1) for a locally parsed signal to be used without calling Gemini.
+LOCAL_PARSER_MIN_CONFIDENCE = float(os.getenv('LOCAL_PARSER_MIN_CONFIDENCE', 0.9))
+# Gemini results kept in each worker's in-memory LRU (the gemini_parse_cache table is unbounded).
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv('GEMINI_CACHE_MAX_ENTRIES', 1024))
+# Seconds between writes of each worker's Gemini cache hit counts to gemini_parse_cache.
+GEMINI_CACHE_HIT_FLUSH_INTERVAL = float(os.getenv('GEMINI_CACHE_HIT_FLUSH_INTERVAL', 30))
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+# Per-call deadline in seconds, attempts per call and in-flight calls per worker (see gemini_client.py).
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 30))
+GEMINI_MAX_ATTEMPTS = int(os.getenv('GEMINI_MAX_ATTEMPTS', 3))
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 4))
+# Micro-batching: seconds to collect messages per channel, and messages per Gemini request (1 disables batching).
+GEMINI_BATCH_WINDOW = float(os.getenv('GEMINI_BATCH_WINDOW', 0.5))
+GEMINI_BATCH_MAX_SIZE = int(os.getenv('GEMINI_BATCH_MAX_SIZE', 10))
+# Seconds to keep each channel's template in Gemini context caching; 0 disables it.
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', 0))
+# USD per million tokens, used by the gemini_usage_report command.
+GEMINI_INPUT_COST_PER_MTOK = float(os.getenv('GEMINI_INPUT_COST_PER_MTOK', 0.30))
+GEMINI_CACHED_INPUT_COST_PER_MTOK = float(os.getenv('GEMINI_CACHED_INPUT_COST_PER_MTOK', 0.075))
+GEMINI_OUTPUT_COST_PER_MTOK = float(os.getenv('GEMINI_OUTPUT_COST_PER_MTOK', 2.50))
+# Local pre-filter for obvious non-signals: 'off', 'shadow' (log agreement with Gemini only) or 'enforce'.
+PREFILTER_MODE = os.getenv('PREFILTER_MODE', 'shadow')
+# Messages scoring below this signal probability are rejected in enforce mode.
+PREFILTER_THRESHOLD = float(os.getenv('PREFILTER_THRESHOLD', 0.1))
+# Model written by `manage.py train_prefilter` (needs scikit-learn); rules only when empty.
+PREFILTER_MODEL_PATH = os.getenv('PREFILTER_MODEL_PATH', '')
+# Seconds between writes of each worker's pre-filter agreement counts to prefilter_stats.
+PREFILTER_STATS_FLUSH_INTERVAL = float(os.getenv('PREFILTER_STATS_FLUSH_INTERVAL', 30))
+
 FORMATTERS = (
     {
         "verbose": {